@@ -4,13 +4,28 @@ Streamlit application for bailiff name matching review and approval.
 
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, func, Float, ForeignKey
+from sqlalchemy import create_engine, inspect, select, Column, Integer, String, Text, Boolean, DateTime, func, Float, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 import plotly.express as px
 import plotly.graph_objects as go
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from auto_resolution import SYSTEM_REVIEWER
+from bailiff_lookup import BailiffLookup, dictionary_version
+from bailiff_directory import DIRECTORY_PAGE_SIZE, bailiff_page, count_bailiffs
+from db_migrations import ensure_schema
+from institutional_phrases import court_key
+from polish_phonetics import phonetic_key
+from reranker import load_reranker
+from review_state import ReviewState
+from session_archive import ARCHIVABLE_STATUSES, ARCHIVED_STATUS, archive_session, open_session_archive
+from session_purge import DELETING_STATUS, enable_incremental_vacuum, resume_session_purges
+from session_storage import open_session_store, session_database, session_of_raw_id
+from session_versions import bump_data_version, get_catalog_version, get_data_version
+from surname_folding import surname_stem
 
 # Database models (simplified for Streamlit)
 Base = declarative_base()
@@ -26,7 +41,9 @@ class AnalysisSession(Base):
     total_records = Column(Integer, nullable=True)
     processed_records = Column(Integer, default=0, nullable=False)
     matched_records = Column(Integer, default=0, nullable=False)
+    data_version = Column(Integer, default=0, nullable=False)  # bumped on every change shown in the review UI
     status = Column(String(50), default='uploaded', nullable=False)
+    storage_file = Column(String(500), nullable=True)  # own database file of the session (session_storage)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -47,12 +64,18 @@ class BailiffDict(Base):
     bank = Column(String(200), nullable=True)
     numer_konta = Column(String(100), nullable=True)
     normalized_fullname = Column(Text, nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    court_key = Column(String(200), nullable=True, index=True)
+    api_row_id = Column(String(100), nullable=True, index=True)
+    api_updated_at = Column(String(40), nullable=True)
+    canonical_id = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class RawNames(Base):
     __tablename__ = 'raw_names'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     source_file = Column(String(500), nullable=False)
     source_sheet = Column(String(100), nullable=True)
     source_row = Column(Integer, nullable=True)
@@ -67,12 +90,19 @@ class RawNames(Base):
     source_email = Column(String(200), nullable=True)
     source_phone = Column(String(50), nullable=True)
     source_address = Column(String(500), nullable=True)
+    source_iban = Column(String(50), nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    source_postal_code = Column(String(20), nullable=True, index=True)
+    source_district_code = Column(String(20), nullable=True)
+    source_court = Column(Text, nullable=True)
+    court_key = Column(String(200), nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class MatchSuggestions(Base):
     __tablename__ = 'match_suggestions'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     raw_id = Column(Integer, ForeignKey('raw_names.id'), nullable=False)
     bailiff_id = Column(Integer, ForeignKey('bailiffs_dict.id'), nullable=False)
     fullname_score = Column(Float, nullable=False)
@@ -82,6 +112,8 @@ class MatchSuggestions(Base):
     combined_score = Column(Float, nullable=False)
     algorithm_used = Column(String(50), nullable=False)
     confidence_level = Column(String(20), nullable=False)
+    scoring_profile = Column(String(50), nullable=True)
+    features = Column(LargeBinary, nullable=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     raw_name = relationship("RawNames", backref="suggestions")
     bailiff = relationship("BailiffDict", backref="suggestions")
@@ -89,7 +121,7 @@ class MatchSuggestions(Base):
 class NameMappings(Base):
     __tablename__ = 'name_mappings'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     raw_id = Column(Integer, ForeignKey('raw_names.id'), nullable=False)
     bailiff_id = Column(Integer, ForeignKey('bailiffs_dict.id'), nullable=True)
     mapping_type = Column(String(20), nullable=False)  # 'accepted', 'rejected', 'manual_new'
@@ -102,26 +134,64 @@ class NameMappings(Base):
 def get_database_connection():
     """Initialize database connection."""
     engine = create_engine("sqlite:///bailiffs_matching.db", echo=False)
+    if not inspect(engine).get_table_names():
+        # A new database returns the pages of deleted sessions incrementally
+        enable_incremental_vacuum(engine)
     Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+    resume_session_purges(engine)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     return engine, SessionLocal
 
+def get_session_database(session_id):
+    """(engine, SessionLocal) holding the raw names and suggestions of a session."""
+    engine, SessionLocal = get_database_connection()
+    if session_id is None:
+        return engine, SessionLocal
+    return session_database(engine, session_id) or (engine, SessionLocal)
+
+# Cached review data: a few sessions x filter combinations per process
+SESSION_CACHE_ENTRIES = 32
+
 def get_sessions_list():
-    """Get list of all analysis sessions."""
+    """Get list of all analysis sessions (cached until a session or its data changes)."""
+    engine, SessionLocal = get_database_connection()
+    with engine.connect() as connection:
+        catalog_version = get_catalog_version(connection)
+    return load_sessions_list(catalog_version)
+
+@st.cache_data(max_entries=SESSION_CACHE_ENTRIES, show_spinner=False)
+def load_sessions_list(catalog_version):
+    """Sessions with their stats; `catalog_version` is the cache key."""
     engine, SessionLocal = get_database_connection()
     session = SessionLocal()
     
     try:
-        sessions = session.query(AnalysisSession).order_by(AnalysisSession.created_at.desc()).all()
+        # Sessions being purged in the background are already gone for the user
+        sessions = session.query(AnalysisSession).filter(
+            AnalysisSession.status != DELETING_STATUS
+        ).order_by(AnalysisSession.created_at.desc()).all()
         
         sessions_data = []
         for analysis_session in sessions:
-            # Get stats
-            total_suggestions = session.query(MatchSuggestions).filter(
-                MatchSuggestions.session_id == analysis_session.id
-            ).count()
+            # Get stats (from the session's own file or archive, if it has one)
+            archive = (open_session_archive(engine, analysis_session.id)
+                       if analysis_session.status == ARCHIVED_STATUS else None)
+            if archive:
+                # Row counts from the Parquet footers
+                total_suggestions = archive.num_rows('match_suggestions')
+            elif analysis_session.storage_file:
+                store_session = open_session_store(engine, analysis_session.storage_file)[1]()
+                try:
+                    total_suggestions = store_session.query(MatchSuggestions).count()
+                finally:
+                    store_session.close()
+            else:
+                total_suggestions = session.query(MatchSuggestions).filter(
+                    MatchSuggestions.session_id == analysis_session.id
+                ).count()
             
-            mapped_count = session.query(NameMappings).filter(
+            mapped_count = archive.num_rows('name_mappings') if archive else session.query(NameMappings).filter(
                 NameMappings.session_id == analysis_session.id
             ).count()
             
@@ -146,17 +216,17 @@ def get_sessions_list():
 
 def load_data(session_id=None):
     """Load data from database for specific session."""
-    engine, SessionLocal = get_database_connection()
+    engine, SessionLocal = get_session_database(session_id)
     session = SessionLocal()
     
     try:
-        # Load suggestions with related data for specific session
+        # Load suggestions with related data for specific session, best suggestion of each name first
         query = session.query(MatchSuggestions).join(RawNames).join(BailiffDict)
         
         if session_id:
             query = query.filter(MatchSuggestions.session_id == session_id)
         
-        suggestions_query = query.all()
+        suggestions_query = query.order_by(MatchSuggestions.raw_id, MatchSuggestions.combined_score.desc()).all()
         
         suggestions_data = []
         for suggestion in suggestions_query:
@@ -172,7 +242,8 @@ def load_data(session_id=None):
                 'fullname_score': suggestion.fullname_score,
                 'city_score': suggestion.city_score,
                 'confidence_level': suggestion.confidence_level,
-                'algorithm_used': suggestion.algorithm_used
+                'algorithm_used': suggestion.algorithm_used,
+                'scoring_profile': suggestion.scoring_profile
             })
         
         # Check for existing mappings in this session
@@ -188,52 +259,220 @@ def load_data(session_id=None):
     finally:
         session.close()
 
-def save_mapping(raw_id, bailiff_id, mapping_type, notes="", reviewed_by="User", session_id=None):
-    """Save a human decision to the database."""
+@st.cache_data(max_entries=SESSION_CACHE_ENTRIES, show_spinner=False)
+def load_session_data(session_id, data_version):
+    """`load_data` cached per (session_id, data_version)."""
+    return load_data(session_id)
+
+@st.cache_data(max_entries=SESSION_CACHE_ENTRIES, show_spinner=False)
+def filter_review_data(session_id, data_version, confidence_filter, score_threshold, show_only_unmapped):
+    """Filtered suggestions, ordered raw_ids of their groups and the best suggestion of each name."""
+    suggestions_df, mapped_raw_ids = load_session_data(session_id, data_version)
+    filtered_df = suggestions_df
+    
+    if confidence_filter != "Wszystkie":
+        filtered_df = filtered_df[filtered_df['confidence_level'] == confidence_filter]
+    
+    filtered_df = filtered_df[filtered_df['combined_score'] >= score_threshold]
+    
+    if show_only_unmapped:
+        filtered_df = filtered_df[~filtered_df['raw_id'].isin(mapped_raw_ids)]
+    
+    group_raw_ids = sorted(filtered_df['raw_id'].unique().tolist())
+    # Suggestions are sorted by score within each name, so the first row is the best one
+    best_matches = filtered_df.groupby('raw_id').first()
+    return filtered_df, group_raw_ids, best_matches
+
+def mass_approval_threshold(suggestions_df, default=90.0):
+    """Default mass-approval threshold: the tuned threshold of the learned reranker if it scored the session."""
+    try:
+        model = load_reranker()
+    except (OSError, ValueError, KeyError, TypeError):
+        return default
+    if suggestions_df.empty or not (suggestions_df['scoring_profile'] == model.key).all():
+        return default
+    # The input only accepts thresholds of 60% and more
+    return min(max(float(model.thresholds['high']), 60.0), 100.0)
+
+@st.cache_data(max_entries=SESSION_CACHE_ENTRIES, show_spinner=False)
+def load_archived_session(session_id, data_version):
+    """Review data and decisions of an archived session (None without archive files)."""
+    engine, SessionLocal = get_database_connection()
+    archive = open_session_archive(engine, session_id)
+    if archive is None:
+        return None
+    suggestions_df, mapped_raw_ids = archive.review_data()
+    return suggestions_df, mapped_raw_ids, archive.decisions()
+
+def show_archived_session(session_id):
+    """Read-only view of an archived session, read from its Parquet files."""
+    st.info("🗄️ Sesja zarchiwizowana - dane tylko do odczytu")
+    try:
+        with st.spinner("Ładowanie archiwum..."):
+            archived = load_archived_session(session_id, get_session_data_version(session_id))
+    except RuntimeError as e:
+        st.error(f"❌ {e}")
+        return
+    if archived is None:
+        st.error("❌ Brak plików archiwum tej sesji")
+        return
+    suggestions_df, mapped_raw_ids, decisions_df = archived
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Nazwy z sugestiami", suggestions_df['raw_id'].nunique() if not suggestions_df.empty else 0)
+    with col2:
+        st.metric("Łączna liczba sugestii", len(suggestions_df))
+    with col3:
+        st.metric("Decyzje", len(decisions_df))
+    
+    st.subheader("Najlepsze sugestie")
+    confidence_filter = st.selectbox("Poziom pewności", ["Wszystkie", "high", "medium", "low"], index=0,
+                                     key="archived_confidence_filter")
+    if not suggestions_df.empty:
+        # Suggestions are sorted by score within each name, so the first row is the best one
+        best_matches = suggestions_df.groupby('raw_id').first().reset_index()
+        if confidence_filter != "Wszystkie":
+            best_matches = best_matches[best_matches['confidence_level'] == confidence_filter]
+        best_matches['mapped'] = best_matches['raw_id'].isin(mapped_raw_ids)
+        st.dataframe(best_matches[['raw_text', 'raw_city', 'bailiff_name', 'bailiff_city', 'combined_score',
+                                   'confidence_level', 'mapped']], use_container_width=True, hide_index=True)
+    
+    st.subheader("Decyzje")
+    if decisions_df.empty:
+        st.info("Brak decyzji w tej sesji.")
+        return
+    st.dataframe(decisions_df, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="📥 Pobierz CSV",
+        data=decisions_df.to_csv(index=False),
+        file_name=f"bailiff_mappings_session_{session_id}.csv",
+        mime="text/csv"
+    )
+
+def get_session_data_version(session_id):
+    engine, SessionLocal = get_database_connection()
+    with engine.connect() as connection:
+        return get_data_version(connection, session_id)
+
+def clear_session_caches():
+    """Drop all cached session data (manual refresh)."""
+    load_sessions_list.clear()
+    load_session_data.clear()
+    filter_review_data.clear()
+
+def write_mappings(decisions, reviewed_by="User", session_id=None):
+    """Write decisions [(raw_id, bailiff_id, mapping_type, notes)] in one transaction.
+
+    Returns the new data version of `session_id` (None when the sessions are
+    taken from the raw names); raises on database errors.
+    """
     engine, SessionLocal = get_database_connection()
     session = SessionLocal()
     
     try:
+        # Ids coming from DataFrames are numpy integers, which sqlite3 would store as blobs
+        decisions = [(int(raw_id), int(bailiff_id) if bailiff_id is not None else None, mapping_type, notes)
+                     for raw_id, bailiff_id, mapping_type, notes in decisions]
+        raw_ids = [decision[0] for decision in decisions]
+        
         # Get session_id from raw_names if not provided
+        raw_sessions = {}
         if session_id is None:
-            raw_name = session.query(RawNames).filter(RawNames.id == raw_id).first()
-            if raw_name:
-                session_id = raw_name.session_id
-        
-        # Check if mapping already exists
-        existing = session.query(NameMappings).filter(NameMappings.raw_id == raw_id).first()
-        
-        if existing:
-            # Update existing mapping
-            existing.bailiff_id = bailiff_id
-            existing.mapping_type = mapping_type
-            existing.notes = notes
-            existing.reviewed_by = reviewed_by
-            existing.reviewed_at = func.now()
-            existing.session_id = session_id
-        else:
-            # Create new mapping
-            mapping = NameMappings(
-                raw_id=raw_id,
-                bailiff_id=bailiff_id,
-                mapping_type=mapping_type,
-                notes=notes,
-                reviewed_by=reviewed_by,
-                session_id=session_id
-            )
-            session.add(mapping)
-        
+            raw_sessions = dict(session.query(RawNames.id, RawNames.session_id).filter(RawNames.id.in_(raw_ids)).all())
+            # Raw names of sessions with their own file are not in the shared table
+            raw_sessions.update({raw_id: session_of_raw_id(raw_id) for raw_id in raw_ids
+                                 if raw_id not in raw_sessions and session_of_raw_id(raw_id) is not None})
+        
+        # Existing mappings are updated, the rest inserted
+        existing = {mapping.raw_id: mapping
+                    for mapping in session.query(NameMappings).filter(NameMappings.raw_id.in_(raw_ids)).all()}
+        
+        for raw_id, bailiff_id, mapping_type, notes in decisions:
+            mapping_session_id = session_id if session_id is not None else raw_sessions.get(raw_id)
+            mapping = existing.get(raw_id)
+            if mapping:
+                mapping.bailiff_id = bailiff_id
+                mapping.mapping_type = mapping_type
+                mapping.notes = notes
+                mapping.reviewed_by = reviewed_by
+                mapping.reviewed_at = func.now()
+                mapping.session_id = mapping_session_id
+            else:
+                session.add(NameMappings(
+                    raw_id=raw_id,
+                    bailiff_id=bailiff_id,
+                    mapping_type=mapping_type,
+                    notes=notes,
+                    reviewed_by=reviewed_by,
+                    session_id=mapping_session_id
+                ))
+        
+        touched_sessions = [session_id] if session_id is not None else set(raw_sessions.values())
+        bump_data_version(session.connection(), touched_sessions)
+        data_version = get_data_version(session.connection(), session_id) if session_id is not None else None
         session.commit()
-        return True
+        return data_version
         
-    except Exception as e:
-        st.error(f"Błąd podczas zapisywania: {e}")
+    except Exception:
         session.rollback()
-        return False
+        raise
         
     finally:
         session.close()
 
+def save_mapping(raw_id, bailiff_id, mapping_type, notes="", reviewed_by="User", session_id=None):
+    """Save a human decision to the database."""
+    try:
+        write_mappings([(raw_id, bailiff_id, mapping_type, notes)], reviewed_by, session_id)
+        return True
+    except Exception as e:
+        st.error(f"Błąd podczas zapisywania: {e}")
+        return False
+
+@st.cache_resource
+def get_mapping_writer():
+    """Single background thread, so review writes reach SQLite one at a time and in order."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="mapping-writer")
+
+@st.cache_resource(max_entries=2)
+def get_bailiff_lookup(version):
+    """Fuzzy lookup index of the bailiff dictionary, rebuilt when the dictionary changes."""
+    engine, SessionLocal = get_database_connection()
+    with engine.connect() as connection:
+        return BailiffLookup.from_connection(connection)
+
+def search_bailiffs(query, limit=10, city=None):
+    """Top `limit` bailiffs for a free-text query as (BailiffRecord, score) pairs."""
+    engine, SessionLocal = get_database_connection()
+    with engine.connect() as connection:
+        version = dictionary_version(connection)
+    return get_bailiff_lookup(version).search(query, limit=limit, city=city)
+
+def get_review_state(session_id):
+    """Review state of a session kept across reruns; rebuilt only when someone else changed the data."""
+    data_version = get_session_data_version(session_id)
+    state = st.session_state.get('review_state')
+    
+    if state is None or state.session_id != session_id:
+        _, mapped_raw_ids = load_session_data(session_id, data_version)
+        state = ReviewState(session_id, data_version, mapped_raw_ids)
+    elif not state.is_current(data_version):
+        _, mapped_raw_ids = load_session_data(session_id, data_version)
+        state = state.rebuilt(data_version, mapped_raw_ids)
+    
+    st.session_state.review_state = state
+    return state
+
+def submit_decision(state, raw_id, bailiff_id, mapping_type, message, notes_key=None):
+    """Button callback: take the name out of the queue now, write the decision in the background."""
+    notes = st.session_state.get(notes_key, "") if notes_key else ""
+    future = get_mapping_writer().submit(
+        write_mappings, [(raw_id, bailiff_id, mapping_type, notes)], "User", state.session_id
+    )
+    state.record(raw_id, future)
+    st.toast(message)
+
 def show_file_upload():
     """Show file upload interface."""
     
@@ -271,6 +510,13 @@ def show_file_upload():
             except Exception as e:
                 st.error(f"Błąd odczytu arkuszy: {e}")
         
+        separate_storage = st.checkbox(
+            "💾 Osobny plik bazy dla sesji",
+            value=False,
+            help="Nazwy i sugestie sesji trafiają do własnego pliku SQLite - zapytania nie przeglądają innych sesji, "
+                 "a usunięcie sesji to usunięcie pliku"
+        )
+        
         submitted = st.form_submit_button("🚀 Wgraj i przeanalizuj", type="primary")
     
     # Outside the form - handle submission
@@ -306,7 +552,8 @@ def show_file_upload():
                 session_id, message = create_analysis_session(
                     session_name=session_name,
                     filename=uploaded_file.name,
-                    description=description
+                    description=description,
+                    separate_storage=separate_storage
                 )
                 print(f"🔍 DEBUG: Wynik tworzenia sesji - ID: {session_id}, wiadomość: {message}")
             
@@ -327,7 +574,7 @@ def show_file_upload():
                     
                     # Sprawdź końcowy stan
                     try:
-                        engine, SessionLocal = get_database_connection()
+                        engine, SessionLocal = get_session_database(session_id)
                         db_session = SessionLocal()
                         final_count = db_session.query(RawNames).filter(RawNames.session_id == session_id).count()
                         print(f"🔍 DEBUG APP: KOŃCOWA liczba rekordów w sesji {session_id}: {final_count}")
@@ -387,8 +634,7 @@ def show_file_upload():
     
     # Auto-refresh button outside form
     if st.button("🔄 Odśwież teraz", key="refresh_after_upload"):
-        if 'data_loaded' in st.session_state:
-            del st.session_state.data_loaded
+        clear_session_caches()
         st.rerun()
 
 def main():
@@ -484,22 +730,28 @@ def main():
         
         with col2:
             if st.button("🔄 Odśwież sesje"):
-                if 'data_loaded' in st.session_state:
-                    del st.session_state.data_loaded
+                clear_session_caches()
                 st.rerun()
         
         st.markdown("---")
         
-        # Load data for selected session
+        # Archived sessions are read from their Parquet files, without review actions
+        selected_status = next((s['status'] for s in sessions if s['id'] == selected_session_id), None)
+        if selected_status == ARCHIVED_STATUS:
+            show_archived_session(selected_session_id)
+            return
+        
+        # Load data for selected session (cached until the session's data version changes)
         if selected_session_id:
-            if 'data_loaded' not in st.session_state or st.session_state.get('current_session_id') != selected_session_id:
-                with st.spinner("Ładowanie danych..."):
-                    st.session_state.suggestions_df, st.session_state.mapped_raw_ids = load_data(selected_session_id)
-                    st.session_state.data_loaded = True
-                    st.session_state.current_session_id = selected_session_id
+            review_state = get_review_state(selected_session_id)
+            data_version = review_state.base_version
+            with st.spinner("Ładowanie danych..."):
+                suggestions_df, _ = load_session_data(selected_session_id, data_version)
+            mapped_raw_ids = review_state.mapped_raw_ids
             
-            suggestions_df = st.session_state.suggestions_df
-            mapped_raw_ids = st.session_state.mapped_raw_ids
+            failed = review_state.collect_failures()
+            if failed:
+                st.error(f"❌ Nie udało się zapisać {len(failed)} decyzji - nazwy wróciły do kolejki")
         else:
             suggestions_df = pd.DataFrame()
             mapped_raw_ids = set()
@@ -537,15 +789,12 @@ def main():
             show_only_unmapped = st.checkbox("Pokaż tylko niedopasowane", value=True)
         
         # Apply filters
-        filtered_df = suggestions_df.copy()
-        
-        if confidence_filter != "Wszystkie":
-            filtered_df = filtered_df[filtered_df['confidence_level'] == confidence_filter]
-        
-        filtered_df = filtered_df[filtered_df['combined_score'] >= score_threshold]
-        
+        filtered_df, group_raw_ids, best_matches = filter_review_data(
+            selected_session_id, data_version, confidence_filter, score_threshold, show_only_unmapped
+        )
         if show_only_unmapped:
-            filtered_df = filtered_df[~filtered_df['raw_id'].isin(mapped_raw_ids)]
+            # Decisions made since the data was loaded
+            group_raw_ids = [raw_id for raw_id in group_raw_ids if raw_id not in mapped_raw_ids]
         
         # Sub-tabs for analysis
         subtab1, subtab2, subtab3 = st.tabs(["🔍 Przegląd dopasowań", "📊 Statystyki", "📋 Export"])
@@ -553,7 +802,7 @@ def main():
         with subtab1:
             st.header("Przegląd i zatwierdzanie dopasowań")
             
-            if filtered_df.empty:
+            if not group_raw_ids:
                 st.info("Brak wyników spełniających kryteria filtrów.")
                 return
             
@@ -567,17 +816,18 @@ def main():
                     "Próg pewności (%)",
                     min_value=60.0,
                     max_value=100.0,
-                    value=90.0,
+                    value=mass_approval_threshold(suggestions_df),
                     step=5.0,
-                    help="Automatycznie zatwierdź najlepsze dopasowania powyżej tego progu"
+                    help=("Automatycznie zatwierdź najlepsze dopasowania powyżej tego progu "
+                          "(domyślnie próg modelu, jeśli sesję przeliczono modelem)")
                 )
         
         with col2:
             # Calculate how many would be auto-approved
-            auto_approve_candidates = filtered_df[
-                (~filtered_df['raw_id'].isin(mapped_raw_ids)) &
-                (filtered_df['combined_score'] >= mass_threshold)
-            ].groupby('raw_id').first()
+            auto_approve_candidates = best_matches[
+                (~best_matches.index.isin(mapped_raw_ids)) &
+                (best_matches['combined_score'] >= mass_threshold)
+            ]
             
             candidates_count = len(auto_approve_candidates)
             st.metric("Do zatwierdzenia", candidates_count)
@@ -589,34 +839,29 @@ def main():
                 disabled=candidates_count == 0,
                 help=f"Automatycznie zatwierdzi {candidates_count} najlepszych dopasowań"
             ):
-                progress_bar = st.progress(0)
-                success_count = 0
-                
-                for idx, (raw_id, best_match) in enumerate(auto_approve_candidates.iterrows()):
-                    if save_mapping(
-                        raw_id, 
-                        best_match['bailiff_id'], 
-                        "accepted", 
-                        f"Auto-zatwierdzono - wynik: {best_match['combined_score']:.1f}%",
-                        "Auto-System"
-                    ):
-                        success_count += 1
-                    
-                    progress_bar.progress((idx + 1) / len(auto_approve_candidates))
+                decisions = [
+                    (raw_id, best_match['bailiff_id'], "accepted",
+                     f"Auto-zatwierdzono - wynik: {best_match['combined_score']:.1f}%")
+                    for raw_id, best_match in auto_approve_candidates.iterrows()
+                ]
+                # One transaction through the same writer as single decisions
+                future = get_mapping_writer().submit(write_mappings, decisions, SYSTEM_REVIEWER, selected_session_id)
+                for raw_id, _, _, _ in decisions:
+                    review_state.record(raw_id, future)
                 
-                st.success(f"✅ Automatycznie zatwierdzono {success_count} dopasowań!")
-                # Force reload data
-                del st.session_state.data_loaded
+                with st.spinner("Zapisywanie..."):
+                    try:
+                        future.result()
+                        st.success(f"✅ Automatycznie zatwierdzono {len(decisions)} dopasowań!")
+                    except Exception as e:
+                        st.error(f"Błąd podczas zapisywania: {e}")
                 st.rerun()
         
         st.markdown("---")
         
-        # Group by raw_id to show suggestions for each name
-        grouped = filtered_df.groupby('raw_id')
-        
-        # Pagination
+        # Pagination over names (groups of suggestions)
         items_per_page = st.selectbox("Elementów na stronę", [5, 10, 20, 50], index=1)
-        total_groups = len(grouped)
+        total_groups = len(group_raw_ids)
         total_pages = (total_groups - 1) // items_per_page + 1
         
         page = st.number_input(
@@ -629,8 +874,9 @@ def main():
         start_idx = (page - 1) * items_per_page
         end_idx = start_idx + items_per_page
         
-        groups_list = list(grouped)
-        current_groups = groups_list[start_idx:end_idx]
+        # Only the current page is grouped
+        page_raw_ids = group_raw_ids[start_idx:end_idx]
+        current_groups = list(filtered_df[filtered_df['raw_id'].isin(page_raw_ids)].groupby('raw_id'))
         
         for i, (raw_id, group) in enumerate(current_groups):
             st.markdown(f"### Nazwa {start_idx + i + 1}")
@@ -672,20 +918,53 @@ def main():
                         st.write(f"**Algorytm:** {suggestion['algorithm_used']}")
                     
                     with col2:
-                        if st.button(f"✅ Zatwierdź", key=f"accept_{suggestion['suggestion_id']}"):
-                            if save_mapping(raw_id, suggestion['bailiff_id'], "accepted"):
-                                st.success("Dopasowanie zaakceptowane!")
-                                del st.session_state.data_loaded
-                                st.rerun()
+                        st.button(
+                            f"✅ Zatwierdź", key=f"accept_{suggestion['suggestion_id']}",
+                            on_click=submit_decision,
+                            args=(review_state, raw_id, suggestion['bailiff_id'], "accepted", "Dopasowanie zaakceptowane!")
+                        )
                     
                     with col3:
-                        if st.button(f"❌ Odrzuć", key=f"reject_{suggestion['suggestion_id']}"):
-                            if save_mapping(raw_id, None, "rejected"):
-                                st.info("Dopasowanie odrzucone")
-                                del st.session_state.data_loaded
-                                st.rerun()            # Manual input option
+                        st.button(
+                            f"❌ Odrzuć", key=f"reject_{suggestion['suggestion_id']}",
+                            on_click=submit_decision,
+                            args=(review_state, raw_id, None, "rejected", "Dopasowanie odrzucone")
+                        )
+            
+            # Manual input option
             with st.expander("📝 Ręczne dopasowanie"):
-                manual_notes = st.text_area(
+                lookup_query = st.text_input(
+                    "Szukaj komornika",
+                    value=first_row['raw_text'],
+                    key=f"lookup_{raw_id}",
+                    help="Wyszukiwanie przybliżone w bazie komorników (literówki, odmiana nazwisk)"
+                )
+                lookup_city = first_row['raw_city'] if pd.notna(first_row['raw_city']) else None
+                lookup_results = search_bailiffs(lookup_query, limit=5, city=lookup_city) if lookup_query else []
+                if lookup_results:
+                    lookup_labels = {
+                        record.id: f"{record.original_nazwisko} {record.original_imie or ''} - {record.original_miasto or 'Brak'} ({score:.1f}%)"
+                        for record, score in lookup_results
+                    }
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        chosen_bailiff = st.selectbox(
+                            "Wyniki wyszukiwania",
+                            options=list(lookup_labels),
+                            format_func=lookup_labels.get,
+                            key=f"lookup_choice_{raw_id}"
+                        )
+                    with col2:
+                        st.button(
+                            "✅ Przypisz", key=f"assign_{raw_id}",
+                            on_click=submit_decision,
+                            args=(review_state, raw_id, chosen_bailiff, "accepted", "Przypisano wybranego komornika"),
+                            kwargs={'notes_key': f"notes_{raw_id}"}
+                        )
+                elif lookup_query:
+                    st.caption("Brak wyników wyszukiwania")
+                
+                st.text_area(
                     "Notatki",
                     placeholder="Opcjonalne notatki...",
                     key=f"notes_{raw_id}"
@@ -693,18 +972,20 @@ def main():
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button(f"💡 Ręczne dopasowanie", key=f"manual_{raw_id}"):
-                        if save_mapping(raw_id, None, "manual_new", manual_notes):
-                            st.info("Oznaczono do ręcznego dopasowania")
-                            del st.session_state.data_loaded
-                            st.rerun()
+                    st.button(
+                        f"💡 Ręczne dopasowanie", key=f"manual_{raw_id}",
+                        on_click=submit_decision,
+                        args=(review_state, raw_id, None, "manual_new", "Oznaczono do ręcznego dopasowania"),
+                        kwargs={'notes_key': f"notes_{raw_id}"}
+                    )
                 
                 with col2:
-                    if st.button(f"🚫 Brak dopasowania", key=f"no_match_{raw_id}"):
-                        if save_mapping(raw_id, None, "no_match", manual_notes):
-                            st.info("Oznaczono jako brak dopasowania")
-                            del st.session_state.data_loaded
-                            st.rerun()
+                    st.button(
+                        f"🚫 Brak dopasowania", key=f"no_match_{raw_id}",
+                        on_click=submit_decision,
+                        args=(review_state, raw_id, None, "no_match", "Oznaczono jako brak dopasowania"),
+                        kwargs={'notes_key': f"notes_{raw_id}"}
+                    )
             
             st.markdown("---")
         
@@ -767,12 +1048,26 @@ def main():
         session = SessionLocal()
         
         try:
-            # Load approved mappings
-            mappings = session.query(NameMappings).join(RawNames).all()
+            # Load approved mappings with their raw names (read from the session's own file, if it has one)
+            mappings = session.query(NameMappings).all()
+            raw_names_by_id = {}
+            for mapping_session_id in {mapping.session_id for mapping in mappings}:
+                store_engine, StoreSession = get_session_database(mapping_session_id)
+                store_session = StoreSession()
+                try:
+                    session_mapped_ids = select(NameMappings.raw_id).where(
+                        NameMappings.session_id.is_(None) if mapping_session_id is None
+                        else NameMappings.session_id == mapping_session_id
+                    )
+                    raw_names_by_id.update((raw_name.id, raw_name) for raw_name in
+                                           store_session.query(RawNames).filter(RawNames.id.in_(session_mapped_ids)))
+                finally:
+                    store_session.close()
+            mappings = [mapping for mapping in mappings if mapping.raw_id in raw_names_by_id]
             
             export_data = []
             for mapping in mappings:
-                raw_name = session.query(RawNames).get(mapping.raw_id)
+                raw_name = raw_names_by_id[mapping.raw_id]
                 bailiff = session.query(BailiffDict).get(mapping.bailiff_id) if mapping.bailiff_id is not None else None
                 
                 export_data.append({
@@ -821,7 +1116,9 @@ def show_bailiffs_management():
     session = SessionLocal()
     try:
         # Main tabs for bailiffs management
-        bailiff_tab1, bailiff_tab2, bailiff_tab3 = st.tabs(["📋 Lista komorników", "➕ Dodaj nowego", "📊 Statystyki bazy"])
+        bailiff_tab1, bailiff_tab_lookup, bailiff_tab2, bailiff_tab3 = st.tabs(
+            ["📋 Lista komorników", "🔎 Wyszukiwanie przybliżone", "➕ Dodaj nowego", "📊 Statystyki bazy"]
+        )
         
         with bailiff_tab1:
             st.subheader("Lista wszystkich komorników")
@@ -835,32 +1132,42 @@ def show_bailiffs_management():
             with col3:
                 search_court = st.text_input("🏛️ Szukaj po sądzie:", placeholder="np. Rejonowy")
             
-            # Build query with filters
-            query = session.query(BailiffDict)
+            # Search runs in SQL (trigram index); only the current page is loaded
+            filters = {'name': search_name, 'city': search_city, 'court': search_court}
+            connection = session.connection()
+            total_count = count_bailiffs(connection, filters)
             
-            if search_name:
-                query = query.filter(BailiffDict.normalized_lastname.contains(search_name.lower()))
-            if search_city:
-                query = query.filter(BailiffDict.normalized_city.contains(search_city.lower()))
-            if search_court:
-                query = query.filter(BailiffDict.original_sad.contains(search_court))
+            # Keyset pagination: keys of the pages visited so far, reset when the search changes
+            if st.session_state.get('bailiff_filters') != filters:
+                st.session_state.bailiff_filters = filters
+                st.session_state.bailiff_page_keys = [None]
+            page_keys = st.session_state.bailiff_page_keys
             
-            bailiffs = query.order_by(BailiffDict.normalized_lastname, BailiffDict.normalized_firstname).all()
+            page_ids, next_key = bailiff_page(connection, filters, after=page_keys[-1])
+            if not page_ids and len(page_keys) > 1:
+                # The page emptied (records deleted or edited) - start over
+                st.session_state.bailiff_page_keys = [None]
+                st.rerun()
+            by_id = {bailiff.id: bailiff
+                     for bailiff in session.query(BailiffDict).filter(BailiffDict.id.in_(page_ids)).all()} if page_ids else {}
+            bailiffs_page = [by_id[bailiff_id] for bailiff_id in page_ids if bailiff_id in by_id]
             
-            if bailiffs:
-                st.write(f"**Znaleziono {len(bailiffs)} komorników**")
-                
-                # Pagination
-                items_per_page = 20
-                total_pages = (len(bailiffs) + items_per_page - 1) // items_per_page
+            if bailiffs_page:
+                st.write(f"**Znaleziono {total_count} komorników**")
                 
+                total_pages = (total_count + DIRECTORY_PAGE_SIZE - 1) // DIRECTORY_PAGE_SIZE
                 if total_pages > 1:
-                    page = st.selectbox("Strona:", range(1, total_pages + 1), key="bailiff_page")
-                    start_idx = (page - 1) * items_per_page
-                    end_idx = start_idx + items_per_page
-                    bailiffs_page = bailiffs[start_idx:end_idx]
-                else:
-                    bailiffs_page = bailiffs
+                    col1, col2, col3 = st.columns([1, 2, 1])
+                    with col1:
+                        if st.button("⬅️ Poprzednia", key="bailiff_prev_page", disabled=len(page_keys) == 1):
+                            page_keys.pop()
+                            st.rerun()
+                    with col2:
+                        st.write(f"Strona {len(page_keys)} z {total_pages}")
+                    with col3:
+                        if st.button("Następna ➡️", key="bailiff_next_page", disabled=next_key is None):
+                            page_keys.append(next_key)
+                            st.rerun()
                 
                 # Display bailiffs table
                 for bailiff in bailiffs_page:
@@ -939,8 +1246,14 @@ def show_bailiffs_management():
                                     bailiff.normalized_firstname = new_imie.lower() if new_imie else ""
                                     bailiff.normalized_city = new_miasto.lower() if new_miasto else ""
                                     bailiff.normalized_fullname = f"{new_nazwisko.lower()} {new_imie.lower() if new_imie else ''}".strip()
+                                    bailiff.phonetic_lastname = phonetic_key(new_nazwisko) or None
+                                    bailiff.surname_stem = surname_stem(new_nazwisko) or None
+                                    bailiff.court_key = court_key(new_sad)
                                     
+                                    # Suggestions of every session show bailiff data
+                                    bump_data_version(session.connection())
                                     session.commit()
+                                    get_bailiff_lookup.clear()
                                     st.success("✅ Dane komornika zostały zaktualizowane!")
                                     del st.session_state[f"edit_bailiff_{bailiff.id}"]
                                     st.rerun()
@@ -951,6 +1264,35 @@ def show_bailiffs_management():
             else:
                 st.info("Nie znaleziono komorników spełniających kryteria.")
         
+        with bailiff_tab_lookup:
+            st.subheader("Wyszukiwanie przybliżone")
+            st.caption("Szuka po nazwisku i imieniu z tolerancją literówek, odmiany i zapisu bez polskich znaków.")
+            
+            col1, col2, col3 = st.columns([3, 2, 1])
+            with col1:
+                fuzzy_query = st.text_input("Nazwa komornika:", placeholder="np. komornik Jan Kowalsky", key="fuzzy_query")
+            with col2:
+                fuzzy_city = st.text_input("Miasto (opcjonalnie):", placeholder="np. Warszawa", key="fuzzy_city")
+            with col3:
+                fuzzy_limit = st.number_input("Wyników:", min_value=1, max_value=50, value=10, key="fuzzy_limit")
+            
+            if fuzzy_query:
+                results = search_bailiffs(fuzzy_query, limit=int(fuzzy_limit), city=fuzzy_city or None)
+                if results:
+                    st.dataframe(pd.DataFrame([
+                        {
+                            'ID': record.id,
+                            'Nazwisko': record.original_nazwisko,
+                            'Imię': record.original_imie or '',
+                            'Miasto': record.original_miasto or '',
+                            'Sąd': record.original_sad or '',
+                            'Wynik': round(score, 1)
+                        }
+                        for record, score in results
+                    ]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nie znaleziono komorników pasujących do zapytania.")
+        
         with bailiff_tab2:
             st.subheader("Dodaj nowego komornika")
             
@@ -994,11 +1336,15 @@ def show_bailiffs_management():
                             normalized_lastname=new_nazwisko.lower(),
                             normalized_firstname=new_imie.lower() if new_imie else "",
                             normalized_city=new_miasto.lower(),
-                            normalized_fullname=f"{new_nazwisko.lower()} {new_imie.lower() if new_imie else ''}".strip()
+                            normalized_fullname=f"{new_nazwisko.lower()} {new_imie.lower() if new_imie else ''}".strip(),
+                            phonetic_lastname=phonetic_key(new_nazwisko) or None,
+                            surname_stem=surname_stem(new_nazwisko) or None,
+                            court_key=court_key(new_sad)
                         )
                         
                         session.add(new_bailiff)
                         session.commit()
+                        get_bailiff_lookup.clear()
                         st.success("✅ Nowy komornik został dodany do bazy!")
                         st.rerun()
                     else:
@@ -1067,7 +1413,7 @@ def show_sessions_management():
         return
     
     # Main tabs for session management 
-    session_tab1, session_tab2 = st.tabs(["📋 Lista sesji", "🗑️ Usuwanie sesji"])
+    session_tab1, session_tab2, session_tab3 = st.tabs(["📋 Lista sesji", "🗑️ Usuwanie sesji", "🗄️ Archiwizacja"])
     
     with session_tab1:
         st.subheader("Lista wszystkich sesji")
@@ -1130,7 +1476,7 @@ def show_sessions_management():
             if st.button("🗑️ Usuń wybraną sesję", disabled=not confirm_single, type="primary"):
                 with st.spinner("Usuwanie sesji..."):
                     try:
-                        success, message = delete_session(selected_session_id)
+                        success, message = delete_session(selected_session_id, background=True)
                         if success:
                             st.success(f"✅ {message}")
                             st.rerun()  # Refresh the page to update the list
@@ -1173,6 +1519,28 @@ def show_sessions_management():
                             st.error(f"❌ {message}")
                     except Exception as e:
                         st.error(f"❌ Błąd podczas usuwania wszystkich sesji: {str(e)}")
+    
+    with session_tab3:
+        st.subheader("Archiwizacja zakończonych sesji")
+        st.write("Zarchiwizowana sesja jest zapisywana do skompresowanych plików Parquet i usuwana z bazy; "
+                 "pozostaje dostępna do podglądu (tylko do odczytu) w zakładce analizy.")
+        
+        archivable = {f"{s['session_name']} (ID: {s['id']})": s['id']
+                      for s in sessions if s['status'] in ARCHIVABLE_STATUSES}
+        if not archivable:
+            st.info("Brak zakończonych sesji do archiwizacji")
+        else:
+            selected_archive_name = st.selectbox("Wybierz sesję do archiwizacji:", options=list(archivable.keys()))
+            if st.button("🗄️ Archiwizuj sesję", type="primary"):
+                with st.spinner("Archiwizacja sesji..."):
+                    try:
+                        engine, SessionLocal = get_database_connection()
+                        counts = archive_session(engine, archivable[selected_archive_name])
+                        st.success(f"✅ Zarchiwizowano {counts['raw_names']} nazw, {counts['match_suggestions']} "
+                                   f"sugestii i {counts['name_mappings']} decyzji")
+                        st.rerun()
+                    except (ValueError, RuntimeError) as e:
+                        st.error(f"❌ {e}")
 
 if __name__ == "__main__":
     main()
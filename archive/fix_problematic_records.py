@@ -7,6 +7,7 @@ import sqlite3
 import sys
 sys.path.append('.')
 from rapidfuzz import fuzz
+from scoring_profiles import get_scoring_profile
 
 def create_city_mappings():
     """Mapowanie miast i obszarów metropolitalnych"""
@@ -57,6 +58,9 @@ def update_problematic_records():
     
     print("=== AKTUALIZACJA PROBLEMATYCZNYCH REKORDÓW ===")
     
+    profile = get_scoring_profile('rescoring')
+    print(f"Profil punktacji: {profile.key}")
+    
     # Connect to database
     conn = sqlite3.connect('bailiffs_matching.db')
     cursor = conn.cursor()
@@ -91,45 +95,17 @@ def update_problematic_records():
         # Recalculate city score with enhanced algorithm
         new_city_score = enhanced_city_score(raw_city, bailiff_city, bailiff_court)
         
-        # Recalculate combined score with adjusted weights for perfect name matches
-        if lastname_score == 100.0 and firstname_score == 100.0:
-            # Higher weight for perfect name matches
-            new_combined_score = (
-                fullname_score * 0.3 +     # 30% for full name
-                lastname_score * 0.4 +     # 40% for lastname (increased)
-                firstname_score * 0.3      # 30% for firstname (increased)
-            )
-        else:
-            # Standard weighting
-            new_combined_score = (
-                fullname_score * 0.4 +
-                lastname_score * 0.35 +
-                firstname_score * 0.25
-            )
-        
-        # City bonus for enhanced city score
-        if new_city_score > 70:
-            city_bonus = min(10, new_city_score / 10)
-            new_combined_score += city_bonus
-        
-        # Ensure combined score doesn't exceed 100
-        new_combined_score = min(100.0, new_combined_score)
-        
-        # Determine new confidence level
-        if new_combined_score >= 90:
-            confidence = 'high'
-        elif new_combined_score >= 70:
-            confidence = 'medium'
-        else:
-            confidence = 'low'
+        # Recalculate combined score and confidence with the shared rescoring profile
+        new_combined_score = profile.combine(fullname_score, lastname_score, firstname_score, new_city_score)
+        confidence = profile.confidence(new_combined_score)
         
         # Update only if there's significant improvement
         if new_combined_score > old_combined_score + 5:
             cursor.execute("""
                 UPDATE match_suggestions 
-                SET city_score = ?, combined_score = ?, confidence_level = ?
+                SET city_score = ?, combined_score = ?, confidence_level = ?, scoring_profile = ?
                 WHERE id = ?
-            """, (new_city_score, new_combined_score, confidence, ms_id))
+            """, (new_city_score, new_combined_score, confidence, profile.key, ms_id))
             
             updated_count += 1
             
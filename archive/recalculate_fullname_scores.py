@@ -7,6 +7,7 @@ import sqlite3
 import sys
 sys.path.append('.')
 from rapidfuzz import fuzz
+from scoring_profiles import get_scoring_profile
 from fix_problematic_records import enhanced_city_score
 
 def recalculate_all_fullname_scores():
@@ -14,6 +15,9 @@ def recalculate_all_fullname_scores():
     
     print("=== PRZEPRZELICZENIE WSZYSTKICH FULLNAME_SCORE ===")
     
+    profile = get_scoring_profile('rescoring')
+    print(f"Profil punktacji: {profile.key}")
+    
     # Connect to database
     conn = sqlite3.connect('bailiffs_matching.db')
     cursor = conn.cursor()
@@ -48,44 +52,16 @@ def recalculate_all_fullname_scores():
         # Recalculate city score with enhanced algorithm
         new_city_score = enhanced_city_score(raw_city, bailiff_city, bailiff_court)
         
-        # Recalculate combined score
-        if lastname_score == 100.0 and firstname_score == 100.0:
-            # Enhanced weights for perfect name matches
-            new_combined_score = (
-                new_fullname_score * 0.3 +    # 30% for full name
-                lastname_score * 0.4 +        # 40% for lastname
-                firstname_score * 0.3         # 30% for firstname
-            )
-        else:
-            # Standard weights
-            new_combined_score = (
-                new_fullname_score * 0.4 +    # 40% for full name
-                lastname_score * 0.35 +       # 35% for lastname
-                firstname_score * 0.25        # 25% for firstname
-            )
-        
-        # City bonus
-        if new_city_score > 70:
-            city_bonus = min(10, new_city_score / 10)
-            new_combined_score += city_bonus
-        
-        # Ensure combined score doesn't exceed 100
-        new_combined_score = min(100.0, new_combined_score)
-        
-        # Determine confidence level
-        if new_combined_score >= 90:
-            confidence = 'high'
-        elif new_combined_score >= 70:
-            confidence = 'medium'
-        else:
-            confidence = 'low'
+        # Recalculate combined score and confidence with the shared rescoring profile
+        new_combined_score = profile.combine(new_fullname_score, lastname_score, firstname_score, new_city_score)
+        confidence = profile.confidence(new_combined_score)
         
         # Update the suggestion
         cursor.execute("""
             UPDATE match_suggestions 
-            SET fullname_score = ?, city_score = ?, combined_score = ?, confidence_level = ?
+            SET fullname_score = ?, city_score = ?, combined_score = ?, confidence_level = ?, scoring_profile = ?
             WHERE id = ?
-        """, (new_fullname_score, new_city_score, new_combined_score, confidence, ms_id))
+        """, (new_fullname_score, new_city_score, new_combined_score, confidence, profile.key, ms_id))
         
         updated_count += 1
         
@@ -98,7 +74,7 @@ def recalculate_all_fullname_scores():
             print(f"  Przeprzeliczono {updated_count}/{len(suggestions)} sugestii")
             
         # Show significant improvements
-        if new_combined_score > 90 and (new_combined_score - (old_fullname_score * 0.4 + lastname_score * 0.35 + firstname_score * 0.25)) > 10:
+        if new_combined_score > 90 and (new_combined_score - profile.combine(old_fullname_score, lastname_score, firstname_score, 0.0)) > 10:
             print(f"    Znacząca poprawa - Rekord {raw_id}: "
                   f"fullname {old_fullname_score:.1f}%→{new_fullname_score:.1f}%, "
                   f"combined: →{new_combined_score:.1f}%")
@@ -21,7 +21,9 @@ class AnalysisSession(Base):
     total_records = Column(Integer, nullable=True)
     processed_records = Column(Integer, default=0, nullable=False)
     matched_records = Column(Integer, default=0, nullable=False)
+    data_version = Column(Integer, default=0, nullable=False)  # bumped on every change shown in the review UI
     status = Column(String(50), default='uploaded', nullable=False)  # uploaded, processing, completed, error
+    storage_file = Column(String(500), nullable=True)  # own database file of the session (session_storage)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
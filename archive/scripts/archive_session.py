@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Archive completed analysis sessions to compressed Parquet files.
+
+The raw names, suggestions and review decisions of a session are written to
+`session_archive/session_<id>/` and removed from the database; the session
+stays in the list with status `archived` and is shown read-only in the app.
+Requires pyarrow (pip install pyarrow).
+
+Usage: python archive/scripts/archive_session.py SESSION_ID [SESSION_ID ...] | --all-completed [--database sqlite:///bailiffs_matching.db]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append('.')
+
+from sqlalchemy import bindparam, create_engine, text
+
+from db_migrations import ensure_schema
+from session_archive import ARCHIVABLE_STATUSES, archive_path, archive_session
+
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+
+
+def _archive_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('session_ids', nargs='*', type=int, help="ID sesji do archiwizacji")
+    parser.add_argument('--all-completed', action='store_true', help="Archiwizuj wszystkie zakończone sesje")
+    parser.add_argument('--database', default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database, echo=False)
+    ensure_schema(engine)
+    session_ids = args.session_ids
+    if args.all_completed:
+        with engine.connect() as connection:
+            session_ids = connection.execute(
+                text("SELECT id FROM analysis_sessions WHERE status IN :statuses ORDER BY id")
+                .bindparams(bindparam('statuses', expanding=True)), {'statuses': list(ARCHIVABLE_STATUSES)}
+            ).scalars().all()
+    if not session_ids:
+        print("⚠️ Brak sesji do archiwizacji")
+        return 0
+
+    failed = 0
+    for session_id in session_ids:
+        start_time = time.time()
+        try:
+            counts = archive_session(engine, session_id)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ Sesja {session_id}: {e}")
+            failed += 1
+            continue
+        size_mb = _archive_size(archive_path(engine, session_id)) / 1024 / 1024
+        print(f"🗄️ Sesja {session_id}: {counts['raw_names']} nazw, {counts['match_suggestions']} sugestii, "
+              f"{counts['name_mappings']} decyzji -> {size_mb:.1f} MB w {time.time() - start_time:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+bailiffs-match: match a CSV/XLSX file against the bailiff dictionary from the command line.
+
+The input is read in chunks and every chunk goes through the same
+normalization and extraction as the file import (`raw_name_parsing`) and
+through `match_batch`; the top-k suggestions of each name are written to the
+output file. Nothing is stored in the database - the dictionary is only read
+- so nightly bulk jobs can run from cron next to the Streamlit app.
+
+Columns are detected by the import keywords (nazwa, miasto, kod_poczt, sąd,
+...); `--column FIELD=COLUMN` overrides the detection, FIELD being one of
+name, city, email, phone, iban, postal, district, court, address.
+
+The output has one row per suggestion (rank 1..top-k; a name without
+suggestions gets a single row with an empty rank). CSV output is written
+chunk by chunk; XLSX input and output are held in memory.
+
+Usage: python archive/scripts/bailiffs_match.py input.csv [-o matches.csv] [--column name=Dłużnik]
+           [--top-k 5] [--workers 4] [--chunk-size 500] [--profile rescoring]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append('.')
+sys.path.append('archive/scripts')
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from match_records import BailiffIndex, load_bailiff_records
+from name_extraction import get_name_automaton
+from raw_name_parsing import COLUMN_KEYWORDS, classify_columns, parse_raw_name, raw_name_record, row_texts
+from run_matching import match_batch
+from scoring_profiles import get_scoring_profile
+
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+DEFAULT_CHUNK_SIZE = 500
+# Chunks queued per worker process ahead of the one being written
+CHUNKS_IN_FLIGHT = 2
+# First data row of a file is row 2 (after the header), as in the file import
+FIRST_ROW = 2
+
+FIELDS = tuple(field[:-len('_text')] for field, _ in COLUMN_KEYWORDS)
+OUTPUT_COLUMNS = ['source_row', 'raw_text', 'rank', 'bailiff_id', 'nazwisko', 'imie', 'miasto', 'sad',
+                  'combined_score', 'confidence_level', 'algorithm_used', 'scoring_profile']
+
+# Matching state of the current process (set up once per worker by _init_matcher)
+_matcher = {}
+
+
+def _init_matcher(database_url, profile_name, top_k, verbose):
+    engine = create_engine(database_url, echo=False)
+    with engine.connect() as connection:
+        index = BailiffIndex(load_bailiff_records(connection))
+    engine.dispose()
+    _matcher.update(
+        index=index,
+        bailiffs_by_id={bailiff.id: bailiff for bailiff in index.bailiffs},
+        profile=get_scoring_profile(profile_name),
+        name_automaton=get_name_automaton(),
+        top_k=top_k,
+        # The matcher's per-name debug output would dominate the run time
+        output=None if verbose else open(os.devnull, 'w'),
+    )
+
+
+def match_chunk(rows):
+    """Output rows of one chunk of (source row, field texts) pairs."""
+    records = [raw_name_record(source_row, parse_raw_name(texts.pop('name_text'),
+                                                          name_automaton=_matcher['name_automaton'], **texts))
+               for source_row, texts in rows]
+
+    output = contextlib.redirect_stdout(_matcher['output']) if _matcher['output'] else contextlib.nullcontext()
+    with output:
+        suggestions = match_batch(records, _matcher['index'], profile=_matcher['profile'],
+                                  max_suggestions=_matcher['top_k'], workers=1)
+
+    results = []
+    for record, name_suggestions in zip(records, suggestions):
+        if not name_suggestions:
+            results.append({'source_row': record.id, 'raw_text': record.raw_text})
+        for rank, suggestion in enumerate(name_suggestions, start=1):
+            bailiff = _matcher['bailiffs_by_id'][suggestion['bailiff_id']]
+            results.append({
+                'source_row': record.id,
+                'raw_text': record.raw_text,
+                'rank': rank,
+                'bailiff_id': bailiff.id,
+                'nazwisko': bailiff.original_nazwisko,
+                'imie': bailiff.original_imie,
+                'miasto': bailiff.original_miasto,
+                'sad': bailiff.original_sad,
+                'combined_score': round(suggestion['combined_score'], 2),
+                'confidence_level': suggestion['confidence_level'],
+                'algorithm_used': suggestion['algorithm_used'],
+                'scoring_profile': suggestion['scoring_profile'],
+            })
+    return results
+
+
+def read_chunks(path, chunk_size, sheet_name=None):
+    """Yield DataFrames of at most chunk_size rows (CSV is streamed, Excel read at once)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str)
+    elif extension in ('.xlsx', '.xls'):
+        df = pd.read_excel(path, sheet_name=sheet_name or 0, dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ValueError(f"Nieobsługiwany format pliku: {extension}")
+
+
+def name_rows(chunks, hints):
+    """Yield lists of (source row, field texts) of the rows with a name, one list per chunk."""
+    source_row = FIRST_ROW
+    column_groups = None
+    for df in chunks:
+        if column_groups is None:
+            missing = [column for column in hints.values() if column not in df.columns]
+            if missing:
+                raise ValueError(f"Brak kolumn w pliku: {', '.join(missing)}")
+            column_groups = classify_columns(df.columns, hints)
+        rows = []
+        for _, row in df.iterrows():
+            texts = row_texts(row, df.columns, column_groups)
+            if texts['name_text'] and texts['name_text'] != 'nan':
+                rows.append((source_row, texts))
+            source_row += 1
+        yield rows
+
+
+def parse_column_hints(values):
+    """--column FIELD=COLUMN options as {parse_raw_name argument: column}."""
+    hints = {}
+    for value in values or []:
+        field, separator, column = value.partition('=')
+        if not separator or field not in FIELDS or not column:
+            raise ValueError(f"Niepoprawne --column '{value}' (oczekiwano POLE=KOLUMNA, pola: {', '.join(FIELDS)})")
+        hints[f"{field}_text"] = column
+    return hints
+
+
+def run(args):
+    hints = parse_column_hints(args.column)
+    output_path = args.output or f"{os.path.splitext(args.input)[0]}_matches.csv"
+    csv_output = os.path.splitext(output_path)[1].lower() == '.csv'
+    chunks = name_rows(read_chunks(args.input, args.chunk_size, args.sheet), hints)
+
+    print(f"🎯 Dopasowywanie {args.input} -> {output_path} (procesy: {args.workers}, partia: {args.chunk_size})")
+    start_time = time.time()
+    names = matched = 0
+    written_header = False
+    excel_rows = []
+
+    def write(results):
+        nonlocal names, matched, written_header
+        frame = pd.DataFrame(results, columns=OUTPUT_COLUMNS).astype({'rank': 'Int64', 'bailiff_id': 'Int64'})
+        names += frame['source_row'].nunique()
+        matched += int((frame['rank'] == 1).sum())
+        if csv_output:
+            frame.to_csv(output_path, mode='a' if written_header else 'w', header=not written_header, index=False)
+            written_header = True
+        else:
+            excel_rows.append(frame)
+        elapsed = time.time() - start_time
+        print(f"   Postęp: {names} nazw - {names / elapsed if elapsed > 0 else 0:.1f} nazw/sek")
+
+    matcher_args = (args.database, args.profile, args.top_k, args.verbose)
+    if args.workers <= 1:
+        _init_matcher(*matcher_args)
+        for rows in chunks:
+            write(match_chunk(rows))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_matcher,
+                                 initargs=matcher_args) as executor:
+            # Bounded queue of chunks in flight, written back in input order
+            in_flight = deque()
+            for rows in chunks:
+                in_flight.append(executor.submit(match_chunk, rows))
+                if len(in_flight) >= args.workers * CHUNKS_IN_FLIGHT:
+                    write(in_flight.popleft().result())
+            while in_flight:
+                write(in_flight.popleft().result())
+
+    if not csv_output:
+        frames = excel_rows or [pd.DataFrame(columns=OUTPUT_COLUMNS)]
+        pd.concat(frames, ignore_index=True).to_excel(output_path, index=False)
+    elif not written_header:
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(output_path, index=False)
+
+    elapsed = time.time() - start_time
+    print(f"✅ Dopasowano {matched}/{names} nazw w {elapsed:.1f} s; wyniki: {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='bailiffs-match', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help="Plik CSV lub Excel z nazwami")
+    parser.add_argument('-o', '--output', default=None, help="Plik wynikowy .csv lub .xlsx (domyślnie <wejście>_matches.csv)")
+    parser.add_argument('--sheet', default=None, help="Arkusz pliku Excel (domyślnie pierwszy)")
+    parser.add_argument('--column', action='append', metavar='FIELD=COLUMN',
+                        help="Kolumna źródłowa pola, np. name=Dłużnik (można powtarzać)")
+    parser.add_argument('--top-k', type=int, default=5, help="Liczba sugestii na nazwę")
+    parser.add_argument('--workers', type=int, default=1, help="Liczba procesów dopasowujących")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Liczba wierszy w partii")
+    parser.add_argument('--profile', default=None, help="Profil punktacji (domyślnie aktywny)")
+    parser.add_argument('--database', default=DATABASE_URL, help="URL bazy ze słownikiem komorników")
+    parser.add_argument('--verbose', action='store_true', help="Wypisuj diagnostykę dopasowań")
+    args = parser.parse_args()
+
+    try:
+        run(args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
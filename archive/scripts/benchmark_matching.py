@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Compare memory and time of ORM objects vs lightweight records in the matching loop.
+
+Builds a synthetic in-memory SQLite database (default: 3 000 bailiffs and
+100 000 raw names), then measures:
+  1. loading time and peak memory of ORM instances vs Core SELECT records,
+  2. the per-candidate component scoring loop on both representations,
+  3. optionally full `match_single_name` on a sample of raw names.
+
+Usage: python archive/scripts/benchmark_matching.py [--names 100000] [--bailiffs 3000] [--match-sample 200]
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.append('.')
+sys.path.append('archive/scripts')
+
+from rapidfuzz import fuzz
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from run_matching import Base, BailiffDict, RawNames, match_single_name
+from match_records import BailiffIndex, load_bailiff_records, load_raw_name_records
+
+FIRST_NAMES = ['jan', 'anna', 'piotr', 'katarzyna', 'tomasz', 'agnieszka', 'michal', 'ewa', 'lukasz', 'monika']
+LAST_NAMES = ['kowalski', 'nowak', 'wisniewski', 'wojcik', 'kowalczyk', 'kaminski', 'lewandowski', 'zielinski',
+              'szymanski', 'wozniak', 'dabrowski', 'kozlowski', 'jankowski', 'mazur', 'kwiatkowski', 'krawczyk']
+CITIES = ['warszawa', 'krakow', 'lodz', 'wroclaw', 'poznan', 'gdansk', 'szczecin', 'lublin', 'mikolow', 'grojec']
+
+
+def build_database(n_bailiffs, n_names):
+    """Create an in-memory database filled with synthetic data."""
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+
+    bailiffs = []
+    for i in range(n_bailiffs):
+        first, last, city = rng.choice(FIRST_NAMES), f"{rng.choice(LAST_NAMES)}{i}", rng.choice(CITIES)
+        bailiffs.append({
+            'original_nazwisko': last.title(), 'original_imie': first.title(), 'original_miasto': city.title(),
+            'normalized_lastname': last, 'normalized_firstname': first, 'normalized_city': city,
+            'normalized_fullname': f"{first} {last}",
+        })
+
+    raw_names = []
+    for i in range(n_names):
+        bailiff = bailiffs[rng.randrange(n_bailiffs)]
+        raw_names.append({
+            'session_id': 1, 'source_file': 'benchmark.csv', 'raw_text': bailiff['normalized_fullname'],
+            'normalized_text': bailiff['normalized_fullname'],
+            'extracted_lastname': bailiff['normalized_lastname'], 'extracted_firstname': bailiff['normalized_firstname'],
+            'source_city': bailiff['original_miasto'], 'is_processed': False,
+        })
+
+    with engine.begin() as connection:
+        connection.execute(insert(BailiffDict), bailiffs)
+        connection.execute(insert(RawNames), raw_names)
+    return engine
+
+
+def measure(label, func):
+    """Run `func` once and report wall time and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<40} {elapsed:8.2f}s   peak {peak / 1024 / 1024:8.1f} MB")
+    return result
+
+
+def score_components_orm(raw_names, bailiffs, candidates=20):
+    """Component scoring loop as it used to run on ORM instances."""
+    total = 0.0
+    for i, raw_name in enumerate(raw_names):
+        for j in range(candidates):
+            bailiff = bailiffs[(i + j) % len(bailiffs)]
+            total += fuzz.ratio(raw_name.extracted_lastname.lower(), bailiff.normalized_lastname.lower())
+            total += fuzz.ratio(raw_name.extracted_firstname.lower(), bailiff.normalized_firstname.lower())
+    return total
+
+
+def score_components_records(raw_names, index, candidates=20):
+    """Component scoring loop on records and the precomputed index."""
+    total = 0.0
+    lastnames, firstnames = index.lastnames, index.firstnames
+    for i, raw_name in enumerate(raw_names):
+        raw_lastname = raw_name.extracted_lastname.lower()
+        raw_firstname = raw_name.extracted_firstname.lower()
+        for j in range(candidates):
+            position = (i + j) % len(index)
+            total += fuzz.ratio(raw_lastname, lastnames[position])
+            total += fuzz.ratio(raw_firstname, firstnames[position])
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--bailiffs', type=int, default=3000)
+    parser.add_argument('--match-sample', type=int, default=0,
+                        help="Also time full match_single_name on this many names")
+    args = parser.parse_args()
+
+    print(f"🧪 Benchmark: {args.bailiffs} komorników, {args.names} nazw")
+    engine = build_database(args.bailiffs, args.names)
+    SessionLocal = sessionmaker(bind=engine)
+
+    print("\n📚 Ładowanie danych:")
+    session = SessionLocal()
+    orm_bailiffs = measure("ORM BailiffDict.all()", lambda: session.query(BailiffDict).all())
+    orm_names = measure("ORM RawNames.all()", lambda: session.query(RawNames).all())
+
+    with engine.connect() as connection:
+        records = measure("Core SELECT -> BailiffRecord", lambda: load_bailiff_records(connection))
+        index = measure("BailiffIndex build", lambda: BailiffIndex(records))
+        raw_records = measure("Core SELECT -> RawNameRecord",
+                              lambda: load_raw_name_records(connection, only_unprocessed=False))
+
+    print("\n⚙️  Pętla oceny kandydatów (20 kandydatów na nazwę):")
+    measure("ORM attribute access", lambda: score_components_orm(orm_names, orm_bailiffs))
+    measure("records + BailiffIndex", lambda: score_components_records(raw_records, index))
+    session.close()
+
+    if args.match_sample:
+        sample = raw_records[:args.match_sample]
+        print(f"\n🎯 match_single_name na {len(sample)} nazwach:")
+        measure("match_single_name (records)", lambda: [match_single_name(r, index) for r in sample])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,106 @@
 #!/usr/bin/env python3
 """
-Script to remove duplicates from the bailiff dictionary.
+Script to merge duplicates in the bailiff dictionary.
+
+Duplicates are found by entity resolution (`entity_resolution`): records are
+compared within phonetic/surname-stem/identifier blocks and clustered, so
+spelling variants and records with a missing first name or another city form
+are merged too, while namesakes from different cities are not. Duplicates
+are not deleted - they point at their canonical record (`canonical_id`) and
+their suggestions and review decisions are moved to it, so no re-matching is
+needed.
+
+Usage: python archive/scripts/cleanup_duplicates.py [--dry-run]
 """
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+import argparse
 import sys
-sys.path.append('scripts')
-from run_matching import BailiffDict, MatchSuggestions
+import time
+
+sys.path.append('.')
+
+from sqlalchemy import create_engine, text
+
+from db_migrations import ensure_schema
+from entity_resolution import apply_entity_clusters, repoint_suggestions, resolve_dictionary
+from session_storage import open_session_store, session_store_files
 
-def setup_database():
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+
+
+def setup_database(database_url=DATABASE_URL):
     """Setup database connection."""
-    database_url = "sqlite:///bailiffs_matching.db"
     engine = create_engine(database_url, echo=False)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return engine, SessionLocal
+    ensure_schema(engine)
+    return engine
+
+
+def merge_duplicates(engine, dry_run=False):
+    """Resolve the dictionary into bailiffs and merge duplicates; returns the number of merged records."""
+    with engine.begin() as connection:
+        total = connection.execute(text("SELECT COUNT(*) FROM bailiffs_dict")).scalar()
+        print(f"   Rekordów w słowniku: {total}")
+
+        start_time = time.time()
+        clusters = resolve_dictionary(connection)
+        duplicates = sum(len(cluster.duplicate_ids) for cluster in clusters)
+        print(f"   Znalezione grupy duplikatów: {len(clusters)} ({duplicates} duplikatów) "
+              f"w {time.time() - start_time:.1f} s")
+
+        names = dict(connection.execute(text(
+            "SELECT id, TRIM(COALESCE(original_imie, '') || ' ' || original_nazwisko || ' - ' || "
+            "COALESCE(original_miasto, '?')) FROM bailiffs_dict"
+        )).fetchall())
+        for cluster in clusters:
+            merged = ', '.join(f"{names[bailiff_id]} [{bailiff_id}]" for bailiff_id in cluster.duplicate_ids)
+            print(f"   {names[cluster.canonical_id]} [{cluster.canonical_id}] <- {merged} "
+                  f"({', '.join(sorted(set(cluster.reasons)))})")
+
+        if dry_run:
+            print("   Tryb próbny - bez zapisu")
+            return duplicates
+
+        merged, moved, removed = apply_entity_clusters(connection, clusters)
+        print(f"   Scalono {merged} rekordów; przeniesiono {moved} sugestii, "
+              f"usunięto {removed} zdublowanych sugestii")
+        print(f"   Komorników w indeksie dopasowań: {total - merged}")
+        store_files = session_store_files(connection)
+
+    # Sessions with their own database file keep their suggestions there
+    for storage_file in store_files:
+        with open_session_store(engine, storage_file)[0].begin() as store_connection:
+            moved, removed = repoint_suggestions(store_connection, clusters)
+        print(f"   {storage_file}: przeniesiono {moved} sugestii, usunięto {removed} zdublowanych")
+    return merged
 
-def remove_duplicates(session_class):
-    """Remove duplicate bailiffs and regenerate suggestions."""
-    session = session_class()
-    
-    try:
-        print("🧹 Usuwanie duplikatów ze słownika komorników...")
-        
-        # Get count before cleanup
-        total_before = session.query(BailiffDict).count()
-        print(f"   Rekordów przed czyszczeniem: {total_before}")
-        
-        # Find duplicates based on normalized_fullname
-        duplicates = session.execute(text('''
-            SELECT normalized_fullname, COUNT(*) as cnt, MIN(id) as keep_id
-            FROM bailiffs_dict 
-            WHERE normalized_fullname IS NOT NULL 
-            GROUP BY normalized_fullname 
-            HAVING COUNT(*) > 1
-        ''')).fetchall()
-        
-        print(f"   Znalezione grupy duplikatów: {len(duplicates)}")
-        
-        deleted_count = 0
-        for fullname, count, keep_id in duplicates:
-            # Delete all except the first one (with MIN id)
-            deleted = session.execute(text('''
-                DELETE FROM bailiffs_dict 
-                WHERE normalized_fullname = :fullname AND id != :keep_id
-            '''), {'fullname': fullname, 'keep_id': keep_id})
-            
-            deleted_count += deleted.rowcount
-            print(f"   Usunięto {deleted.rowcount} duplikatów dla: {fullname}")
-        
-        session.commit()
-        
-        # Get count after cleanup
-        total_after = session.query(BailiffDict).count()
-        print(f"   Rekordów po czyszczeniu: {total_after}")
-        print(f"   Usunięto łącznie: {deleted_count} duplikatów")
-        
-        # Now remove orphaned suggestions
-        print(f"\n🧹 Usuwanie nieaktualnych sugestii...")
-        
-        # Delete suggestions that reference non-existent bailiffs
-        orphaned = session.execute(text('''
-            DELETE FROM match_suggestions 
-            WHERE bailiff_id NOT IN (SELECT id FROM bailiffs_dict)
-        '''))
-        
-        print(f"   Usunięto {orphaned.rowcount} nieaktualnych sugestii")
-        session.commit()
-        
-        return deleted_count
-        
-    except Exception as e:
-        session.rollback()
-        print(f"❌ Błąd podczas usuwania duplikatów: {e}")
-        raise
-    finally:
-        session.close()
-
-def regenerate_suggestions(session_class):
-    """Regenerate match suggestions after cleanup."""
-    print("\n🔄 Regenerowanie sugestii dopasowań...")
-    
-    # Import and run the matching algorithm
-    from run_matching import run_matching_algorithm
-    
-    session = session_class()
-    try:
-        # Clear all existing suggestions
-        session.query(MatchSuggestions).delete()
-        session.commit()
-        print("   Wyczyszczono poprzednie sugestie")
-        
-        # Run matching algorithm again
-        run_matching_algorithm(session_class, batch_size=50)
-        
-    finally:
-        session.close()
 
 def main():
     """Main cleanup process."""
-    print("🧹 Czyszczenie duplikatów w bazie danych")
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help="Tylko pokaż grupy duplikatów, bez zapisu")
+    parser.add_argument('--database', default=DATABASE_URL)
+    args = parser.parse_args()
+
+    print("🧹 Scalanie duplikatów w słowniku komorników")
     print("=" * 50)
-    
+
     try:
-        # Setup database
-        engine, session_class = setup_database()
-        
-        # Remove duplicates
-        deleted_count = remove_duplicates(session_class)
-        
-        if deleted_count > 0:
-            # Regenerate suggestions
-            regenerate_suggestions(session_class)
-        
+        engine = setup_database(args.database)
+        merged = merge_duplicates(engine, args.dry_run)
+
         print(f"\n🎉 Czyszczenie zakończone pomyślnie!")
-        print(f"   Usunięto {deleted_count} duplikatów")
-        print(f"\nTeraz propozycje dopasowań powinny być unikalne.")
-        
+        print(f"   {'Do scalenia' if args.dry_run else 'Scalono'}: {merged} duplikatów")
+        if merged and not args.dry_run:
+            print(f"\nTeraz propozycje dopasowań wskazują tylko rekordy kanoniczne.")
+
     except Exception as e:
         print(f"\n❌ Błąd podczas czyszczenia: {e}")
         import traceback
         traceback.print_exc()
         return 1
-    
+
     return 0
 
+
 if __name__ == "__main__":
     exit(main())
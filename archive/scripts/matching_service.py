@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Headless HTTP matching service.
+
+Keeps the bailiff index warm in memory and matches JSON batches of raw names
+for other systems, without files, sessions or the Streamlit UI:
+
+    POST /match   {"names": [{"text": "Komornik Sądowy Jan Kowalski", "city": "Warszawa",
+                              "postal_code": "00-001"}], "top_k": 5}
+    GET  /health
+
+Besides `text`, a name may carry `city`, `postal_code`, `address`, `court`,
+`email`, `phone` and `iban` - the same fields the file import reads.
+Concurrent requests are micro-batched: names arriving within BATCH_WINDOW
+seconds (up to MAX_BATCH_NAMES) are matched together by `match_batch`, one
+vectorized fuzzy search per scorer. Nothing is written to the database.
+
+The app is a plain ASGI callable, served by any ASGI server:
+
+    uvicorn matching_service:app --app-dir archive/scripts
+    python archive/scripts/matching_service.py [--port 8000] [--profile rescoring]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('.')
+sys.path.append('archive/scripts')
+
+from sqlalchemy import create_engine
+
+from match_records import BailiffIndex, load_bailiff_records
+from name_extraction import get_name_automaton
+from raw_name_parsing import parse_raw_name, raw_name_record
+from run_matching import match_batch
+from scoring_profiles import get_scoring_profile
+
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+# Names matched in one vectorized batch, and how long the first request waits for company
+MAX_BATCH_NAMES = 256
+BATCH_WINDOW = 0.005
+# Larger requests are rejected - callers should split them (or use the batch CLI)
+MAX_REQUEST_NAMES = 1000
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 20
+
+# Request field -> parse_raw_name argument
+NAME_FIELDS = {
+    'city': 'city_text',
+    'postal_code': 'postal_text',
+    'address': 'address_text',
+    'court': 'court_text',
+    'email': 'email_text',
+    'phone': 'phone_text',
+    'iban': 'iban_text',
+}
+
+
+class RequestError(ValueError):
+    """Invalid request payload (answered with 400)."""
+
+
+def parse_names(payload, name_automaton=None):
+    """Raw name records and top_k of a /match payload."""
+    if not isinstance(payload, dict) or not isinstance(payload.get('names'), list):
+        raise RequestError("Oczekiwano obiektu JSON z listą 'names'")
+    names = payload['names']
+    if len(names) > MAX_REQUEST_NAMES:
+        raise RequestError(f"Maksymalnie {MAX_REQUEST_NAMES} nazw w jednym żądaniu")
+
+    top_k = payload.get('top_k', DEFAULT_TOP_K)
+    if not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+        raise RequestError(f"top_k musi być liczbą od 1 do {MAX_TOP_K}")
+
+    records = []
+    for position, item in enumerate(names):
+        if isinstance(item, str):
+            item = {'text': item}
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str) or not item['text'].strip():
+            raise RequestError(f"names[{position}]: brak pola 'text'")
+        options = {argument: str(item[field]) for field, argument in NAME_FIELDS.items() if item.get(field)}
+        fields = parse_raw_name(item['text'].strip(), name_automaton=name_automaton, **options)
+        records.append(raw_name_record(position, fields))
+    return records, top_k
+
+
+def suggestion_payload(suggestion, bailiff):
+    """JSON form of one suggestion with the bailiff's dictionary data."""
+    return {
+        'bailiff_id': bailiff.id,
+        'lastname': bailiff.original_nazwisko,
+        'firstname': bailiff.original_imie,
+        'city': bailiff.original_miasto,
+        'court': bailiff.original_sad,
+        'combined_score': round(suggestion['combined_score'], 2),
+        'confidence_level': suggestion['confidence_level'],
+        'algorithm_used': suggestion['algorithm_used'],
+    }
+
+
+class MatchingService:
+    """Micro-batching matcher over a warm bailiff index.
+
+    `match` may be awaited concurrently; queued names are matched in batches
+    on one background thread (rapidfuzz itself uses `workers` cores).
+    """
+
+    def __init__(self, index, profile, max_batch=MAX_BATCH_NAMES, window=BATCH_WINDOW, workers=-1,
+                 verbose=False):
+        self.index = index
+        self.bailiffs_by_id = {bailiff.id: bailiff for bailiff in index.bailiffs}
+        self.profile = profile
+        self.max_batch = max_batch
+        self.window = window
+        self.workers = workers
+        self.verbose = verbose
+        self.name_automaton = get_name_automaton()
+        self._queue = None
+        self._batcher = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matching-batch")
+        self._devnull = open(os.devnull, 'w')
+
+    @classmethod
+    def from_database(cls, database_url=DATABASE_URL, profile_name=None, **options):
+        engine = create_engine(database_url, echo=False)
+        with engine.connect() as connection:
+            index = BailiffIndex(load_bailiff_records(connection))
+        engine.dispose()
+        return cls(index, get_scoring_profile(profile_name), **options)
+
+    async def start(self):
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.get_running_loop().create_task(self._run_batches())
+
+    async def stop(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._batcher
+            self._batcher = None
+        self._executor.shutdown(wait=False)
+
+    async def match(self, records, top_k=DEFAULT_TOP_K):
+        """Top-k suggestion payloads for each record, in order."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, top_k, future))
+        return await future
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self._queue.get()]
+            size = len(jobs[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                try:
+                    job = await asyncio.wait_for(self._queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                jobs.append(job)
+                size += len(job[0])
+
+            try:
+                results = await loop.run_in_executor(self._executor, self._match_jobs, jobs)
+            except Exception as e:
+                for _, _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(jobs, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _match_jobs(self, jobs):
+        """Match all names of the queued requests as one batch; results split per request."""
+        records = [record for job_records, _, _ in jobs for record in job_records]
+        max_suggestions = max(top_k for _, top_k, _ in jobs)
+        # The matcher's per-name debug output would dominate the request time
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(self._devnull)
+        with output:
+            suggestions = match_batch(records, self.index, profile=self.profile,
+                                      max_suggestions=max_suggestions, workers=self.workers)
+
+        results = []
+        offset = 0
+        for job_records, top_k, _ in jobs:
+            results.append([[suggestion_payload(suggestion, self.bailiffs_by_id[suggestion['bailiff_id']]) for suggestion in name_suggestions[:top_k]]
+                            for name_suggestions in suggestions[offset:offset + len(job_records)]])
+            offset += len(job_records)
+        return results
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json; charset=utf-8'),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class MatchingApp:
+    """ASGI application; the service (and its index) is built at startup."""
+
+    def __init__(self, service_factory):
+        self.service_factory = service_factory
+        self.service = None
+
+    async def _service(self):
+        if self.service is None:
+            print("📚 Ładowanie słownika komorników...")
+            self.service = await asyncio.get_running_loop().run_in_executor(None, self.service_factory)
+            await self.service.start()
+            print(f"✅ Serwis dopasowań gotowy: {len(self.service.index)} komorników, "
+                  f"profil {self.service.profile.key}")
+        return self.service
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._service()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.service is not None:
+                    await self.service.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        method, path = scope['method'], scope['path']
+        if path == '/health' and method == 'GET':
+            service = await self._service()
+            await _send_json(send, 200, {'status': 'ok', 'bailiffs': len(service.index),
+                                         'scoring_profile': service.profile.key})
+        elif path == '/match' and method == 'POST':
+            service = await self._service()
+            try:
+                records, top_k = parse_names(json.loads(await _read_body(receive) or b'null'),
+                                             service.name_automaton)
+            except (RequestError, ValueError) as e:
+                await _send_json(send, 400, {'error': str(e)})
+                return
+            results = await service.match(records, top_k)
+            await _send_json(send, 200, {
+                'scoring_profile': service.profile.key,
+                'results': [{'text': record.raw_text, 'suggestions': suggestions}
+                            for record, suggestions in zip(records, results)],
+            })
+        else:
+            await _send_json(send, 404, {'error': 'Nieznany adres'})
+
+
+app = MatchingApp(MatchingService.from_database)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP serwis dopasowań komorników")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--database', default=DATABASE_URL, help="URL bazy ze słownikiem komorników")
+    parser.add_argument('--profile', default=None, help="Profil punktacji (domyślnie aktywny)")
+    parser.add_argument('--workers', type=int, default=-1, help="Rdzenie dla rapidfuzz (-1 = wszystkie)")
+    parser.add_argument('--verbose', action='store_true', help="Wypisuj diagnostykę dopasowań")
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ Brak serwera ASGI - zainstaluj: pip install uvicorn")
+        return 1
+
+    service_app = MatchingApp(lambda: MatchingService.from_database(
+        args.database, args.profile, workers=args.workers, verbose=args.verbose))
+    uvicorn.run(service_app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Rescore stored match suggestions with another scoring profile.
+
+Only the combination step is repeated: the stored feature vectors are
+reranked in one vectorized pass (older rows without features fall back to
+their component scores and best fullname algorithm), so no candidate
+generation or fuzzy search runs. Combined score, confidence level and
+`scoring_profile` are updated in place.
+
+With --model the learned reranker (see train_reranker.py) scores the stored
+features instead of a profile; rows without features keep their scores.
+--auto-resolve then maps the unmapped names whose top candidate clears the
+model's tuned auto-approve threshold (`RerankerModel.auto_resolve`).
+
+Usage: python archive/scripts/rescore_suggestions.py [--profile rescoring@1 | --model reranker_model.json [--auto-resolve]] [--session 12]
+"""
+
+import argparse
+import sys
+import time
+
+sys.path.append('.')
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from auto_resolution import auto_resolve_session
+from db_migrations import ensure_schema
+from match_features import FEATURE_NAMES, identifier_name_agrees, rerank, unpack_features
+from reranker import load_reranker
+from scoring_profiles import algorithm_key, get_scoring_profile
+from session_storage import session_engines
+from session_versions import bump_data_version
+
+
+def _confidence_levels(profile, combined):
+    """Vectorized `ScoringProfile.confidence` (or `RerankerModel.confidence`)."""
+    return np.where(combined >= profile.thresholds['high'], 'high',
+                    np.where(combined >= profile.thresholds['medium'], 'medium', 'low'))
+
+
+def _load_rows(connection, session_id):
+    """Stored suggestions split into (rows with current-layout features, rows without)."""
+    query = ("SELECT id, fullname_score, lastname_score, firstname_score, city_score, combined_score, "
+             "algorithm_used, features FROM match_suggestions")
+    params = {}
+    if session_id is not None:
+        query += " WHERE session_id = :session_id"
+        params['session_id'] = session_id
+
+    rows = connection.execute(text(query), params).fetchall()
+    feature_size = len(FEATURE_NAMES) * 4
+    with_features = [row for row in rows if row.features is not None and len(row.features) == feature_size]
+    without_features = [row for row in rows if row.features is None or len(row.features) != feature_size]
+    return with_features, without_features
+
+
+def _update_rows(connection, updates, session_id):
+    if updates:
+        connection.execute(text(
+            "UPDATE match_suggestions SET combined_score = :combined_score, "
+            "confidence_level = :confidence_level, scoring_profile = :scoring_profile WHERE id = :id"
+        ), updates)
+        bump_data_version(connection, None if session_id is None else [session_id])
+
+
+def rescore_suggestions(engine, profile=None, session_id=None):
+    """Recombine stored features (or component scores) with `profile`; returns the number of updated rows."""
+    profile = profile or get_scoring_profile()
+    with engine.begin() as connection:
+        with_features, without_features = _load_rows(connection, session_id)
+
+        updates = []
+        # Fast path: one vectorized pass over the stored feature matrix
+        if with_features:
+            combined = rerank(profile, unpack_features([row.features for row in with_features]))
+            levels = _confidence_levels(profile, combined)
+            updates.extend({'id': row.id, 'combined_score': float(score), 'confidence_level': str(level),
+                            'scoring_profile': profile.key}
+                           for row, score, level in zip(with_features, combined, levels))
+
+        # Suggestions stored before features existed: recombine the component scores
+        for row_id, fullname, lastname, firstname, city, old_combined, algorithm_used, _ in without_features:
+            lastname, firstname, city = lastname or 0.0, firstname or 0.0, city or 0.0
+            combined = profile.combine(fullname, lastname, firstname, city, algorithm_key(algorithm_used),
+                                       has_name_parts=bool(lastname and firstname))
+            if (algorithm_used and algorithm_used.startswith('identifier_')
+                    and identifier_name_agrees(lastname, fullname or 0.0)):
+                # Identifier matches keep their score floor, which does not depend on the profile
+                combined = max(combined, old_combined)
+            updates.append({'id': row_id, 'combined_score': combined,
+                            'confidence_level': profile.confidence(combined), 'scoring_profile': profile.key})
+
+        _update_rows(connection, updates, session_id)
+    return len(updates)
+
+
+def rescore_with_reranker(engine, model, session_id=None):
+    """Score stored features with the learned reranker; returns (updated rows, rows without features)."""
+    with engine.begin() as connection:
+        with_features, without_features = _load_rows(connection, session_id)
+        updates = []
+        if with_features:
+            scores = model.score_blobs([row.features for row in with_features])
+            levels = _confidence_levels(model, scores)
+            updates = [{'id': row.id, 'combined_score': float(score), 'confidence_level': str(level),
+                        'scoring_profile': model.key}
+                       for row, score, level in zip(with_features, scores, levels)]
+        _update_rows(connection, updates, session_id)
+    return len(updates), len(without_features)
+
+
+def auto_resolve_with_reranker(engine, model, session_id=None):
+    """Auto-resolve the sessions of `engine` with the model's rule; returns the number of mapped names."""
+    with engine.begin() as connection:
+        query = "SELECT DISTINCT session_id FROM match_suggestions WHERE session_id IS NOT NULL"
+        params = {}
+        if session_id is not None:
+            query += " AND session_id = :session_id"
+            params['session_id'] = session_id
+        session_ids = connection.execute(text(query), params).scalars().all()
+        resolved = sum(auto_resolve_session(connection, resolved_session, model) for resolved_session in session_ids)
+        if resolved:
+            bump_data_version(connection, session_ids)
+    return resolved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profile', default=None, help="Profile name or key (default: active profile)")
+    parser.add_argument('--model', default=None, help="Learned reranker model file instead of a profile")
+    parser.add_argument('--auto-resolve', action='store_true',
+                        help="With --model: map names above the model's auto-approve threshold")
+    parser.add_argument('--session', type=int, default=None, help="Only suggestions of this analysis session")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///bailiffs_matching.db", echo=False)
+    ensure_schema(engine)
+
+    if args.model:
+        model = load_reranker(args.model)
+        print(f"🧠 Przeliczanie sugestii modelem {model.key}...")
+        start_time = time.time()
+        updated = skipped = 0
+        for suggestions_engine in session_engines(engine, args.session):
+            engine_updated, engine_skipped = rescore_with_reranker(suggestions_engine, model, args.session)
+            updated += engine_updated
+            skipped += engine_skipped
+        print(f"✅ Przeliczono {updated} sugestii w {time.time() - start_time:.1f} s")
+        if skipped:
+            print(f"⚠️ {skipped} sugestii bez wektora cech pozostawiono bez zmian")
+        if args.auto_resolve:
+            resolved = sum(auto_resolve_with_reranker(suggestions_engine, model, args.session)
+                           for suggestions_engine in session_engines(engine, args.session))
+            print(f"✅ Automatycznie rozstrzygnięto {resolved} nazw (próg modelu: {model.thresholds['high']:.1f})")
+        return
+
+    profile = get_scoring_profile(args.profile)
+
+    print(f"🎚️ Przeliczanie sugestii profilem {profile.key}...")
+    start_time = time.time()
+    # Sessions with their own database file are rescored in their files
+    updated = sum(rescore_suggestions(suggestions_engine, profile, args.session)
+                  for suggestions_engine in session_engines(engine, args.session))
+    print(f"✅ Przeliczono {updated} sugestii w {time.time() - start_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,32 @@ Matching algorithm script using rapidfuzz for fuzzy matching.
 
 import sys
 from pathlib import Path
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, func, Float, ForeignKey
+sys.path.append('.')
+from sqlalchemy import create_engine, insert, Column, Integer, String, Text, Boolean, DateTime, func, Float, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from rapidfuzz import fuzz, process
 import time
 
+from batch_scoring import MEMMAP_MIN_CELLS, fuzzy_top_k, iter_fuzzy_top_k
+from db_migrations import ensure_schema
+from match_features import (CITY_DIFFERENT, CITY_SAME, CITY_UNRESOLVED, IDENTIFIER_MATCH_SCORE,
+                            component_scores, empty_fullname_scores, fullname_slot, identifier_name_agrees,
+                            pack_features)
+from match_records import BailiffIndex, load_bailiff_records, load_raw_name_records
+from polish_phonetics import phonetic_key
+from scoring_profiles import ALGORITHM_NAMES, get_scoring_profile
+from session_versions import bump_data_version
+from surname_folding import surname_stem
+
+# A blocked candidate scoring at least this (ratio or token sort) on the full name skips the dictionary-wide search
+BLOCK_ACCEPT_SCORE = 85.0
+
+# Same order as match_features.FULLNAME_ALGORITHMS
+FULLNAME_SCORERS = (('ratio', fuzz.ratio),
+                    ('token_sort', fuzz.token_sort_ratio),
+                    ('partial', fuzz.partial_ratio))
+
 # Database models
 Base = declarative_base()
 
@@ -26,7 +46,9 @@ class AnalysisSession(Base):
     total_records = Column(Integer, nullable=True)
     processed_records = Column(Integer, default=0, nullable=False)
     matched_records = Column(Integer, default=0, nullable=False)
+    data_version = Column(Integer, default=0, nullable=False)  # bumped on every change shown in the review UI
     status = Column(String(50), default='uploaded', nullable=False)
+    storage_file = Column(String(500), nullable=True)  # own database file of the session (session_storage)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -49,6 +71,12 @@ class BailiffDict(Base):
     normalized_firstname = Column(String(100), nullable=True)
     normalized_fullname = Column(Text, nullable=True)
     normalized_city = Column(String(100), nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    court_key = Column(String(200), nullable=True, index=True)
+    api_row_id = Column(String(100), nullable=True, index=True)
+    api_updated_at = Column(String(40), nullable=True)
+    canonical_id = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class RawNames(Base):
@@ -56,7 +84,7 @@ class RawNames(Base):
     __tablename__ = 'raw_names'
     
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     source_file = Column(String(500), nullable=False)
     source_sheet = Column(String(100), nullable=True)
     source_row = Column(Integer, nullable=True)
@@ -71,6 +99,13 @@ class RawNames(Base):
     source_email = Column(String(200), nullable=True)
     source_phone = Column(String(50), nullable=True)
     source_address = Column(String(500), nullable=True)
+    source_iban = Column(String(50), nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    source_postal_code = Column(String(20), nullable=True, index=True)
+    source_district_code = Column(String(20), nullable=True)
+    source_court = Column(Text, nullable=True)
+    court_key = Column(String(200), nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class MatchSuggestions(Base):
@@ -78,7 +113,7 @@ class MatchSuggestions(Base):
     __tablename__ = 'match_suggestions'
     
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     raw_id = Column(Integer, ForeignKey('raw_names.id'), nullable=False)
     bailiff_id = Column(Integer, ForeignKey('bailiffs_dict.id'), nullable=False)
     
@@ -92,6 +127,8 @@ class MatchSuggestions(Base):
     # Algorithm info
     algorithm_used = Column(String(50), nullable=False)
     confidence_level = Column(String(20), nullable=False)  # 'high', 'medium', 'low'
+    scoring_profile = Column(String(50), nullable=True)  # e.g. 'default@1'
+    features = Column(LargeBinary, nullable=True)  # packed match_features.FEATURE_NAMES
     
     # System fields
     created_at = Column(DateTime, default=func.now(), nullable=False)
@@ -109,14 +146,23 @@ def setup_database():
     
     # Create new tables if they don't exist
     Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
     print("✅ Połączono z bazą danych")
     return engine, SessionLocal
 
-def calculate_city_score(raw_city, bailiff_city):
-    """Calculate city matching score."""
+def calculate_city_score(raw_city, bailiff_city, raw_city_id=None, bailiff_city_id=None):
+    """Calculate city matching score.
+
+    When both cities resolve in the gazetteer the score is an id comparison
+    (so "Mikołowie" scores 100 against "Mikołów"); fuzzy ratio is only the
+    fallback for cities the gazetteer does not know.
+    """
+    if raw_city_id is not None and bailiff_city_id is not None:
+        return 100.0 if raw_city_id == bailiff_city_id else 0.0
+    
     if not raw_city or not bailiff_city:
         return 0.0
     
@@ -130,21 +176,26 @@ def calculate_city_score(raw_city, bailiff_city):
     # Use fuzzy matching for cities
     return fuzz.ratio(raw_city_clean, bailiff_city_clean)
 
-def match_single_name(raw_name, bailiffs_dict, city_bonus=True, session_id=None):
-    """Match a single raw name against the bailiffs dictionary using multiple algorithms."""
-    print(f"🔍 DEBUG run_matching: Rozpoczynanie dopasowywania dla '{raw_name.raw_text}'")
-    print(f"🔍 DEBUG run_matching: Normalized text: '{raw_name.normalized_text}'")
-    print(f"🔍 DEBUG run_matching: Source city: '{raw_name.source_city}'")
-    
-    if not raw_name.normalized_text:
-        print("❌ DEBUG run_matching: Brak znormalizowanego tekstu!")
-        return []
-    
-    # Prepare search text - try multiple variants
-    search_text = raw_name.normalized_text
-    
-    # Create alternative search texts
-    search_variants = [search_text]
+def _add_direct_candidates(index, positions, search_variants, all_matches):
+    """Score bailiffs found by a direct key lookup or blocking that fuzzy search did not return."""
+    for position in positions:
+        if position in all_matches:
+            continue
+        scores = all_matches[position] = empty_fullname_scores()
+        for variant_index, search_variant in enumerate(search_variants):
+            for bailiff_text in index.variant_texts[position]:
+                for algorithm_index, (_, scorer) in enumerate(FULLNAME_SCORERS):
+                    slot = fullname_slot(variant_index, algorithm_index)
+                    scores[slot] = max(scores[slot], scorer(search_variant, bailiff_text))
+
+def _best_name_score(scores):
+    """Best ratio or token-sort fullname score of a candidate over all search variants."""
+    return max(score for slot, score in enumerate(scores)
+               if FULLNAME_SCORERS[slot % len(FULLNAME_SCORERS)][0] != 'partial')
+
+def _search_variants(raw_name):
+    """Texts of a raw name searched in the dictionary (see match_features.SEARCH_VARIANTS)."""
+    search_variants = [raw_name.normalized_text]
     
     # Add lastname + firstname combination if available
     if raw_name.extracted_lastname and raw_name.extracted_firstname:
@@ -152,199 +203,249 @@ def match_single_name(raw_name, bailiffs_dict, city_bonus=True, session_id=None)
         firstname_lastname = f"{raw_name.extracted_firstname} {raw_name.extracted_lastname}".lower()
         search_variants.extend([lastname_firstname, firstname_lastname])
     
-    print(f"🔍 DEBUG run_matching: Search variants: {search_variants}")
-    
-    # Create list of bailiff texts for matching
-    bailiff_texts = []
-    bailiff_lookup = {}
+    return search_variants
+
+def _identifier_confirmed(index, position, scores, raw_lastname, raw_phonetic, raw_stem):
+    """Whether the name of a bailiff found by an identifier agrees with the raw name.
+
+    Same lastname and fullname scores as `component_scores` computes later.
+    """
+    bailiff = index.bailiffs[position]
+    if (raw_phonetic and raw_phonetic == bailiff.phonetic_lastname) or (raw_stem and raw_stem == bailiff.surname_stem):
+        return True
+    bailiff_lastname = index.lastnames[position]
+    lastname_score = 0.0
+    if raw_lastname and bailiff_lastname:
+        lastname_score = max(fuzz.ratio(raw_lastname, bailiff_lastname), fuzz.partial_ratio(raw_lastname, bailiff_lastname))
+    return bool(identifier_name_agrees(lastname_score, max(scores)))
+
+def _generate_candidates(index, raw_name, search_variants, raw_phonetic, raw_stem, fuzzy_hits=None):
+    """Collect candidate bailiffs with their best fullname scores per algorithm.
+
+    Returns (scores by index position, identifier hits). A raw name sharing an
+    IBAN, e-mail or phone with a bailiff whose name agrees is resolved by that
+    lookup alone; otherwise the court/postal block, fuzzy search and direct
+    key channels run (identifier hits stay among the candidates).
+    `fuzzy_hits[variant][algorithm]` are precomputed (score, text position)
+    search results (see `match_batch`); without them each search runs here.
+    """
+    # Scores are keyed by position in the index
+    all_matches = {}
     
-    for bailiff in bailiffs_dict:
-        # Create multiple representations of each bailiff
-        bailiff_variants = []
-        
-        if bailiff.normalized_fullname:
-            bailiff_variants.append(bailiff.normalized_fullname)
+    identifier_hits = index.identifier_candidates(raw_name)
+    if identifier_hits:
+        print(f"🔍 DEBUG run_matching: Dopasowanie po identyfikatorze: {identifier_hits}")
+        _add_direct_candidates(index, identifier_hits, search_variants, all_matches)
+        raw_lastname = raw_name.extracted_lastname.lower() if raw_name.extracted_lastname else ''
+        if any(_identifier_confirmed(index, position, all_matches[position], raw_lastname, raw_phonetic, raw_stem)
+               for position in identifier_hits):
+            return all_matches, identifier_hits
+        print("⚠️ DEBUG run_matching: Nazwisko nie zgadza się z identyfikatorem - pełne wyszukiwanie")
+    
+    # Blocking: bailiffs at the same court (or postal district) are scored first
+    block = index.block_candidates(raw_name)
+    _add_direct_candidates(index, block, search_variants, all_matches)
+    blocked = any(_best_name_score(scores) >= BLOCK_ACCEPT_SCORE for scores in all_matches.values())
+    if block:
+        print(f"🔍 DEBUG run_matching: Blok sąd/kod pocztowy: {len(block)} komorników, "
+              f"{'wystarczający' if blocked else 'przeszukiwanie całego słownika'}")
+    
+    # Try multiple matching algorithms over the whole dictionary unless the block already matched
+    for variant_index, search_variant in enumerate([] if blocked else search_variants):
+        print(f"🔍 DEBUG run_matching: Testowanie wariantu: '{search_variant}'")
         
-        # Add lastname + firstname variant
-        if bailiff.normalized_lastname and bailiff.normalized_firstname:
-            lastname_firstname = f"{bailiff.normalized_lastname} {bailiff.normalized_firstname}"
-            firstname_lastname = f"{bailiff.normalized_firstname} {bailiff.normalized_lastname}"
-            bailiff_variants.extend([lastname_firstname, firstname_lastname])
-        elif bailiff.normalized_lastname:
-            bailiff_variants.append(bailiff.normalized_lastname)
+        for algorithm_index, (_, scorer) in enumerate(FULLNAME_SCORERS):
+            if fuzzy_hits is not None:
+                matches = fuzzy_hits[variant_index][algorithm_index]
+            else:
+                matches = [(score, text_position)
+                           for _, score, text_position in process.extract(search_variant, index.texts, scorer=scorer, limit=20)]
+            slot = fullname_slot(variant_index, algorithm_index)
             
-        # Add original name variants
-        if bailiff.original_nazwisko and bailiff.original_imie:
-            original_full = f"{bailiff.original_nazwisko.lower()} {bailiff.original_imie.lower()}"
-            bailiff_variants.append(original_full)
-        
-        # Store all variants
-        for variant in bailiff_variants:
-            if variant and variant not in bailiff_lookup:
-                bailiff_texts.append(variant)
-                bailiff_lookup[variant] = bailiff
+            for score, text_position in matches:
+                best = all_matches.setdefault(index.text_owner[text_position], empty_fullname_scores())
+                best[slot] = max(best[slot], score)
     
-    print(f"✅ DEBUG run_matching: Przygotowano {len(bailiff_texts)} tekstów komorników do dopasowania")
+    # Direct lookup channels: spelling variants (phonetic key) and gender forms (surname stem)
+    # that the fuzzy top-k may miss, found with O(1) dict lookups
+    _add_direct_candidates(index, index.phonetic_candidates(raw_phonetic), search_variants, all_matches)
+    _add_direct_candidates(index, index.stem_candidates(raw_stem), search_variants, all_matches)
     
-    if not bailiff_texts:
-        print("❌ DEBUG run_matching: Brak tekstów komorników do dopasowania!")
+    return all_matches, identifier_hits
+
+def match_single_name(raw_name, bailiffs_dict, city_bonus=True, session_id=None, profile=None,
+                      max_suggestions=5, fuzzy_hits=None):
+    """Match a single raw name against the bailiffs dictionary using multiple algorithms.
+
+    `raw_name` is a `RawNameRecord` (or anything with the same attributes) and
+    `bailiffs_dict` a prebuilt `BailiffIndex`; a plain list of bailiff records
+    is indexed on the fly. Scores are combined with `profile` (the active
+    `ScoringProfile` by default). Returns the best `max_suggestions` plain
+    suggestion dicts keyed by `MatchSuggestions` column names - persisting
+    them is up to the caller.
+    """
+    print(f"🔍 DEBUG run_matching: Rozpoczynanie dopasowywania dla '{raw_name.raw_text}'")
+    print(f"🔍 DEBUG run_matching: Normalized text: '{raw_name.normalized_text}'")
+    print(f"🔍 DEBUG run_matching: Source city: '{raw_name.source_city}'")
+    
+    if not raw_name.normalized_text:
+        print("❌ DEBUG run_matching: Brak znormalizowanego tekstu!")
         return []
     
-    # Try multiple matching algorithms
-    all_matches = {}
+    index = bailiffs_dict if isinstance(bailiffs_dict, BailiffIndex) else BailiffIndex(bailiffs_dict)
+    profile = profile or get_scoring_profile()
     
-    for search_variant in search_variants:
-        print(f"🔍 DEBUG run_matching: Testowanie wariantu: '{search_variant}'")
-        
-        # Algorithm 1: Standard ratio
-        matches_ratio = process.extract(
-            search_variant, 
-            bailiff_texts, 
-            scorer=fuzz.ratio,
-            limit=20
-        )
-        
-        # Algorithm 2: Token sort ratio (better for reordered words)
-        matches_token_sort = process.extract(
-            search_variant, 
-            bailiff_texts, 
-            scorer=fuzz.token_sort_ratio,
-            limit=20
-        )
-        
-        # Algorithm 3: Partial ratio (better for partial matches)
-        matches_partial = process.extract(
-            search_variant, 
-            bailiff_texts, 
-            scorer=fuzz.partial_ratio,
-            limit=20
-        )
-        
-        # Combine all matches
-        for match_text, score, _ in matches_ratio:
-            bailiff_id = bailiff_lookup[match_text].id
-            if bailiff_id not in all_matches:
-                all_matches[bailiff_id] = {'bailiff': bailiff_lookup[match_text], 'scores': []}
-            all_matches[bailiff_id]['scores'].append(('ratio', score))
-            
-        for match_text, score, _ in matches_token_sort:
-            bailiff_id = bailiff_lookup[match_text].id
-            if bailiff_id not in all_matches:
-                all_matches[bailiff_id] = {'bailiff': bailiff_lookup[match_text], 'scores': []}
-            all_matches[bailiff_id]['scores'].append(('token_sort', score))
-            
-        for match_text, score, _ in matches_partial:
-            bailiff_id = bailiff_lookup[match_text].id
-            if bailiff_id not in all_matches:
-                all_matches[bailiff_id] = {'bailiff': bailiff_lookup[match_text], 'scores': []}
-            all_matches[bailiff_id]['scores'].append(('partial', score))
+    # Prepare search texts - try multiple variants
+    search_variants = _search_variants(raw_name)
+    
+    print(f"🔍 DEBUG run_matching: Search variants: {search_variants}")
+    
+    if not index.texts:
+        print("❌ DEBUG run_matching: Brak tekstów komorników do dopasowania!")
+        return []
+    
+    raw_phonetic = raw_name.phonetic_lastname or phonetic_key(raw_name.extracted_lastname)
+    raw_stem = raw_name.surname_stem or surname_stem(raw_name.extracted_lastname)
+    all_matches, identifier_hits = _generate_candidates(index, raw_name, search_variants, raw_phonetic, raw_stem,
+                                                         fuzzy_hits)
     
     print(f"✅ DEBUG run_matching: Znaleziono {len(all_matches)} unikalnych kandydatów")
     
+    raw_lastname = raw_name.extracted_lastname.lower() if raw_name.extracted_lastname else ''
+    raw_firstname = raw_name.extracted_firstname.lower() if raw_name.extracted_firstname else ''
+    raw_city = raw_name.source_city.lower().strip() if raw_name.source_city else ''
+    raw_city_id = index.resolve_city(raw_name)
+    
     suggestions = []
     
-    for bailiff_id, match_data in all_matches.items():
-        bailiff = match_data['bailiff']
-        scores = match_data['scores']
+    for position, scores in all_matches.items():
+        bailiff = index.bailiffs[position]
+        identifier_kinds = identifier_hits.get(position)
         
-        # Calculate best scores for each algorithm
-        best_ratio = max([s[1] for s in scores if s[0] == 'ratio'], default=0)
-        best_token_sort = max([s[1] for s in scores if s[0] == 'token_sort'], default=0)
-        best_partial = max([s[1] for s in scores if s[0] == 'partial'], default=0)
-        
-        # Use the best overall fullname score
-        fullname_score = max(best_ratio, best_token_sort, best_partial)
-        
-        # Skip very low scores
-        if fullname_score < 40:
+        # Skip very low scores (an identifier match is kept whatever the name looks like)
+        if max(scores) < 40 and not identifier_kinds:
             continue
         
-        # Calculate individual component scores
-        lastname_score = 0.0
-        firstname_score = 0.0
+        # Calculate individual component features
+        lastname_ratio = lastname_partial = firstname_ratio = firstname_partial = 0.0
         
-        if raw_name.extracted_lastname and bailiff.normalized_lastname:
+        bailiff_lastname = index.lastnames[position]
+        if raw_lastname and bailiff_lastname:
             # Use multiple algorithms for lastname too
-            lastname_ratio = fuzz.ratio(raw_name.extracted_lastname.lower(), bailiff.normalized_lastname.lower())
-            lastname_partial = fuzz.partial_ratio(raw_name.extracted_lastname.lower(), bailiff.normalized_lastname.lower())
-            lastname_score = max(lastname_ratio, lastname_partial)
+            lastname_ratio = fuzz.ratio(raw_lastname, bailiff_lastname)
+            lastname_partial = fuzz.partial_ratio(raw_lastname, bailiff_lastname)
         
-        if raw_name.extracted_firstname and bailiff.normalized_firstname:
+        bailiff_firstname = index.firstnames[position]
+        if raw_firstname and bailiff_firstname:
             # Use multiple algorithms for firstname too
-            firstname_ratio = fuzz.ratio(raw_name.extracted_firstname.lower(), bailiff.normalized_firstname.lower())
-            firstname_partial = fuzz.partial_ratio(raw_name.extracted_firstname.lower(), bailiff.normalized_firstname.lower())
-            firstname_score = max(firstname_ratio, firstname_partial)
-        
-        # Calculate city score
-        city_score = calculate_city_score(raw_name.source_city, bailiff.original_miasto)
-        
-        # Improved combined score calculation with proper weights (max 100%)
-        combined_score = (
-            fullname_score * 0.5 +      # 50% weight for full name
-            lastname_score * 0.25 +     # 25% weight for last name  
-            firstname_score * 0.15 +    # 15% weight for first name
-            city_score * 0.1           # 10% weight for city
-        )
+            firstname_ratio = fuzz.ratio(raw_firstname, bailiff_firstname)
+            firstname_partial = fuzz.partial_ratio(raw_firstname, bailiff_firstname)
         
-        # City bonus as multiplier (up to 10% boost for excellent city match)
-        city_multiplier = 1.0
-        if city_bonus and city_score >= 80:
-            city_multiplier = 1.1  # 10% boost
-        elif city_bonus and city_score >= 60:
-            city_multiplier = 1.05  # 5% boost
+        # Same phonetic key: a spelling variant (rz/ż, ch/h, ó/u, -ski/-ska), not a typo;
+        # same stem: gender forms of one surname
+        phonetic_match = bool(raw_phonetic) and raw_phonetic == bailiff.phonetic_lastname
+        stem_match = bool(raw_stem) and raw_stem == bailiff.surname_stem
         
-        # Algorithm bonus as multiplier for better algorithms
-        algorithm_multiplier = 1.0
-        if best_token_sort > best_ratio:
-            algorithm_multiplier = 1.05  # 5% boost
-            algorithm_used = 'rapidfuzz_token_sort_ratio'
-        elif best_partial > best_ratio:
-            algorithm_multiplier = 1.03  # 3% boost
-            algorithm_used = 'rapidfuzz_partial_ratio'
-        else:
-            algorithm_used = 'rapidfuzz_ratio'
-        
-        # Apply multipliers and cap at 100%
-        combined_score = combined_score * city_multiplier * algorithm_multiplier
-        combined_score = min(combined_score, 100.0)  # Cap at 100%
-        
-        # Determine confidence level with improved thresholds
-        if combined_score >= 85:
-            confidence = 'high'
-        elif combined_score >= 65:
-            confidence = 'medium'
+        # Calculate city score
+        bailiff_city_id = index.city_ids[position]
+        city_score = calculate_city_score(raw_city, index.cities[position], raw_city_id, bailiff_city_id)
+        if raw_city_id is None or bailiff_city_id is None:
+            city_id_match = CITY_UNRESOLVED
         else:
-            confidence = 'low'
+            city_id_match = CITY_SAME if raw_city_id == bailiff_city_id else CITY_DIFFERENT
+        
+        has_name_parts = bool(raw_lastname and raw_firstname and bailiff_lastname and bailiff_firstname)
+        
+        # Raw feature vector (see match_features.FEATURE_NAMES); all scores below derive from it
+        features = scores + [
+            lastname_ratio, lastname_partial, firstname_ratio, firstname_partial,
+            float(phonetic_match), float(stem_match),
+            city_score, city_id_match,
+            float(has_name_parts), float(bool(identifier_kinds)),
+            float(bool(identifier_kinds) and len(identifier_hits) == 1),
+        ]
+        fullname_score, lastname_score, firstname_score, city_score, algorithm, has_name_parts = \
+            component_scores(features)
+        
+        algorithm_used = ALGORITHM_NAMES[algorithm]
+        combined_score = profile.combine(fullname_score, lastname_score, firstname_score, city_score,
+                                         algorithm, city_bonus, has_name_parts)
+        
+        # Same IBAN, e-mail or phone and an agreeing name: near-certain whatever the spelling, unless
+        # the identifier is shared (one office e-mail for a bailiff and a deputy) - then names decide
+        if identifier_kinds:
+            if len(identifier_hits) == 1 and identifier_name_agrees(lastname_score, fullname_score):
+                combined_score = max(combined_score, IDENTIFIER_MATCH_SCORE)
+            algorithm_used = 'identifier_' + '+'.join(identifier_kinds)
+        
+        confidence = profile.confidence(combined_score)
         
         if len(suggestions) < 3:  # Debug first few suggestions
             print(f"🔍 DEBUG run_matching: Sugestia dla '{bailiff.original_nazwisko}': fullname={fullname_score:.1f}, combined={combined_score:.1f}, confidence={confidence}")
         
-        suggestion = MatchSuggestions(
-            raw_id=raw_name.id,
-            bailiff_id=bailiff.id,
-            session_id=session_id,
-            fullname_score=fullname_score,
-            lastname_score=lastname_score,
-            firstname_score=firstname_score,
-            city_score=city_score,
-            combined_score=combined_score,
-            algorithm_used=algorithm_used,
-            confidence_level=confidence
-        )
-        
-        suggestions.append(suggestion)
+        suggestions.append({
+            'raw_id': raw_name.id,
+            'bailiff_id': bailiff.id,
+            'session_id': session_id,
+            'fullname_score': fullname_score,
+            'lastname_score': lastname_score,
+            'firstname_score': firstname_score,
+            'city_score': city_score,
+            'combined_score': combined_score,
+            'algorithm_used': algorithm_used,
+            'confidence_level': confidence,
+            'scoring_profile': profile.key,
+            'features': pack_features(features)
+        })
     
     # Sort by combined score
-    suggestions.sort(key=lambda x: x.combined_score, reverse=True)
+    suggestions.sort(key=lambda x: x['combined_score'], reverse=True)
     print(f"✅ DEBUG run_matching: Wygenerowano {len(suggestions)} sugestii dla '{raw_name.raw_text}'")
     
-    # Return top 5 suggestions
-    final_suggestions = suggestions[:5]
+    # Return the top suggestions
+    final_suggestions = suggestions[:max_suggestions]
     if final_suggestions:
-        print(f"🔍 DEBUG run_matching: Najlepsza sugestia: wynik={final_suggestions[0].combined_score:.1f}")
+        print(f"🔍 DEBUG run_matching: Najlepsza sugestia: wynik={final_suggestions[0]['combined_score']:.1f}")
     
     return final_suggestions
 
+def iter_match_batch(raw_names, bailiffs_dict, city_bonus=True, session_id=None, profile=None,
+                     max_suggestions=5, workers=-1, score_dir=None):
+    """`match_batch` yielding the suggestions of one name at a time.
+
+    A batch whose searches reach `batch_scoring.MEMMAP_MIN_CELLS` scores is
+    scored into disk-backed blocks (temporary files in `score_dir`), and
+    names are matched while streaming over the blocks, so memory stays
+    bounded for batches of any size.
+    """
+    index = bailiffs_dict if isinstance(bailiffs_dict, BailiffIndex) else BailiffIndex(bailiffs_dict)
+    variants = [_search_variants(raw_name) if raw_name.normalized_text else [] for raw_name in raw_names]
+    queries = [variant for name_variants in variants for variant in name_variants]
+    if len(queries) * len(index.texts) >= MEMMAP_MIN_CELLS:
+        hits_by_scorer = [iter_fuzzy_top_k(queries, index.texts, scorer, workers=workers, score_dir=score_dir)
+                          for _, scorer in FULLNAME_SCORERS]
+    else:
+        hits_by_scorer = [fuzzy_top_k(queries, index.texts, scorer, workers=workers) for _, scorer in FULLNAME_SCORERS]
+    # Hits of each query, one entry per scorer
+    query_hits = zip(*hits_by_scorer)
+    
+    for raw_name, name_variants in zip(raw_names, variants):
+        fuzzy_hits = [next(query_hits) for _ in name_variants]
+        yield match_single_name(raw_name, index, city_bonus=city_bonus, session_id=session_id,
+                                profile=profile, max_suggestions=max_suggestions, fuzzy_hits=fuzzy_hits)
+
+def match_batch(raw_names, bailiffs_dict, city_bonus=True, session_id=None, profile=None,
+                max_suggestions=5, workers=-1):
+    """Match a batch of raw names with one vectorized fuzzy search per algorithm.
+
+    Same results as `match_single_name` for each name (returned as a list of
+    suggestion lists, parallel to `raw_names`), but the dictionary-wide
+    searches of the whole batch run as a single `process.cdist` call per
+    scorer on `workers` cores.
+    """
+    return list(iter_match_batch(raw_names, bailiffs_dict, city_bonus=city_bonus, session_id=session_id,
+                                 profile=profile, max_suggestions=max_suggestions, workers=workers))
+
 def run_matching_algorithm(session_class, batch_size=50):
     """Run the matching algorithm for all raw names."""
     print("🚀 Uruchamianie algorytmu dopasowywania...")
@@ -354,17 +455,21 @@ def run_matching_algorithm(session_class, batch_size=50):
     try:
         # Load all bailiffs into memory for faster matching
         print("📚 Ładowanie słownika komorników...")
-        bailiffs_dict = session.query(BailiffDict).all()
+        bailiffs_dict = BailiffIndex(load_bailiff_records(session.connection()))
         print(f"   Załadowano: {len(bailiffs_dict)} komorników")
         
+        profile = get_scoring_profile()
+        print(f"🎚️ Profil punktacji: {profile.key}")
+        
         # Get all raw names to process
         print("📝 Pobieranie nazw do dopasowania...")
-        raw_names = session.query(RawNames).all()
+        raw_names = load_raw_name_records(session.connection(), only_unprocessed=False)
         print(f"   Do przetworzenia: {len(raw_names)} nazw")
         
-        # Clear existing suggestions
+        # Clear existing suggestions; every session's cached review data is stale from here on
         print("🧹 Czyszczenie poprzednich sugestii...")
         session.query(MatchSuggestions).delete()
+        bump_data_version(session.connection())
         session.commit()
         
         # Process in batches
@@ -372,18 +477,19 @@ def run_matching_algorithm(session_class, batch_size=50):
         total_suggestions = 0
         start_time = time.time()
         
+        # One streamed batch over all names (disk-backed score blocks when large), saved in batch_size chunks
+        matched = iter_match_batch(raw_names, bailiffs_dict, profile=profile)
         for i in range(0, len(raw_names), batch_size):
             batch = raw_names[i:i+batch_size]
             batch_suggestions = []
             
-            for raw_name in batch:
-                suggestions = match_single_name(raw_name, bailiffs_dict)
+            for raw_name, suggestions in zip(batch, matched):
                 batch_suggestions.extend(suggestions)
                 total_suggestions += len(suggestions)
             
             # Save batch to database
             if batch_suggestions:
-                session.add_all(batch_suggestions)
+                session.execute(insert(MatchSuggestions), batch_suggestions)
                 session.commit()
             
             total_processed += len(batch)
@@ -397,6 +503,9 @@ def run_matching_algorithm(session_class, batch_size=50):
                   f"({(total_processed/len(raw_names)*100):.1f}%) "
                   f"- {rate:.1f} nazw/sek - ETA: {eta:.0f}s")
         
+        bump_data_version(session.connection())
+        session.commit()
+        
         # Final stats
         elapsed = time.time() - start_time
         print(f"\n📊 Wyniki dopasowywania:")
@@ -412,9 +521,10 @@ def run_matching_algorithm(session_class, batch_size=50):
         med_conf = session.query(MatchSuggestions).filter(MatchSuggestions.confidence_level == 'medium').count()
         low_conf = session.query(MatchSuggestions).filter(MatchSuggestions.confidence_level == 'low').count()
         
-        print(f"   Wysoka pewność (≥90%): {high_conf}")
-        print(f"   Średnia pewność (70-89%): {med_conf}")
-        print(f"   Niska pewność (<70%): {low_conf}")
+        high, medium = profile.thresholds['high'], profile.thresholds['medium']
+        print(f"   Wysoka pewność (≥{high:g}%): {high_conf}")
+        print(f"   Średnia pewność ({medium:g}-{high:g}%): {med_conf}")
+        print(f"   Niska pewność (<{medium:g}%): {low_conf}")
         
         # Show some examples
         print(f"\n📝 Przykłady najlepszych dopasowań:")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Search the dane.gov.pl bailiff registry by surname or first name.
+
+Searches the local registry snapshot (see `registry_snapshot`); the registry
+is downloaded only when there is no snapshot yet, when it is older than the
+TTL (one conditional request if nothing changed) or with --refresh.
+
+Usage: python archive/scripts/search_registry.py kowal [--limit 20] [--refresh] [--endpoint URL]
+"""
+
+import argparse
+import sys
+import time
+
+sys.path.append('.')
+
+from dictionary_sync import BAILIFFS_ENDPOINT, DaneGovSyncClient, SyncError
+from registry_snapshot import SNAPSHOT_TTL, RegistrySnapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('term', help="Fragment nazwiska lub imienia")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--refresh', action='store_true', help="Sprawdź rejestr przed wyszukiwaniem")
+    parser.add_argument('--ttl', type=int, default=SNAPSHOT_TTL, help="Ważność migawki w sekundach")
+    parser.add_argument('--endpoint', default=BAILIFFS_ENDPOINT)
+    args = parser.parse_args()
+
+    snapshot = RegistrySnapshot(DaneGovSyncClient(args.endpoint), ttl=args.ttl)
+    try:
+        if args.refresh or snapshot.index is None or snapshot.age >= snapshot.ttl:
+            changed = snapshot.refresh()
+            print(f"📡 Migawka rejestru {'zaktualizowana' if changed else 'aktualna'}: {len(snapshot.index)} komorników")
+    except SyncError as e:
+        if snapshot.index is None:
+            print(f"❌ Nie udało się pobrać rejestru: {e}")
+            return 1
+        print(f"⚠️ Nie udało się odświeżyć rejestru ({e}) - wyszukiwanie w poprzedniej migawce")
+
+    start_time = time.perf_counter()
+    hits = snapshot.search(args.term, args.limit)
+    elapsed = (time.perf_counter() - start_time) * 1e6
+    for row in hits:
+        print(f"   {row.nazwisko} {row.imie or ''} - {row.miasto or 'Brak'} ({row.sad or row.apelacja or 'Brak'})")
+    print(f"🔍 {len(hits)} wyników w {elapsed:.0f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -6,22 +6,43 @@ import sys
 sys.path.append('.')
 sys.path.append('scripts')
 
-from run_matching import match_single_name, RawNames, BailiffDict, MatchSuggestions
+from run_matching import iter_match_batch, RawNames, MatchSuggestions
 from add_session_support import AnalysisSession
-from sqlalchemy import create_engine
+from auto_resolution import auto_resolve_session
+from db_migrations import ensure_schema
+from match_records import BailiffIndex, load_bailiff_records, load_raw_name_records
+from scoring_profiles import get_scoring_profile
+from session_storage import session_database
+from sqlalchemy import create_engine, delete, insert, update
 from sqlalchemy.orm import sessionmaker
 import time
 
-def run_matching_for_session(session_id, max_suggestions=5):
-    """Run matching algorithm for all unprocessed names in a session."""
+def _write_batch(session, raw_ids, suggestions):
+    """Persist one batch of match results with set-based statements."""
+    session.execute(delete(MatchSuggestions).where(MatchSuggestions.raw_id.in_(raw_ids)))
+    if suggestions:
+        session.execute(insert(MatchSuggestions), suggestions)
+    session.execute(update(RawNames).where(RawNames.id.in_(raw_ids)).values(is_processed=True))
+
+def run_matching_for_session(session_id, max_suggestions=5, auto_resolve=True):
+    """Run matching algorithm for all unprocessed names in a session.
+
+    With `auto_resolve`, unambiguous names (see the profile's `auto_resolve`
+    rule) are mapped at the end without review.
+    """
     print(f"🔍 DEBUG session_matching: Rozpoczynanie dopasowywania dla sesji {session_id}")
     
     try:
         print("🔍 DEBUG session_matching: Próba połączenia z bazą danych...")
         engine = create_engine("sqlite:///bailiffs_matching.db", echo=False)
+        ensure_schema(engine)
         print("✅ DEBUG session_matching: Połączenie z bazą danych utworzone")
         
         SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        # Sessions with their own database file are matched there (the dictionary is attached)
+        store = session_database(engine, session_id)
+        if store:
+            SessionLocal = store[1]
         session = SessionLocal()
         print("✅ DEBUG session_matching: Sesja bazy danych utworzona")
         
@@ -35,7 +56,7 @@ def run_matching_for_session(session_id, max_suggestions=5):
         
         # Get all bailiffs for matching
         print("🔍 DEBUG session_matching: Ładowanie komorników z bazy...")
-        bailiffs = session.query(BailiffDict).all()
+        bailiffs = BailiffIndex(load_bailiff_records(session.connection()))
         print(f"✅ DEBUG session_matching: Załadowano {len(bailiffs)} komorników")
         
         if not bailiffs:
@@ -44,10 +65,7 @@ def run_matching_for_session(session_id, max_suggestions=5):
         
         # Get unprocessed raw names for this session
         print(f"🔍 DEBUG session_matching: Szukanie nieprzetworowych nazwisk w sesji {session_id}...")
-        raw_names = session.query(RawNames).filter(
-            RawNames.session_id == session_id,
-            RawNames.is_processed == False
-        ).all()
+        raw_names = load_raw_name_records(session.connection(), session_id=session_id)
         print(f"✅ DEBUG session_matching: Znaleziono {len(raw_names)} nieprzetworonych nazwisk")
         
         if not raw_names:
@@ -57,11 +75,19 @@ def run_matching_for_session(session_id, max_suggestions=5):
             return True, "No unprocessed names found"
         
         print(f"🔍 DEBUG session_matching: Processing {len(raw_names)} names...")
+        profile = get_scoring_profile()
+        print(f"🔍 DEBUG session_matching: Profil punktacji: {profile.key}")
         
         total_suggestions = 0
         start_time = time.time()
         
-        for i, raw_name in enumerate(raw_names, 1):
+        batch_ids = []
+        batch_suggestions = []
+        
+        # All names are scored in one streamed batch (disk-backed score blocks for large sessions)
+        matched = iter_match_batch(raw_names, bailiffs, city_bonus=True, session_id=session_id, profile=profile,
+                                   max_suggestions=max_suggestions)
+        for i, (raw_name, suggestions) in enumerate(zip(raw_names, matched), 1):
             if i % 100 == 0:
                 elapsed = time.time() - start_time
                 rate = i / elapsed if elapsed > 0 else 0
@@ -69,49 +95,39 @@ def run_matching_for_session(session_id, max_suggestions=5):
             elif i <= 5:  # Debug first 5 names
                 print(f"🔍 DEBUG session_matching: Przetwarzanie nazwiska {i}: '{raw_name.raw_text}'")
             
-            # Clear any existing suggestions for this raw_name
-            existing_count = session.query(MatchSuggestions).filter(
-                MatchSuggestions.raw_id == raw_name.id
-            ).count()
-            if existing_count > 0:
-                print(f"🔍 DEBUG session_matching: Usuwanie {existing_count} istniejących sugestii dla '{raw_name.raw_text}'")
-            
-            session.query(MatchSuggestions).filter(
-                MatchSuggestions.raw_id == raw_name.id
-            ).delete()
-            
-            # Get top matches
-            print(f"🔍 DEBUG session_matching: Wywołanie match_single_name dla '{raw_name.raw_text}'...")
-            suggestions = match_single_name(raw_name, bailiffs, city_bonus=True, session_id=session_id)
             print(f"✅ DEBUG session_matching: Otrzymano {len(suggestions)} sugestii dla '{raw_name.raw_text}'")
-            
-            # Limit to max_suggestions
-            suggestions = suggestions[:max_suggestions]
-            
-            # Save suggestions to database
-            for j, suggestion in enumerate(suggestions):
-                if i <= 3:  # Debug first 3 names
-                    print(f"🔍 DEBUG session_matching: Zapisywanie sugestii {j+1}: bailiff_id={suggestion.bailiff_id}, score={suggestion.combined_score}")
-                session.add(suggestion)
-                total_suggestions += 1
-            
-            # Mark as processed
-            raw_name.is_processed = True
             if i <= 3:  # Debug first 3 names
-                print(f"✅ DEBUG session_matching: Oznaczono '{raw_name.raw_text}' jako przetworzone")
+                for j, suggestion in enumerate(suggestions):
+                    print(f"🔍 DEBUG session_matching: Zapisywanie sugestii {j+1}: bailiff_id={suggestion['bailiff_id']}, score={suggestion['combined_score']}")
+            
+            batch_ids.append(raw_name.id)
+            batch_suggestions.extend(suggestions)
+            total_suggestions += len(suggestions)
             
-            # Commit in batches
-            if i % 50 == 0:
+            # Write in batches: clear old suggestions, insert new ones, mark names as processed
+            if i % 50 == 0 or i == len(raw_names):
+                _write_batch(session, batch_ids, batch_suggestions)
                 session.commit()
+                batch_ids = []
+                batch_suggestions = []
         
         # Final commit
         print("🔍 DEBUG session_matching: Wykonywanie końcowego commit...")
         session.commit()
         print("✅ DEBUG session_matching: Commit zakończony pomyślnie")
         
+        # Auto-resolution stage: map unambiguous names, leave the rest for review
+        auto_resolved = 0
+        if auto_resolve:
+            auto_resolved = auto_resolve_session(session.connection(), session_id, profile)
+            session.commit()
+            print(f"✅ DEBUG session_matching: Automatycznie rozstrzygnięto {auto_resolved} nazw "
+                  f"(reguła: {profile.auto_resolve})")
+        
         # Update session stats
         analysis_session.processed_records = len(raw_names)
         analysis_session.status = 'completed'
+        analysis_session.data_version = (analysis_session.data_version or 0) + 1
         session.commit()
         
         elapsed = time.time() - start_time
@@ -121,7 +137,8 @@ def run_matching_for_session(session_id, max_suggestions=5):
         print(f"📊 DEBUG session_matching: Generated {total_suggestions} suggestions for {len(raw_names)} names")
         print(f"⚡ DEBUG session_matching: Processing rate: {rate:.1f} names/second")
         
-        return True, f"Generated {total_suggestions} suggestions in {elapsed:.1f}s"
+        return True, (f"Generated {total_suggestions} suggestions in {elapsed:.1f}s, "
+                      f"auto-resolved {auto_resolved} of {len(raw_names)} names")
         
     except Exception as e:
         print(f"❌ DEBUG session_matching: Błąd podczas dopasowywania: {e}")
@@ -131,8 +148,9 @@ def run_matching_for_session(session_id, max_suggestions=5):
         
         try:
             session.rollback()
-            # Update session status to error
+            # Update session status to error; batches written so far are visible in the UI
             analysis_session.status = 'error'
+            analysis_session.data_version = (analysis_session.data_version or 0) + 1
             session.commit()
         except Exception as commit_error:
             print(f"❌ DEBUG session_matching: Błąd podczas rollback/commit: {commit_error}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Sync the bailiff dictionary with the dane.gov.pl registry.
+
+Fetches the registry resource with concurrent, retried page requests and
+applies only the difference to `bailiffs_dict` (see `dictionary_sync`):
+new rows are inserted, rows with a changed `updated_at` updated and rows
+gone from the registry deleted. Replaces the delete-and-reinsert import of
+init_database.py.
+
+Usage: python archive/scripts/sync_bailiffs.py [--endpoint URL] [--concurrency 4] [--page-size 100] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+sys.path.append('.')
+sys.path.append('archive/scripts')
+
+from sqlalchemy import create_engine
+
+from db_migrations import ensure_schema
+from dictionary_sync import (BAILIFFS_ENDPOINT, MAX_CONCURRENCY, MAX_RETRIES, PAGE_SIZE, DaneGovSyncClient,
+                             SyncError, apply_dictionary_diff, delete_store_suggestions, diff_dictionary)
+from file_upload import Base
+
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--endpoint', default=BAILIFFS_ENDPOINT, help="Adres danych zasobu rejestru")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help="Równoczesne żądania")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE, help="Wierszy na stronę")
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES, help="Ponowienia nieudanego żądania")
+    parser.add_argument('--database', default=DATABASE_URL)
+    parser.add_argument('--dry-run', action='store_true', help="Tylko pokaż różnice, bez zapisu")
+    args = parser.parse_args()
+
+    client = DaneGovSyncClient(args.endpoint, page_size=args.page_size, concurrency=args.concurrency,
+                               retries=args.retries)
+    print(f"📡 Pobieranie rejestru komorników ({args.concurrency} równoczesnych żądań)...")
+    start_time = time.time()
+    try:
+        rows, seen_row_ids = asyncio.run(client.fetch_all())
+    except SyncError as e:
+        print(f"❌ Nie udało się pobrać rejestru: {e} - słownik pozostaje bez zmian")
+        return 1
+    print(f"✅ Pobrano {len(rows)} wierszy w {time.time() - start_time:.1f} s")
+
+    engine = create_engine(args.database, echo=False)
+    Base.metadata.create_all(bind=engine)
+    ensure_schema(engine)
+
+    with engine.begin() as connection:
+        diff = diff_dictionary(connection, rows, seen_row_ids)
+        print(f"🔍 Różnice: {len(diff.inserts)} nowych, {len(diff.updates)} zmienionych, "
+              f"{len(diff.deletes)} usuniętych z rejestru")
+        if not rows and diff.deletes:
+            print("❌ Rejestr jest pusty - pominięto usuwanie całego słownika")
+            return 1
+        if args.dry_run:
+            return 0
+        inserted, updated, deleted, kept = apply_dictionary_diff(connection, diff)
+    delete_store_suggestions(engine, diff.deletes)
+
+    print(f"💾 Dodano {inserted}, zaktualizowano {updated}, usunięto {deleted} komorników")
+    if kept:
+        print(f"⚠️ {kept} komorników usuniętych z rejestru zachowano - mają zapisane decyzje dopasowań")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests of the bailiff dictionary entity resolution (entity_resolution.py).
+
+Usage: python -m pytest archive/scripts/test_entity_resolution.py
+"""
+import sys
+
+sys.path.append('.')
+
+from entity_resolution import resolve_entities
+from match_records import BailiffRecord
+from polish_phonetics import phonetic_key
+from surname_folding import surname_stem
+
+
+def bailiff(bailiff_id, lastname, firstname, city=None, postal=None, court_key=None, email=None):
+    return BailiffRecord(
+        id=bailiff_id, original_nazwisko=lastname, original_imie=firstname, original_miasto=city,
+        original_sad=None, kod_pocztowy=postal, telefon=None, email=email, numer_konta=None,
+        normalized_lastname=lastname.lower(), normalized_firstname=firstname.lower() if firstname else None,
+        normalized_fullname=f"{(firstname or '').lower()} {lastname.lower()}".strip(),
+        normalized_city=city.lower() if city else None, phonetic_lastname=phonetic_key(lastname),
+        surname_stem=surname_stem(lastname), court_key=court_key,
+    )
+
+
+def test_unlocated_record_does_not_link_namesakes_from_different_cities():
+    clusters = resolve_entities([
+        bailiff(1, 'Kowalski', 'Jan', 'Warszawa', '00-001'),
+        bailiff(2, 'Kowalski', 'Jan'),
+        bailiff(3, 'Kowalski', 'Jan', 'Kraków', '30-001'),
+    ])
+    assert clusters == []
+
+
+def test_unlocated_record_joins_the_only_matching_located_cluster():
+    clusters = resolve_entities([
+        bailiff(1, 'Kowalski', 'Jan', 'Warszawa', '00-001'),
+        bailiff(2, 'Kowalski', 'Jan'),
+        bailiff(3, 'Nowak', 'Jan', 'Kraków', '30-001'),
+    ])
+    assert [(cluster.canonical_id, cluster.duplicate_ids) for cluster in clusters] == [(1, [2])]
+
+
+def test_same_city_records_are_merged_but_not_with_another_city():
+    clusters = resolve_entities([
+        bailiff(1, 'Kowalski', 'Jan', 'Warszawa', '00-001'),
+        bailiff(2, 'Kowalski', 'Jan', 'Warszawa'),
+        bailiff(3, 'Kowalski', 'Jan', 'Kraków', '30-001', email='jan@kowalski.pl'),
+        bailiff(4, 'Kowalski', 'Jan', None, '00-001', email='jan@kowalski.pl'),
+    ])
+    assert [(cluster.canonical_id, cluster.duplicate_ids) for cluster in clusters] == [(1, [2, 4])]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
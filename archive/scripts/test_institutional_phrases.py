@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests of institutional phrase stripping (institutional_phrases.py).
+
+Usage: python -m pytest archive/scripts/test_institutional_phrases.py
+"""
+import sys
+
+sys.path.append('.')
+
+from institutional_phrases import court_key, parse_institutional_text
+from raw_name_parsing import normalize_name_simple, parse_raw_name
+
+TITLE_CASE = "Komornik Sądowy przy Sądzie Rejonowym w Grójcu Ada Czapla"
+
+
+def test_title_case_court_city_is_stripped():
+    assert normalize_name_simple(TITLE_CASE) == 'ada czapla'
+    assert court_key(TITLE_CASE) == '/grojcu'
+
+
+def test_upper_case_court_city_is_stripped():
+    text = TITLE_CASE.upper()
+    assert normalize_name_simple(text) == 'ada czapla'
+    assert court_key(text) == '/grojcu'
+
+
+def test_lower_case_court_city_is_stripped():
+    text = TITLE_CASE.lower()
+    assert normalize_name_simple(text) == 'ada czapla'
+    assert court_key(text) == '/grojcu'
+
+
+def test_upper_case_city_in_mixed_case_text():
+    parsed = parse_institutional_text("Komornik Sądowy przy Sądzie Rejonowym w GRÓJCU Ada Czapla")
+    assert parsed.text == 'Ada Czapla'
+    assert parsed.court_city == 'GRÓJCU'
+
+
+def test_upper_case_office_and_district():
+    parsed = parse_institutional_text("KOMORNIK SĄDOWY PRZY SĄDZIE REJONOWYM DLA KRAKOWA-KROWODRZY W KRAKOWIE "
+                                      "JAN NOWAK KANCELARIA KOMORNICZA NR XII W WARCE")
+    assert parsed.text == 'JAN NOWAK'
+    assert parsed.court_key == 'krakowa-krowodrzy/krakowie'
+    assert (parsed.office_number, parsed.office_city) == (12, 'WARCE')
+
+
+def test_office_header_without_number_is_stripped():
+    assert normalize_name_simple("Ada Czapla Kancelaria Komornicza") == 'ada czapla'
+    parsed = parse_institutional_text("Kancelaria Komornicza w Warce Ada Czapla")
+    assert parsed.text == 'Ada Czapla'
+    assert (parsed.office_number, parsed.office_city) == (None, 'Warce')
+
+
+def test_two_word_court_districts():
+    for district in ("Warszawy Woli", "Warszawy-Woli"):
+        text = f"Komornik Sądowy przy Sądzie Rejonowym dla {district} w Warszawie Jan Nowak"
+        assert normalize_name_simple(text) == 'jan nowak'
+        assert court_key(text) == 'warszawy-woli/warszawie'
+    for district in ("Warszawy Pragi-Północ", "Warszawy Pragi - Północ"):
+        text = f"Komornik Sądowy przy Sądzie Rejonowym dla {district} w Warszawie Jan Nowak"
+        assert normalize_name_simple(text) == 'jan nowak'
+        assert court_key(text) == 'warszawy-pragi-polnoc/warszawie'
+    assert court_key("Sąd Rejonowy dla Wrocławia - Krzyków we Wrocławiu") == 'wroclawia-krzykow/wroclawiu'
+
+
+def test_court_column_without_a_court_name_keeps_the_title_court():
+    assert parse_raw_name(TITLE_CASE, court_text='3243')['court_key'] == '/grojcu'
+    assert parse_raw_name(TITLE_CASE, court_text='Sąd Rejonowy w Warce')['court_key'] == '/warce'
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests of the in-memory bailiff index (match_records.py).
+
+Usage: python -m pytest archive/scripts/test_match_records.py
+"""
+import sys
+
+sys.path.append('.')
+
+from match_records import BailiffIndex, BailiffRecord
+
+# A row inserted by a bulk importer: no phonetic, stem or court key
+IMPORTED = BailiffRecord(
+    id=1, original_nazwisko='Kowalska', original_imie='Anna', original_miasto='Mikołów',
+    original_sad='Sąd Rejonowy w Mikołowie', kod_pocztowy='43-190', telefon=None, email=None, numer_konta=None,
+    normalized_lastname='kowalska', normalized_firstname='anna', normalized_fullname='anna kowalska',
+    normalized_city='mikołów', phonetic_lastname=None, surname_stem=None, court_key=None,
+)
+
+
+def test_missing_keys_are_computed_for_imported_rows():
+    index = BailiffIndex([IMPORTED])
+    bailiff = index.bailiffs[0]
+    assert bailiff.phonetic_lastname and bailiff.surname_stem and bailiff.court_key
+    assert index.phonetic_candidates(bailiff.phonetic_lastname) == [0]
+    assert index.stem_candidates(bailiff.surname_stem) == [0]
+    assert index.by_court_key[bailiff.court_key] == [0]
+
+
+def test_stored_keys_are_kept():
+    stored = IMPORTED._replace(phonetic_lastname='stored', surname_stem='stored', court_key='stored')
+    assert BailiffIndex([stored]).bailiffs[0] == stored
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
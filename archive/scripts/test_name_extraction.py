@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Tests of first-name/surname extraction (name_extraction.py).
+
+Usage: python -m pytest archive/scripts/test_name_extraction.py
+"""
+import sys
+
+sys.path.append('.')
+
+from name_extraction import FIRST_NAME, SURNAME, NameAutomaton, extract_names
+
+# The PESEL first-name list has a bare "-" entry
+AUTOMATON = NameAutomaton([(name, FIRST_NAME) for name in ('-', 'Jan', 'Piotr', 'Ewa', 'Tamara')]
+                          + [(name, SURNAME) for name in ('Kowalski',)])
+
+
+def test_hyphenated_court_district_is_not_a_name():
+    text = "Komornik Sądowy przy Sądzie Rejonowym dla Warszawy Pragi-Południe w Warszawie Piotr Pluta-Lankiewicz"
+    assert extract_names(text, AUTOMATON) == ('Piotr', 'Pluta-Lankiewicz')
+    assert extract_names("KS przy SR Katowice-Zachód", AUTOMATON) == ('', '')
+
+
+def test_dash_separator_before_the_name():
+    assert extract_names("Kancelaria Komornicza - Jan Kowalski", AUTOMATON) == ('Jan', 'Kowalski')
+    assert extract_names("Kancelaria Komornicza - Piotr Nowak", AUTOMATON) == ('Piotr', 'Nowak')
+
+
+def test_dash_separator_after_the_name_is_trimmed():
+    assert extract_names("Piotr Nowak - Komornik Sądowy", AUTOMATON) == ('Piotr', 'Nowak')
+
+
+def test_surname_outside_the_lexicon_after_two_first_names():
+    assert extract_names("Ewa Tamara Szuber-Bednarz", AUTOMATON) == ('Ewa Tamara', 'Szuber-Bednarz')
+    assert extract_names("Piotr Struk - Zielińska", AUTOMATON) == ('Piotr', 'Struk - Zielińska')
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests of the learned reranker scores and its auto-resolution rule (reranker.py).
+
+Usage: python -m pytest archive/scripts/test_reranker.py
+"""
+import sys
+
+sys.path.append('.')
+
+import numpy as np
+
+from auto_resolution import select_auto_resolutions
+from match_features import FEATURE_INDEX, FEATURE_NAMES, IDENTIFIER_MATCH_SCORE, pack_features
+from reranker import MODEL_INPUTS, RerankerModel
+
+
+def constant_model(high=70.0):
+    """Model scoring every candidate 50 (zero coefficients)."""
+    return RerankerModel(version=1, coefficients=(0.0,) * len(MODEL_INPUTS), intercept=0.0,
+                         mean=(0.0,) * len(MODEL_INPUTS), scale=(1.0,) * len(MODEL_INPUTS),
+                         thresholds={'high': high, 'medium': 50.0})
+
+
+def features(lastname, identifier_unique=False):
+    vector = np.zeros(len(FEATURE_NAMES))
+    vector[:FEATURE_INDEX['lastname_ratio']] = lastname
+    vector[FEATURE_INDEX['lastname_ratio']] = lastname
+    vector[FEATURE_INDEX['identifier_hit']] = float(identifier_unique)
+    vector[FEATURE_INDEX['identifier_unique']] = float(identifier_unique)
+    return vector
+
+
+def test_identifier_floor_applies_only_with_an_agreeing_name():
+    scores = constant_model().score(np.array([features(95.0, True), features(30.0, True), features(95.0)]))
+    assert scores.tolist() == [IDENTIFIER_MATCH_SCORE, 50.0, 50.0]
+
+
+def test_model_threshold_drives_auto_resolution():
+    model = constant_model(high=45.0)
+    blob = pack_features(features(95.0).tolist())
+    rows = [(1, 10, 60.0, 'high', 'ratio', blob), (1, 11, 40.0, 'low', 'ratio', blob),
+            (2, 12, 40.0, 'low', 'ratio', blob)]
+    mappings = select_auto_resolutions(rows, model)
+    assert [(mapping['raw_id'], mapping['bailiff_id']) for mapping in mappings] == [(1, 10)]
+    assert mappings[0]['notes'].endswith(f"({model.key})")
+
+
+def test_confirmed_identifier_hit_alone_is_resolved():
+    model = constant_model(high=45.0)
+    rows = [(1, 10, IDENTIFIER_MATCH_SCORE, 'high', 'identifier_iban', pack_features(features(95.0, True).tolist())),
+            (2, 11, IDENTIFIER_MATCH_SCORE, 'high', 'identifier_iban', pack_features(features(30.0, True).tolist()))]
+    assert [mapping['raw_id'] for mapping in select_auto_resolutions(rows, model)] == [1]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Train the learned reranker on reviewer decisions from name_mappings.
+
+Every suggestion with stored features whose raw name has a human decision
+becomes a labelled example (the accepted bailiff is positive, all other
+candidates negative). Raw names are split into training and holdout sets;
+on the holdout the model is compared with the scoring-profile formula by
+the number of raw names whose top candidate clears the auto-approve
+threshold and the precision of those approvals.
+
+Usage: python archive/scripts/train_reranker.py [--threshold 90] [--l2 1.0] [--output reranker_model.json]
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import replace
+
+sys.path.append('.')
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from db_migrations import ensure_schema
+from match_features import FEATURE_NAMES, rerank, unpack_features
+from reranker import (RERANKER_MODEL_FILE, SYSTEM_REVIEWERS, RerankerModel, auto_approve_stats,
+                      fit_logistic_regression, label_suggestions, load_reranker, model_inputs,
+                      threshold_for_precision)
+from scoring_profiles import get_scoring_profile
+from session_storage import session_engines
+
+# Every HOLDOUT_MODULO-th raw name is kept out of training
+HOLDOUT_MODULO = 5
+
+
+def load_training_rows(engine):
+    """Suggestions with features of raw names reviewed by a human."""
+    reviewers = ", ".join(f"'{reviewer}'" for reviewer in SYSTEM_REVIEWERS)
+    query = text(f"""
+        SELECT ms.raw_id, ms.bailiff_id, nm.bailiff_id AS mapped_bailiff_id, nm.mapping_type, ms.features
+        FROM match_suggestions ms
+        JOIN name_mappings nm ON nm.raw_id = ms.raw_id
+        WHERE ms.features IS NOT NULL
+          AND (nm.reviewed_by IS NULL OR nm.reviewed_by NOT IN ({reviewers}))
+    """)
+    feature_size = len(FEATURE_NAMES) * 4
+    rows = []
+    # Sessions with their own database file keep their suggestions there
+    for suggestions_engine in session_engines(engine):
+        with suggestions_engine.connect() as connection:
+            rows.extend(row for row in connection.execute(query).fetchall() if len(row.features) == feature_size)
+    return rows
+
+
+def _next_version(path):
+    try:
+        return load_reranker(path).version + 1
+    except (OSError, ValueError, KeyError, TypeError):
+        return 1
+
+
+def _report(label, raw_ids, scores, labels, threshold):
+    approved, precision = auto_approve_stats(raw_ids, scores, labels, threshold)
+    total = len(np.unique(raw_ids))
+    print(f"   {label:<10} próg {threshold:5.1f}: {approved}/{total} nazw do auto-zatwierdzenia, "
+          f"precyzja {precision:.1%}")
+    return approved, precision
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threshold', type=float, default=90.0,
+                        help="Auto-approve threshold of the formula (default: 90, as in the mass-approve UI)")
+    parser.add_argument('--profile', default=None, help="Scoring profile of the formula baseline")
+    parser.add_argument('--target-precision', type=float, default=None,
+                        help="Precision of the model's auto-approvals (default: the formula's precision on training data)")
+    parser.add_argument('--l2', type=float, default=1.0, help="L2 regularization strength")
+    parser.add_argument('--output', default=RERANKER_MODEL_FILE, help="Where to save the model")
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite:///bailiffs_matching.db", echo=False)
+    ensure_schema(engine)
+    profile = get_scoring_profile(args.profile)
+
+    print("🔍 Ładowanie sugestii z decyzjami recenzentów...")
+    rows = load_training_rows(engine)
+    if not rows:
+        print("⚠️ Brak sugestii z cechami i decyzjami - nie ma na czym trenować")
+        return
+
+    raw_ids = np.array([row.raw_id for row in rows])
+    labels = label_suggestions([(row.raw_id, row.bailiff_id, row.mapped_bailiff_id, row.mapping_type)
+                                for row in rows])
+    matrix = unpack_features([row.features for row in rows])
+    holdout = raw_ids % HOLDOUT_MODULO == 0
+    train = ~holdout
+    print(f"📊 {len(rows)} sugestii ({int(labels.sum())} pozytywnych), "
+          f"{len(np.unique(raw_ids[train]))} nazw treningowych, {len(np.unique(raw_ids[holdout]))} testowych")
+
+    if len(np.unique(labels[train])) < 2:
+        print("⚠️ Dane treningowe zawierają tylko jedną klasę - potrzebne są zarówno akceptacje, jak i odrzucenia")
+        return
+
+    start_time = time.time()
+    coefficients, intercept, mean, scale = fit_logistic_regression(model_inputs(matrix[train]), labels[train], args.l2)
+    print(f"✅ Model wytrenowany w {time.time() - start_time:.2f} s")
+
+    formula_scores = rerank(profile, matrix)
+    # Model threshold: the lowest one matching the formula's precision on training data
+    _, formula_precision = auto_approve_stats(raw_ids[train], formula_scores[train], labels[train], args.threshold)
+    target_precision = args.target_precision or max(formula_precision, 0.5)
+    model = RerankerModel(
+        version=_next_version(args.output),
+        coefficients=tuple(coefficients.tolist()),
+        intercept=intercept,
+        mean=tuple(mean.tolist()),
+        scale=tuple(scale.tolist()),
+        thresholds={'high': 0.0, 'medium': 50.0},
+    )
+    model_scores = model.score(matrix)
+    model_threshold = threshold_for_precision(raw_ids[train], model_scores[train], labels[train],
+                                              target_precision)
+    model_threshold = max(model_threshold, model.thresholds['medium'])
+
+    print(f"📏 Porównanie na zbiorze testowym (formuła {profile.key}):")
+    evaluation = raw_ids[holdout] if holdout.any() else raw_ids
+    mask = holdout if holdout.any() else np.ones(len(rows), dtype=bool)
+    formula_approved, formula_holdout_precision = _report(
+        "formuła", evaluation, formula_scores[mask], labels[mask], args.threshold)
+    model_approved, model_holdout_precision = _report(
+        "model", evaluation, model_scores[mask], labels[mask], model_threshold)
+
+    model = replace(
+        model,
+        thresholds={'high': model_threshold, 'medium': model.thresholds['medium']},
+        metrics={
+            'training_suggestions': int(train.sum()),
+            'formula_profile': profile.key,
+            'formula_threshold': args.threshold,
+            'formula_auto_approved': formula_approved,
+            'formula_precision': formula_holdout_precision,
+            'model_auto_approved': model_approved,
+            'model_precision': model_holdout_precision,
+        },
+    )
+    model.save(args.output)
+    print(f"💾 Zapisano {model.key} do {args.output} "
+          f"({model_approved - formula_approved:+d} nazw powyżej progu auto-zatwierdzenia względem formuły)")
+
+
+if __name__ == "__main__":
+    main()
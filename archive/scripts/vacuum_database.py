@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Return free pages of the database to the file system.
+
+Deleted sessions leave free pages behind. A database with
+`auto_vacuum = INCREMENTAL` releases them in short steps (done after every
+session deletion); `--enable-incremental` switches an older database to
+that mode with a one-off full VACUUM, which rewrites the whole file - run it
+while the app is stopped.
+
+Usage: python archive/scripts/vacuum_database.py [--enable-incremental] [--database sqlite:///bailiffs_matching.db]
+"""
+
+import argparse
+import sys
+import time
+
+sys.path.append('.')
+
+from sqlalchemy import create_engine
+
+from session_purge import enable_incremental_vacuum, reclaim_free_pages
+
+DATABASE_URL = "sqlite:///bailiffs_matching.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--enable-incremental', action='store_true',
+                        help="Przełącz bazę na przyrostowe odzyskiwanie miejsca (pełny VACUUM)")
+    parser.add_argument('--database', default=DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database, echo=False)
+    start_time = time.time()
+    if args.enable_incremental:
+        if enable_incremental_vacuum(engine):
+            print(f"✅ Włączono auto_vacuum = INCREMENTAL (VACUUM: {time.time() - start_time:.1f} s)")
+        else:
+            print("✅ Baza już używa auto_vacuum = INCREMENTAL")
+
+    released = reclaim_free_pages(engine)
+    with engine.connect() as connection:
+        mode = connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+        free = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+    if mode != 2:
+        print(f"⚠️ Baza nie używa przyrostowego auto_vacuum ({free} wolnych stron) - uruchom z --enable-incremental")
+    else:
+        print(f"🧹 Zwolniono {released} stron w {time.time() - start_time:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
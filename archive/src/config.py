@@ -35,17 +35,6 @@ class APIConfig:
     request_timeout: int = 30
     max_retries: int = 3
 
-@dataclass
-class MatchingConfig:
-    """Matching algorithm configuration."""
-    similarity_threshold_auto: float = float(os.getenv("SIMILARITY_THRESHOLD_AUTO", "0.85"))
-    similarity_threshold_manual: float = float(os.getenv("SIMILARITY_THRESHOLD_MANUAL", "0.70"))
-    similarity_threshold_reject: float = float(os.getenv("SIMILARITY_THRESHOLD_REJECT", "0.70"))
-    
-    weight_lastname: float = float(os.getenv("WEIGHT_LASTNAME", "0.5"))
-    weight_firstname: float = float(os.getenv("WEIGHT_FIRSTNAME", "0.3"))
-    weight_location: float = float(os.getenv("WEIGHT_LOCATION", "0.2"))
-
 @dataclass
 class AppConfig:
     """Main application configuration."""
@@ -55,7 +44,6 @@ class AppConfig:
     def __post_init__(self):
         self.database = DatabaseConfig()
         self.api = APIConfig()
-        self.matching = MatchingConfig()
 
 # Global configuration instance
 config = AppConfig()
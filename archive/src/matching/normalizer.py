@@ -6,26 +6,13 @@ import unicodedata
 from typing import Tuple, Optional
 import logging
 
+from institutional_phrases import strip_institutional_phrases
+
 logger = logging.getLogger(__name__)
 
 class NameNormalizer:
     """Handles text normalization for bailiff names."""
     
-    # Common titles and formulas to remove
-    TITLES_TO_REMOVE = [
-        r"komornik\s+sądowy",
-        r"przy\s+sądzie\s+rejonowym",
-        r"kancelaria\s+komornicza\s+nr\.?\s*\d*",
-        r"zastępca\s+komornika",
-        r"komornik",
-        r"sądowy",
-        r"mgr",
-        r"dr", 
-        r"prof\.",
-        r"adwokat",
-        r"radca\s+prawny"
-    ]
-    
     # Court abbreviations to standardize
     COURT_ABBREVIATIONS = {
         r"sr\.?": "sąd rejonowy",
@@ -35,7 +22,6 @@ class NameNormalizer:
     }
     
     def __init__(self):
-        self.title_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in self.TITLES_TO_REMOVE]
         self.court_patterns = [(re.compile(pattern, re.IGNORECASE), replacement) 
                               for pattern, replacement in self.COURT_ABBREVIATIONS.items()]
     
@@ -77,14 +63,8 @@ class NameNormalizer:
         if not text:
             return ""
             
-        result = text
-        
-        # Remove titles
-        for pattern in self.title_patterns:
-            result = pattern.sub(' ', result)
-        
-        # Remove numbers (usually office numbers)
-        result = re.sub(r'\bnr\.?\s*\d+\w*\b', ' ', result, flags=re.IGNORECASE)
+        # Titles, court/office phrases and office numbers in a single pass
+        result = strip_institutional_phrases(text)
         
         # Clean up extra spaces
         result = re.sub(r'\s+', ' ', result).strip()
@@ -8,12 +8,16 @@ import sys
 sys.path.append('.')
 from polish_names_recognition import extract_names_from_bailiff_text_enhanced
 from rapidfuzz import fuzz
+from scoring_profiles import get_scoring_profile
 
 def update_match_suggestions_with_enhanced_scoring():
     """Update all match suggestions with enhanced scoring algorithm"""
     
     print("=== AKTUALIZACJA ALGORYTMU SCORINGU ===")
     
+    profile = get_scoring_profile('enhanced_names')
+    print(f"Profil punktacji: {profile.key}")
+    
     # Connect to database
     conn = sqlite3.connect('bailiffs_matching.db')
     cursor = conn.cursor()
@@ -61,41 +65,20 @@ def update_match_suggestions_with_enhanced_scoring():
         else:
             city_score = 0.0
         
-        # Calculate combined score with proper weights
-        # If we have extracted names, use them with higher weight
-        if raw_first and raw_last and bailiff_first and bailiff_last:
-            # Use individual name scores when available
-            combined_score = (
-                fullname_score * 0.4 +    # 40% for full name match
-                lastname_score * 0.35 +   # 35% for lastname match
-                firstname_score * 0.25    # 25% for firstname match
-            )
-        else:
-            # Fall back to full name scoring
-            combined_score = fullname_score
-        
-        # City bonus (add up to 10 points for good city match)
-        if city_score > 70:
-            combined_score += min(10, city_score / 10)
-        
-        # Ensure combined score doesn't exceed 100
-        combined_score = min(100.0, combined_score)
-        
-        # Determine confidence level
-        if combined_score >= 90:
-            confidence = 'high'
-        elif combined_score >= 70:
-            confidence = 'medium'
-        else:
-            confidence = 'low'
+        # Combined score and confidence from the shared scoring profile
+        has_name_parts = bool(raw_first and raw_last and bailiff_first and bailiff_last)
+        combined_score = profile.combine(fullname_score, lastname_score, firstname_score, city_score,
+                                         has_name_parts=has_name_parts)
+        confidence = profile.confidence(combined_score)
         
         # Update the suggestion
         cursor.execute("""
             UPDATE match_suggestions 
             SET fullname_score = ?, lastname_score = ?, firstname_score = ?, 
-                city_score = ?, combined_score = ?, confidence_level = ?
+                city_score = ?, combined_score = ?, confidence_level = ?, scoring_profile = ?
             WHERE id = ?
-        """, (fullname_score, lastname_score, firstname_score, city_score, combined_score, confidence, ms_id))
+        """, (fullname_score, lastname_score, firstname_score, city_score, combined_score, confidence,
+              profile.key, ms_id))
         
         updated_count += 1
         
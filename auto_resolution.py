@@ -0,0 +1,99 @@
+"""
+Automatic resolution of unambiguous match suggestions.
+
+After matching, a raw name whose best suggestion clears the scoring
+profile's `auto_resolve` rule (minimum score and minimum margin over the
+runner-up) is mapped to that bailiff without review. Decisions are written
+in bulk as ordinary `name_mappings` rows tagged with SYSTEM_REVIEWER, so the
+review queue only keeps ambiguous names and the decisions stay
+distinguishable from human ones.
+
+An identifier suggestion (`identifier_*`) is never decided when its stored
+name components do not confirm the identifier. A confirmed identifier hit
+is the only candidate exactly when the fuzzy search was skipped for it, so
+it is decided with a runner-up of 0 like any single candidate.
+"""
+
+from sqlalchemy import text
+
+from match_features import component_scores, identifier_name_agrees, unpack_features
+
+# `reviewed_by` of decisions made by the system (auto-resolution, mass approval)
+SYSTEM_REVIEWER = 'Auto-System'
+
+
+def _is_identifier_suggestion(row):
+    return bool(row[4]) and row[4].startswith('identifier_')
+
+
+def _identifier_name_weak(row):
+    """Whether the stored features of an identifier suggestion do not confirm the name."""
+    if row[5] is None:
+        return True
+    fullname, lastname = component_scores(unpack_features([row[5]])[0])[:2]
+    return not identifier_name_agrees(lastname, fullname)
+
+
+def select_auto_resolutions(rows, profile):
+    """Mappings for raw names decided by the profile's rule.
+
+    `rows` are (raw_id, bailiff_id, combined_score, confidence_level,
+    algorithm_used, features) tuples ordered by raw_id and descending score.
+    """
+    mappings = []
+    current_raw_id = None
+    candidates = []
+
+    def decide():
+        if not candidates:
+            return
+        top = candidates[0]
+        if _is_identifier_suggestion(top) and _identifier_name_weak(top):
+            return
+        runner_up_score = candidates[1][2] if len(candidates) > 1 else 0.0
+        if profile.auto_resolves(top[2], runner_up_score):
+            mappings.append({
+                'raw_id': top[0],
+                'bailiff_id': top[1],
+                'mapping_type': 'accepted',
+                'confidence_level': top[3],
+                'notes': (f"Auto-rozstrzygnięto - wynik: {top[2]:.1f}%, "
+                          f"przewaga: {top[2] - runner_up_score:.1f} ({profile.key})"),
+                'reviewed_by': SYSTEM_REVIEWER,
+            })
+
+    for row in rows:
+        if row[0] != current_raw_id:
+            decide()
+            current_raw_id = row[0]
+            candidates = []
+        if len(candidates) < 2:
+            candidates.append(row)
+    decide()
+    return mappings
+
+
+def auto_resolve_session(connection, session_id, profile):
+    """Write system mappings for the unmapped raw names of a session; returns their number."""
+    if not profile.auto_resolve:
+        return 0
+
+    rows = connection.execute(text("""
+        SELECT ms.raw_id, ms.bailiff_id, ms.combined_score, ms.confidence_level, ms.algorithm_used, ms.features
+        FROM match_suggestions ms
+        WHERE ms.session_id = :session_id
+          AND NOT EXISTS (SELECT 1 FROM name_mappings nm WHERE nm.raw_id = ms.raw_id)
+        ORDER BY ms.raw_id, ms.combined_score DESC
+    """), {'session_id': session_id}).fetchall()
+
+    mappings = select_auto_resolutions(rows, profile)
+    for mapping in mappings:
+        mapping['session_id'] = session_id
+    if mappings:
+        connection.execute(text("""
+            INSERT INTO name_mappings (session_id, raw_id, bailiff_id, mapping_type, confidence_level,
+                                       notes, reviewed_by, reviewed_at)
+            VALUES (:session_id, :raw_id, :bailiff_id, :mapping_type, :confidence_level,
+                    :notes, :reviewed_by, CURRENT_TIMESTAMP)
+        """), mappings)
+    return len(mappings)
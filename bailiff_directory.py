@@ -0,0 +1,139 @@
+"""
+Searchable, keyset-paginated bailiff directory.
+
+The "Lista komorników" tab searches by surname, city and court. A trigram
+FTS5 table (`bailiffs_fts`) mirrors those columns of `bailiffs_dict` and is
+kept in sync by triggers, so substring search is an index lookup instead of
+a `LIKE '%...%'` scan. Pages are read with keyset pagination on
+(lastname, firstname, id) - every page costs the same however deep it is -
+and the total comes from a separate COUNT query.
+
+Terms shorter than three characters cannot use the trigram index and fall
+back to LIKE on the dictionary; so does everything when the SQLite build
+lacks FTS5.
+"""
+
+from sqlalchemy import text
+
+FTS_TABLE = 'bailiffs_fts'
+TRIGRAM_LENGTH = 3
+DIRECTORY_PAGE_SIZE = 20
+
+# Search field -> (FTS column, dictionary column)
+SEARCH_COLUMNS = {
+    'name': ('lastname', 'normalized_lastname'),
+    'city': ('city', 'normalized_city'),
+    'court': ('court', 'original_sad'),
+}
+
+# Sort key of the directory; COALESCE keeps NULL first names comparable in the keyset condition
+SORT_KEY = "COALESCE(normalized_lastname, ''), COALESCE(normalized_firstname, ''), id"
+
+# The trigram tokenizer folds case itself (including Polish letters)
+_FTS_VALUES = ("COALESCE({p}.normalized_lastname, ''), COALESCE({p}.normalized_firstname, ''), "
+               "COALESCE({p}.normalized_city, ''), COALESCE({p}.original_sad, '')")
+
+
+def _fts_available(connection):
+    try:
+        connection.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts_probe USING fts5(a, tokenize='trigram')"))
+        connection.execute(text("DROP TABLE temp._fts_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def ensure_directory_index(connection):
+    """Create the search table, its sync triggers and the sort index (idempotent)."""
+    tables = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+    if 'bailiffs_dict' not in tables:
+        return
+
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_bailiffs_dict_directory ON bailiffs_dict ({SORT_KEY})"))
+
+    if FTS_TABLE in tables or not _fts_available(connection):
+        return
+
+    connection.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(lastname, firstname, city, court, tokenize='trigram')"
+    ))
+    connection.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, lastname, firstname, city, court) "
+        f"SELECT id, {_FTS_VALUES.format(p='bailiffs_dict')} FROM bailiffs_dict"
+    ))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS bailiffs_fts_insert AFTER INSERT ON bailiffs_dict BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, lastname, firstname, city, court)
+            VALUES (new.id, {_FTS_VALUES.format(p='new')});
+        END
+    """))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS bailiffs_fts_update AFTER UPDATE ON bailiffs_dict BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE} (rowid, lastname, firstname, city, court)
+            VALUES (new.id, {_FTS_VALUES.format(p='new')});
+        END
+    """))
+    connection.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS bailiffs_fts_delete AFTER DELETE ON bailiffs_dict BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """))
+    print(f"✅ Utworzono indeks wyszukiwania komorników ({FTS_TABLE})")
+
+
+def _has_fts(connection):
+    return connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': FTS_TABLE}).first() is not None
+
+
+def _filter_sql(connection, filters):
+    """WHERE clause and parameters of the search filters."""
+    use_fts = _has_fts(connection)
+    match_terms = []
+    conditions = []
+    params = {}
+    for field, (fts_column, column) in SEARCH_COLUMNS.items():
+        term = (filters.get(field) or '').strip()
+        if not term:
+            continue
+        if field != 'court':
+            term = term.lower()
+        if use_fts and len(term) >= TRIGRAM_LENGTH:
+            # Phrase query: a substring match on the trigram index
+            match_terms.append(f'{fts_column} : "{term.replace(chr(34), chr(34) * 2)}"')
+        else:
+            conditions.append(f"{column} LIKE :{field} ESCAPE '\\'")
+            params[field] = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+    if match_terms:
+        conditions.append(f"id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match)")
+        params['match'] = ' AND '.join(match_terms)
+    return (' AND '.join(conditions) or '1 = 1'), params
+
+
+def count_bailiffs(connection, filters):
+    """Number of bailiffs matching the search filters."""
+    where, params = _filter_sql(connection, filters)
+    return connection.execute(text(f"SELECT COUNT(*) FROM bailiffs_dict WHERE {where}"), params).scalar()
+
+
+def bailiff_page(connection, filters, after=None, limit=DIRECTORY_PAGE_SIZE):
+    """Ids of one directory page and the keyset of its last row.
+
+    `after` is the key returned for the previous page (None for the first).
+    Returns (ids, next_key); next_key is None on the last page.
+    """
+    where, params = _filter_sql(connection, filters)
+    if after is not None:
+        where += f" AND ({SORT_KEY}) > (:after_lastname, :after_firstname, :after_id)"
+        params.update(after_lastname=after[0], after_firstname=after[1], after_id=after[2])
+    params['limit'] = limit + 1
+
+    rows = connection.execute(text(
+        f"SELECT COALESCE(normalized_lastname, ''), COALESCE(normalized_firstname, ''), id "
+        f"FROM bailiffs_dict WHERE {where} ORDER BY {SORT_KEY} LIMIT :limit"
+    ), params).fetchall()
+
+    next_key = tuple(rows[limit - 1]) if len(rows) > limit else None
+    return [row[2] for row in rows[:limit]], next_key
+
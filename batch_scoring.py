@@ -0,0 +1,168 @@
+"""
+Vectorized fuzzy search for a batch of raw names.
+
+`process.extract` scores one query against the dictionary at a time. For a
+batch, `process.cdist` scores every query against every bailiff search text
+in one call - in C++, on all cores, without the GIL - and the top hits per
+query are picked with numpy. The result has the same shape as `extract`
+(score, text position) so the matcher can use it in place of per-name
+searches.
+
+A large batch (see `MEMMAP_MIN_CELLS`) does not fit one score matrix in
+memory: 1M queries x 3k texts is 24 GB of float64. Such a batch is scored in
+blocks of `SCORE_BLOCK_ROWS` rows into a memory-mapped uint8 (or float16)
+file per scorer, and the top hits are then picked by streaming over the
+blocks; only one block is mapped at a time, so the resident memory stays at
+a few blocks whatever the batch size (the file takes queries x texts bytes
+of disk per scorer with uint8). The stored scores are rounded, so each block
+only preselects candidates - every text within twice the rounding error of
+the row's limit-th best stored score - and the candidates are rescored
+exactly with `process.cpdist`. A row whose limit-th best score is low
+preselects most texts; beyond `MAX_ROW_CANDIDATES` the row is scored
+exactly against all texts instead (`EXACT_CHUNK_ROWS` rows per `cdist`
+call), so one block never sends more than block rows x
+`MAX_ROW_CANDIDATES` pairs to `cpdist`. The hits are the same
+as from the in-memory matrix.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+from rapidfuzz import process
+
+# Hits kept per query and scorer - same as the per-name search in run_matching
+FUZZY_LIMIT = 20
+# Batches of at least this many query x text scores are scored into disk-backed blocks (160 MB of float64)
+MEMMAP_MIN_CELLS = 20_000_000
+# Query rows of one score block: the unit of scoring, writing and top-k streaming
+SCORE_BLOCK_ROWS = 4096
+# Preselected candidates of one query row above which the row is scored exactly with `cdist` instead
+MAX_ROW_CANDIDATES = 256
+# Such rows are scored in chunks of this many rows (chunk rows x texts float64 scores in memory)
+EXACT_CHUNK_ROWS = 256
+# Stored score types and the largest difference between a stored and an exact score (0-100 scale)
+SCORE_DTYPES = {
+    np.dtype(np.uint8): 0.5,  # cdist rounds to the nearest integer
+    np.dtype(np.float16): 0.032,  # half the float16 spacing below 128, plus the float32 rounding
+}
+
+
+def _top_k_positions(positions, scores, limit):
+    """Top `limit` (score, position) pairs, best first; ties go to the lower position as in `process.extract`."""
+    order = np.lexsort((positions, -scores))[:limit]
+    return [(float(scores[i]), int(positions[i])) for i in order if scores[i] > 0]
+
+
+def _row_top_k(scores, limit):
+    """Top `limit` hits of one row of exact scores against all texts."""
+    kth_score = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+    positions = np.flatnonzero(scores >= kth_score)
+    return _top_k_positions(positions, scores[positions], limit)
+
+
+def fuzzy_top_k(queries, texts, scorer, limit=FUZZY_LIMIT, workers=-1):
+    """Top `limit` (score, text position) pairs of each query, best first."""
+    if not queries or not texts:
+        return [[] for _ in queries]
+
+    if len(queries) * len(texts) >= MEMMAP_MIN_CELLS:
+        return list(iter_fuzzy_top_k(queries, texts, scorer, limit, workers))
+
+    scores = process.cdist(queries, texts, scorer=scorer, dtype=np.float64, workers=workers)
+    limit = min(limit, len(texts))
+    # Score of the limit-th best hit per row; ties at that score are broken by
+    # the lower text position, as in `process.extract`
+    return [_row_top_k(row, limit) for row in scores]
+
+
+class ScoreBlocks:
+    """Scores of every query against every text of one scorer, in a memory-mapped file."""
+
+    def __init__(self, path, rows, columns, dtype=np.uint8):
+        self.path = path
+        self.rows = rows
+        self.columns = columns
+        self.dtype = np.dtype(dtype)
+
+    def block(self, start, stop, mode='r'):
+        """Memory map of rows start..stop only (unmapped again when the array is released)."""
+        return np.memmap(self.path, dtype=self.dtype, mode=mode, shape=(stop - start, self.columns),
+                         offset=start * self.columns * self.dtype.itemsize)
+
+    def blocks(self, block_rows=SCORE_BLOCK_ROWS):
+        """Yield (first row, in-memory copy of the block) over the whole matrix."""
+        for start in range(0, self.rows, block_rows):
+            stop = min(start + block_rows, self.rows)
+            view = self.block(start, stop)
+            block = np.array(view)
+            del view
+            yield start, block
+
+
+def write_score_blocks(queries, texts, scorer, path, dtype=np.uint8, block_rows=SCORE_BLOCK_ROWS, workers=-1):
+    """Score every query against every text into a file at `path`, one block of rows at a time."""
+    score_blocks = ScoreBlocks(path, len(queries), len(texts), dtype)
+    if score_blocks.dtype not in SCORE_DTYPES:
+        raise ValueError(f"Nieobsługiwany typ wyników: {score_blocks.dtype}")
+    with open(path, 'wb') as score_file:
+        score_file.truncate(len(queries) * len(texts) * score_blocks.dtype.itemsize)
+
+    # cdist has no float16 output; those blocks are computed as float32 and converted
+    cdist_dtype = np.uint8 if score_blocks.dtype == np.uint8 else np.float32
+    for start in range(0, len(queries), block_rows):
+        stop = min(start + block_rows, len(queries))
+        view = score_blocks.block(start, stop, mode='r+')
+        view[:] = process.cdist(queries[start:stop], texts, scorer=scorer, dtype=cdist_dtype, workers=workers)
+        view.flush()
+        del view
+    return score_blocks
+
+
+def stream_top_k(score_blocks, queries, texts, scorer, limit=FUZZY_LIMIT, block_rows=SCORE_BLOCK_ROWS, workers=-1):
+    """Yield the top `limit` (score, text position) pairs of each query, streaming over the stored blocks."""
+    limit = min(limit, len(texts))
+    # A true top hit is at most twice the rounding error below the limit-th best stored score
+    margin = 2 * SCORE_DTYPES[score_blocks.dtype]
+    for start, block in score_blocks.blocks(block_rows):
+        kth_scores = np.partition(block, len(texts) - limit, axis=1)[:, len(texts) - limit].astype(np.float32)
+        candidates = block >= (kth_scores - margin)[:, None]
+        # Rows with too many candidates are scored exactly against all texts below
+        wide = candidates.sum(axis=1) > MAX_ROW_CANDIDATES
+        candidates[wide] = False
+        rows, positions = np.nonzero(candidates)
+        del candidates
+        exact = process.cpdist([queries[start + row] for row in rows], [texts[position] for position in positions],
+                               scorer=scorer, dtype=np.float64, workers=workers)
+        wide_hits = {}
+        wide_rows = np.flatnonzero(wide)
+        for chunk_start in range(0, len(wide_rows), EXACT_CHUNK_ROWS):
+            chunk = wide_rows[chunk_start:chunk_start + EXACT_CHUNK_ROWS]
+            scores = process.cdist([queries[start + row] for row in chunk], texts, scorer=scorer,
+                                   dtype=np.float64, workers=workers)
+            wide_hits.update((row, _row_top_k(row_scores, limit)) for row, row_scores in zip(chunk, scores))
+        # Candidates come row by row; split them at the row boundaries
+        bounds = np.searchsorted(rows, np.arange(len(block) + 1))
+        for row in range(len(block)):
+            if wide[row]:
+                yield wide_hits.pop(row)
+                continue
+            row_slice = slice(bounds[row], bounds[row + 1])
+            yield _top_k_positions(positions[row_slice], exact[row_slice], limit)
+
+
+def iter_fuzzy_top_k(queries, texts, scorer, limit=FUZZY_LIMIT, workers=-1, dtype=np.uint8,
+                     block_rows=SCORE_BLOCK_ROWS, score_dir=None):
+    """`fuzzy_top_k` through a disk-backed score matrix, yielding the hits of one query at a time.
+
+    The matrix is written to a temporary file in `score_dir` (the system
+    temporary directory if None) on the first `next()` and deleted when the
+    generator is exhausted or closed.
+    """
+    if not queries or not texts:
+        yield from ([] for _ in queries)
+        return
+    with tempfile.TemporaryDirectory(prefix='score_blocks_', dir=score_dir) as directory:
+        score_blocks = write_score_blocks(queries, texts, scorer, os.path.join(directory, 'scores.bin'), dtype,
+                                          block_rows, workers)
+        yield from stream_top_k(score_blocks, queries, texts, scorer, limit, block_rows, workers)
@@ -0,0 +1,203 @@
+"""
+City gazetteer: inflected city forms and postal codes -> canonical city ids.
+
+Raw texts name cities in the locative or genitive ("w Mikołowie", "dla
+Grójca") while the bailiff dictionary stores the nominative ("Mikołów",
+"Grójec"). The gazetteer is built once from the dictionary: every nominative
+city gets an integer id, its inflected forms are generated by suffix rules and
+the dictionary postal codes are mapped to the same ids. Comparing two cities
+is then an integer comparison, and the id doubles as a blocking key.
+"""
+
+import re
+from itertools import product
+
+POLISH_CHARS = str.maketrans({
+    'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z',
+})
+
+POSTAL_CODE_PATTERN = re.compile(r'\b(\d{2})-?(\d{3})\b')
+
+# Hard consonant -> its softened form before the locative ending -e
+LOCATIVE_ALTERNATIONS = [
+    ('ch', 'sze'), ('st', 'ście'), ('sł', 'śle'), ('zd', 'ździe'),
+    ('k', 'ce'), ('g', 'dze'), ('r', 'rze'), ('ł', 'le'), ('t', 'cie'), ('d', 'dzie'),
+    ('s', 'sie'), ('z', 'zie'), ('n', 'nie'), ('w', 'wie'), ('m', 'mie'), ('b', 'bie'),
+    ('p', 'pie'), ('f', 'fie'),
+]
+
+# Soft final consonants written with an accent at the end of a word
+SOFT_FINALS = {'ń': 'ni', 'ś': 'si', 'ć': 'ci', 'ź': 'zi', 'dź': 'dzi'}
+
+
+def fold_city(text):
+    """Lowercase, strip diacritics and collapse whitespace/hyphens of a city name."""
+    if not text:
+        return ""
+    text = str(text).lower().translate(POLISH_CHARS)
+    return re.sub(r'\s*-\s*', '-', re.sub(r'\s+', ' ', text)).strip(' ,.')
+
+
+def postal_code(text):
+    """Return the first postal code in text as 'dd-ddd', or None."""
+    match = POSTAL_CODE_PATTERN.search(str(text)) if text else None
+    return f"{match.group(1)}-{match.group(2)}" if match else None
+
+
+def _locative_e(stem):
+    for ending, replacement in LOCATIVE_ALTERNATIONS:
+        if stem.endswith(ending):
+            return stem[:-len(ending)] + replacement
+    return None
+
+
+def _adjective_forms(word):
+    """Locative/genitive forms of a word if it is an adjective (Nowy, Zielona, Mazowiecki)."""
+    if word.endswith(('ki', 'gi')):
+        return {word + 'm', word + 'ego'}
+    if word.endswith('y'):
+        return {word[:-1] + 'ym', word[:-1] + 'ego'}
+    if word.endswith('i'):
+        return {word + 'm', word + 'ego'}
+    if word.endswith('a'):
+        return {word[:-1] + 'ej'}
+    if word.endswith('e'):
+        return {word[:-1] + 'em', word[:-1] + 'ego'}
+    return set()
+
+
+def _noun_forms(word):
+    """Locative and genitive forms of a noun (Mikołów, Grójec, Warszawa, Łódź)."""
+    forms = set()
+
+    if word.endswith('ódź'):
+        stem = word[:-3] + 'odzi'
+        return {stem}
+    if word.endswith('ów'):
+        stem = word[:-2] + 'ow'
+        return {stem + 'ie', stem + 'a'}
+    if word.endswith(('ec', 'ek')) and len(word) > 3:
+        stem = word[:-2] + word[-1]
+        forms |= {stem + 'u', stem + 'a'}
+    if word.endswith(('ce', 'y', 'i')) and not word.endswith('ia'):
+        # Plural city names: Katowice, Kielce, Tychy, Suwałki
+        stem = word[:-1]
+        return forms | {stem + 'ach', stem, stem + 'ów'}
+
+    for final, soft_stem in SOFT_FINALS.items():
+        if word.endswith(final):
+            stem = word[:-len(final)] + soft_stem
+            return forms | {stem + 'u', stem + 'a', stem}
+
+    last = word[-1]
+    if last == 'a':
+        stem = word[:-1]
+        forms |= {stem + 'y', stem + 'i'}
+        if stem.endswith(('i', 'c', 'cz', 'sz', 'rz', 'ż', 'dz', 'j', 'l')):
+            forms |= {stem + 'y', stem + 'i', stem}
+        locative = _locative_e(stem)
+        if locative:
+            forms.add(locative)
+    elif last in 'oe':
+        stem = word[:-1]
+        forms |= {stem + 'u', stem + 'a'}
+        locative = _locative_e(stem)
+        if locative:
+            forms.add(locative)
+    elif last not in 'aeiouyąęó':
+        # Consonant stems: -u/-iu (Gdańsku, Radomiu) or a softened -e (Lublinie, Sopocie)
+        forms |= {word + 'u', word + 'iu', word + 'a', word + 'y'}
+        locative = _locative_e(word)
+        if locative:
+            forms.add(locative)
+
+    return forms
+
+
+def inflected_forms(city):
+    """Every generated case form of a (possibly multi-word or hyphenated) city name."""
+    words = re.split(r'(\s+|-)', str(city).lower().strip())
+    options = []
+    for word in words:
+        if not word.strip() or word == '-':
+            options.append([word])
+            continue
+        options.append(sorted({word} | _noun_forms(word) | _adjective_forms(word)))
+    return {fold_city("".join(combination)) for combination in product(*options)}
+
+
+class CityGazetteer:
+    """Maps city name forms and postal codes to canonical integer city ids."""
+
+    __slots__ = ('names', 'by_form', 'by_postal_code', 'by_postal_prefix')
+
+    def __init__(self, cities=(), postal_codes=()):
+        # Canonical id -> nominative name
+        self.names = []
+        self.by_form = {}
+        self.by_postal_code = {}
+        self.by_postal_prefix = {}
+
+        ids = {}
+        unique = {fold_city(city): city for city in cities if fold_city(city)}
+        for folded, city in sorted(unique.items()):
+            ids[folded] = self.by_form[folded] = len(self.names)
+            self.names.append(city)
+
+        # Generated forms never override a nominative; forms shared by two cities are dropped
+        ambiguous = set()
+        generated = {}
+        for city_id in ids.values():
+            for form in inflected_forms(self.names[city_id]):
+                if form in self.by_form:
+                    continue
+                if generated.setdefault(form, city_id) != city_id:
+                    ambiguous.add(form)
+        for form, city_id in generated.items():
+            if form not in ambiguous:
+                self.by_form[form] = city_id
+
+        prefix_ids = {}
+        for code, city in postal_codes:
+            code, city_id = postal_code(code), ids.get(fold_city(city))
+            if code and city_id is not None:
+                self.by_postal_code.setdefault(code, city_id)
+                prefix_ids.setdefault(code[:4], set()).add(city_id)
+        # A postal prefix only identifies a city when all dictionary codes under it agree
+        self.by_postal_prefix = {prefix: next(iter(found)) for prefix, found in prefix_ids.items() if len(found) == 1}
+
+    @classmethod
+    def from_bailiffs(cls, bailiffs):
+        """Build the gazetteer from bailiff records (`original_miasto`, `kod_pocztowy`)."""
+        bailiffs = list(bailiffs)
+        return cls(
+            (bailiff.original_miasto for bailiff in bailiffs if bailiff.original_miasto),
+            ((bailiff.kod_pocztowy, bailiff.original_miasto) for bailiff in bailiffs
+             if bailiff.kod_pocztowy and bailiff.original_miasto),
+        )
+
+    def resolve(self, text, postal=None):
+        """Canonical id of the city named in text (any case form), else of its postal code; None if unknown."""
+        if text:
+            folded = fold_city(POSTAL_CODE_PATTERN.sub(' ', str(text)))
+            folded = re.sub(r'^(?:w|we|dla)\s+', '', folded)
+            if folded in self.by_form:
+                return self.by_form[folded]
+
+            # Address-like text: try the trailing two and one words ("ul. Długa 5, Mikołów")
+            words = re.split(r'[\s,]+', folded)
+            for size in (2, 1):
+                if len(words) > size and " ".join(words[-size:]) in self.by_form:
+                    return self.by_form[" ".join(words[-size:])]
+
+        code = postal_code(text) or postal_code(postal)
+        if code:
+            return self.by_postal_code.get(code, self.by_postal_prefix.get(code[:4]))
+        return None
+
+    def name(self, city_id):
+        """Nominative name of a city id."""
+        return self.names[city_id] if city_id is not None else None
+
+    def __len__(self):
+        return len(self.names)
@@ -0,0 +1,140 @@
+"""
+Idempotent schema updates for the SQLite database.
+
+`Base.metadata.create_all` only creates missing tables, so columns and indexes
+added to existing tables are listed here and applied by `ensure_schema`.
+"""
+
+from sqlalchemy import inspect, text
+
+from bailiff_directory import ensure_directory_index
+from city_gazetteer import postal_code
+from institutional_phrases import court_key
+from polish_phonetics import phonetic_key
+from surname_folding import surname_stem
+
+# (table, column, column DDL)
+COLUMNS = [
+    ('bailiffs_dict', 'phonetic_lastname', 'VARCHAR(100)'),
+    ('raw_names', 'phonetic_lastname', 'VARCHAR(100)'),
+    ('bailiffs_dict', 'surname_stem', 'VARCHAR(100)'),
+    ('raw_names', 'surname_stem', 'VARCHAR(100)'),
+    ('bailiffs_dict', 'court_key', 'VARCHAR(200)'),
+    ('raw_names', 'source_postal_code', 'VARCHAR(20)'),
+    ('raw_names', 'source_district_code', 'VARCHAR(20)'),
+    ('raw_names', 'source_court', 'TEXT'),
+    ('raw_names', 'court_key', 'VARCHAR(200)'),
+    ('raw_names', 'source_iban', 'VARCHAR(50)'),
+    ('match_suggestions', 'scoring_profile', 'VARCHAR(50)'),
+    ('match_suggestions', 'features', 'BLOB'),
+    ('analysis_sessions', 'data_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('bailiffs_dict', 'api_row_id', 'VARCHAR(100)'),
+    ('bailiffs_dict', 'api_updated_at', 'VARCHAR(40)'),
+    ('bailiffs_dict', 'canonical_id', 'INTEGER'),
+    ('analysis_sessions', 'storage_file', 'VARCHAR(500)'),
+]
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_bailiffs_dict_phonetic_lastname', 'bailiffs_dict', 'phonetic_lastname'),
+    ('ix_raw_names_phonetic_lastname', 'raw_names', 'phonetic_lastname'),
+    ('ix_bailiffs_dict_surname_stem', 'bailiffs_dict', 'surname_stem'),
+    ('ix_raw_names_surname_stem', 'raw_names', 'surname_stem'),
+    ('ix_bailiffs_dict_court_key', 'bailiffs_dict', 'court_key'),
+    ('ix_raw_names_court_key', 'raw_names', 'court_key'),
+    ('ix_raw_names_source_postal_code', 'raw_names', 'source_postal_code'),
+    ('ix_name_mappings_raw_id', 'name_mappings', 'raw_id'),
+    ('ix_bailiffs_dict_api_row_id', 'bailiffs_dict', 'api_row_id'),
+    ('ix_bailiffs_dict_canonical_id', 'bailiffs_dict', 'canonical_id'),
+    ('ix_raw_names_session_id', 'raw_names', 'session_id'),
+    ('ix_match_suggestions_session_id', 'match_suggestions', 'session_id'),
+    ('ix_name_mappings_session_id', 'name_mappings', 'session_id'),
+]
+
+
+def _backfill_column(connection, table, source, target, key_function):
+    """Fill a column derived from `source` for rows created before it existed."""
+    if source not in {col['name'] for col in inspect(connection).get_columns(table)}:
+        return
+    rows = connection.execute(text(
+        f"SELECT id, {source} FROM {table} WHERE {target} IS NULL AND {source} IS NOT NULL"
+    )).fetchall()
+    if rows:
+        connection.execute(
+            text(f"UPDATE {table} SET {target} = :key WHERE id = :id"),
+            [{'id': row_id, 'key': key_function(value)} for row_id, value in rows]
+        )
+
+
+def _backfill_surname_keys(connection, target, key_function):
+    """Fill a derived surname key column for rows created before it existed."""
+    for table, source in (('bailiffs_dict', 'normalized_lastname'), ('raw_names', 'extracted_lastname')):
+        _backfill_column(connection, table, source, target, key_function)
+
+
+def backfill_court_keys(connection):
+    """Compute court blocking keys from court names and raw bailiff titles."""
+    _backfill_column(connection, 'bailiffs_dict', 'original_sad', 'court_key', court_key)
+    _backfill_column(connection, 'raw_names', 'raw_text', 'court_key', court_key)
+
+
+def backfill_postal_codes(connection):
+    """Extract postal codes from the addresses of raw names imported earlier."""
+    _backfill_column(connection, 'raw_names', 'source_address', 'source_postal_code', postal_code)
+
+
+def backfill_phonetic_keys(connection):
+    """Compute phonetic keys for rows created before the column existed."""
+    _backfill_surname_keys(connection, 'phonetic_lastname', phonetic_key)
+
+
+def backfill_surname_stems(connection):
+    """Compute gender-folded surname stems for rows created before the column existed."""
+    _backfill_surname_keys(connection, 'surname_stem', surname_stem)
+
+
+# Column -> backfill run once when the column is first added
+BACKFILLS = {
+    ('bailiffs_dict', 'phonetic_lastname'): backfill_phonetic_keys,
+    ('raw_names', 'phonetic_lastname'): backfill_phonetic_keys,
+    ('bailiffs_dict', 'surname_stem'): backfill_surname_stems,
+    ('raw_names', 'surname_stem'): backfill_surname_stems,
+    ('bailiffs_dict', 'court_key'): backfill_court_keys,
+    ('raw_names', 'court_key'): backfill_court_keys,
+    ('raw_names', 'source_postal_code'): backfill_postal_codes,
+}
+
+
+def ensure_schema(engine):
+    """Add missing columns and indexes; returns the list of added columns."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with engine.begin() as connection:
+        for table, column, ddl in COLUMNS:
+            if table not in existing_tables:
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table)}
+            if column not in existing:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                added.append((table, column))
+
+        for name, table, columns in INDEXES:
+            # Older databases may have a table without the indexed column
+            if table in existing_tables and columns in {col['name'] for col in inspect(connection).get_columns(table)}:
+                connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+        backfills = []
+        for table_column in added:
+            backfill = BACKFILLS.get(table_column)
+            if backfill and backfill not in backfills:
+                backfills.append(backfill)
+        for backfill in backfills:
+            backfill(connection)
+
+        ensure_directory_index(connection)
+
+    if added:
+        print(f"✅ Zaktualizowano schemat bazy: {', '.join(f'{t}.{c}' for t, c in added)}")
+    return added
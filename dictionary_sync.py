@@ -0,0 +1,305 @@
+"""
+Incremental sync of the bailiff dictionary with the dane.gov.pl registry.
+
+`DaneGovSyncClient` reads the first page of the resource to learn the row
+count and then fetches the remaining pages concurrently (at most
+`concurrency` requests in flight), retrying failed requests with exponential
+backoff. A page that still fails aborts the whole fetch - a partial download
+must never look like bailiffs removed from the registry.
+
+The fetched rows are diffed against `bailiffs_dict` by the registry row id
+(`api_row_id`) and its `updated_at` stamp, and only the difference is
+written: new rows are inserted, changed rows updated, rows gone from the
+registry deleted (with their suggestions in the main database and in every
+session file). Dictionary rows without a registry id (added by hand or
+imported from files) are left alone, except that on the first sync a row
+with the same surname, first name and city adopts the registry id instead
+of being duplicated.
+
+Requests go through `urllib` on worker threads, so the client needs no HTTP
+library and works against any stub server given as `endpoint`.
+"""
+
+import asyncio
+import json
+import math
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import NamedTuple, Optional
+
+from sqlalchemy import bindparam, text
+
+from bailiff_lookup import fold_query
+from institutional_phrases import court_key
+from polish_phonetics import phonetic_key
+from session_storage import open_session_store, session_store_files
+from session_versions import bump_data_version
+from surname_folding import surname_stem
+
+BAILIFFS_ENDPOINT = "https://api.dane.gov.pl/1.4/resources/67925,wykaz-komornikow-na-1072025/data"
+PAGE_SIZE = 100
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0
+REQUEST_TIMEOUT = 30
+# HTTP statuses worth retrying; other client errors fail at once
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class SyncError(RuntimeError):
+    """The registry could not be read completely."""
+
+
+class ApiBailiff(NamedTuple):
+    """One row of the registry resource."""
+    row_id: str
+    updated_at: Optional[str]
+    nazwisko: str
+    imie: Optional[str]
+    miasto: Optional[str]
+    ulica: Optional[str]
+    kod_pocztowy: Optional[str]
+    apelacja: Optional[str]
+    sad: Optional[str]
+
+
+def parse_api_row(item):
+    """`ApiBailiff` of one `data` item of the resource (None if it has no surname)."""
+    attributes = item.get('attributes', {})
+
+    def value(column):
+        cell = attributes.get(column)
+        return (cell.get('val') if isinstance(cell, dict) else cell) or None
+
+    if not value('col3'):
+        return None
+    return ApiBailiff(
+        row_id=str(item['id']),
+        updated_at=item.get('meta', {}).get('updated_at'),
+        nazwisko=value('col3'),
+        imie=value('col4'),
+        miasto=value('col5'),
+        ulica=value('col6'),
+        kod_pocztowy=value('col7'),
+        apelacja=value('col1'),
+        sad=value('col2'),
+    )
+
+
+class DaneGovSyncClient:
+    """Concurrent, retrying reader of the registry resource."""
+
+    def __init__(self, endpoint=BAILIFFS_ENDPOINT, page_size=PAGE_SIZE, concurrency=MAX_CONCURRENCY,
+                 retries=MAX_RETRIES, backoff=RETRY_BACKOFF, timeout=REQUEST_TIMEOUT):
+        self.endpoint = endpoint
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _page_url(self, page):
+        separator = '&' if '?' in self.endpoint else '?'
+        return f"{self.endpoint}{separator}{urllib.parse.urlencode({'page': page, 'per_page': self.page_size})}"
+
+    def _fetch_json(self, url, headers=None):
+        """(JSON, response headers) of a GET; (None, headers) for 304 Not Modified."""
+        request = urllib.request.Request(url, headers={'Accept': 'application/json', **(headers or {})})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.load(response), response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, e.headers
+            raise
+
+    async def fetch_page(self, page, headers=None):
+        """(JSON, response headers) of one page, retried on network errors and transient HTTP statuses."""
+        url = self._page_url(page)
+        for attempt in range(self.retries + 1):
+            try:
+                return await asyncio.to_thread(self._fetch_json, url, headers)
+            except urllib.error.HTTPError as e:
+                if e.code not in RETRY_STATUSES or attempt == self.retries:
+                    raise SyncError(f"Strona {page}: HTTP {e.code}") from e
+                error = e
+            except (urllib.error.URLError, TimeoutError, ValueError) as e:
+                if attempt == self.retries:
+                    raise SyncError(f"Strona {page}: {e}") from e
+                error = e
+            print(f"⚠️ Strona {page}: próba {attempt + 1} nieudana ({error}), ponawianie...")
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def fetch_all(self, first=None):
+        """All registry rows as (parsed rows, ids of every row seen including malformed ones).
+
+        `first` is the already fetched JSON of page 1, if any.
+        """
+        if first is None:
+            first, _ = await self.fetch_page(1)
+        count = first.get('meta', {}).get('count')
+        pages = [first]
+        if count is not None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def bounded(page):
+                async with semaphore:
+                    data, _ = await self.fetch_page(page)
+                    return data
+
+            page_count = math.ceil(count / self.page_size)
+            pages += await asyncio.gather(*(bounded(page) for page in range(2, page_count + 1)))
+        else:
+            # No row count: follow the pages one by one
+            page = 1
+            while pages[-1].get('data') and pages[-1].get('links', {}).get('next'):
+                page += 1
+                data, _ = await self.fetch_page(page)
+                pages.append(data)
+
+        rows, seen_row_ids = [], set()
+        for data in pages:
+            for item in data.get('data', []):
+                seen_row_ids.add(str(item.get('id')))
+                row = parse_api_row(item)
+                if row is not None:
+                    rows.append(row)
+        if count is not None and len(seen_row_ids) < count:
+            raise SyncError(f"Pobrano {len(seen_row_ids)} z {count} wierszy rejestru")
+        return rows, seen_row_ids
+
+
+class DictionaryDiff(NamedTuple):
+    """Changes turning `bailiffs_dict` into the registry state."""
+    inserts: list
+    # (dictionary id, ApiBailiff)
+    updates: list
+    deletes: list
+
+
+def _identity(lastname, firstname, city):
+    return fold_query(lastname), fold_query(firstname), fold_query(city)
+
+
+def diff_dictionary(connection, rows, seen_row_ids=None):
+    """Compare registry rows with the dictionary by registry id and update stamp.
+
+    Rows in `seen_row_ids` (ids present in the registry but not parsed) are
+    never deleted.
+    """
+    existing = connection.execute(text(
+        "SELECT id, api_row_id, api_updated_at, original_nazwisko, original_imie, original_miasto FROM bailiffs_dict"
+    )).fetchall()
+    by_row_id = {row.api_row_id: row for row in existing if row.api_row_id}
+    # Rows without a registry id, by identity, for adoption on the first sync
+    unclaimed = {}
+    for row in existing:
+        if not row.api_row_id:
+            unclaimed.setdefault(_identity(row.original_nazwisko, row.original_imie, row.original_miasto), []).append(row.id)
+
+    diff = DictionaryDiff([], [], [])
+    for api_row in rows:
+        current = by_row_id.get(api_row.row_id)
+        if current is not None:
+            if current.api_updated_at != api_row.updated_at:
+                diff.updates.append((current.id, api_row))
+            continue
+        candidates = unclaimed.get(_identity(api_row.nazwisko, api_row.imie, api_row.miasto))
+        if candidates:
+            diff.updates.append((candidates.pop(0), api_row))
+        else:
+            diff.inserts.append(api_row)
+
+    present = {api_row.row_id for api_row in rows} | set(seen_row_ids or ())
+    diff.deletes.extend(row.id for row_id, row in by_row_id.items() if row_id not in present)
+    return diff
+
+
+# Columns written by the sync (see bailiff_values)
+BAILIFF_COLUMNS = ('original_nazwisko', 'original_imie', 'original_miasto', 'original_sad', 'adres', 'kod_pocztowy',
+                   'normalized_lastname', 'normalized_firstname', 'normalized_city', 'normalized_fullname',
+                   'phonetic_lastname', 'surname_stem', 'court_key', 'api_row_id', 'api_updated_at')
+
+
+def bailiff_values(api_row):
+    """`bailiffs_dict` columns of a registry row, with the derived matching keys."""
+    lastname, firstname, city = _identity(api_row.nazwisko, api_row.imie, api_row.miasto)
+    return {
+        'original_nazwisko': api_row.nazwisko,
+        'original_imie': api_row.imie,
+        'original_miasto': api_row.miasto,
+        'original_sad': api_row.sad,
+        'adres': api_row.ulica,
+        'kod_pocztowy': api_row.kod_pocztowy,
+        'normalized_lastname': lastname,
+        'normalized_firstname': firstname,
+        'normalized_city': city,
+        'normalized_fullname': f"{firstname} {lastname}".strip(),
+        'phonetic_lastname': phonetic_key(api_row.nazwisko) or None,
+        'surname_stem': surname_stem(api_row.nazwisko) or None,
+        'court_key': court_key(api_row.sad) if api_row.sad else None,
+        'api_row_id': api_row.row_id,
+        'api_updated_at': api_row.updated_at,
+    }
+
+
+def apply_dictionary_diff(connection, diff):
+    """Write the diff with set-based statements; returns (inserted, updated, deleted, kept).
+
+    Bailiffs gone from the registry but referenced by review decisions are
+    kept (`kept`) so the decisions stay readable; their suggestions are
+    removed with the other deleted bailiffs'. Suggestions in session files
+    are deleted by `delete_store_suggestions` once this transaction is
+    committed.
+    """
+    columns = BAILIFF_COLUMNS
+    if diff.inserts:
+        connection.execute(
+            text(f"INSERT INTO bailiffs_dict (created_at, {', '.join(columns)}) "
+                 f"VALUES (CURRENT_TIMESTAMP, {', '.join(':' + column for column in columns)})"),
+            [bailiff_values(api_row) for api_row in diff.inserts]
+        )
+    if diff.updates:
+        connection.execute(
+            text(f"UPDATE bailiffs_dict SET {', '.join(f'{column} = :{column}' for column in columns)} WHERE id = :id"),
+            [dict(bailiff_values(api_row), id=bailiff_id) for bailiff_id, api_row in diff.updates]
+        )
+
+    deleted = kept = 0
+    if diff.deletes:
+        mapped = {row[0] for row in connection.execute(
+            text("SELECT DISTINCT bailiff_id FROM name_mappings WHERE bailiff_id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)), {'ids': diff.deletes})}
+        removable = [bailiff_id for bailiff_id in diff.deletes if bailiff_id not in mapped]
+        kept = len(diff.deletes) - len(removable)
+        connection.execute(text("DELETE FROM match_suggestions WHERE bailiff_id IN :ids")
+                           .bindparams(bindparam('ids', expanding=True)), {'ids': diff.deletes})
+        if removable:
+            connection.execute(text("DELETE FROM bailiffs_dict WHERE id IN :ids")
+                               .bindparams(bindparam('ids', expanding=True)), {'ids': removable})
+            # Records merged into a removed bailiff stand on their own until the next entity resolution
+            connection.execute(text("UPDATE bailiffs_dict SET canonical_id = NULL WHERE canonical_id IN :ids")
+                               .bindparams(bindparam('ids', expanding=True)), {'ids': removable})
+        deleted = len(removable)
+
+    if diff.inserts or diff.updates or diff.deletes:
+        # Suggestions of every session show dictionary data
+        bump_data_version(connection)
+    return len(diff.inserts), len(diff.updates), deleted, kept
+
+
+def delete_store_suggestions(engine, bailiff_ids):
+    """Delete suggestions of bailiffs gone from the registry from every session file; returns their number."""
+    if not bailiff_ids:
+        return 0
+    with engine.connect() as connection:
+        store_files = session_store_files(connection)
+    removed = 0
+    # Sessions with their own database file keep their suggestions there
+    for storage_file in store_files:
+        with open_session_store(engine, storage_file)[0].begin() as store_connection:
+            removed += store_connection.execute(text("DELETE FROM match_suggestions WHERE bailiff_id IN :ids")
+                                                .bindparams(bindparam('ids', expanding=True)),
+                                                {'ids': list(bailiff_ids)}).rowcount
+    return removed
@@ -0,0 +1,270 @@
+"""
+Entity resolution of the bailiff dictionary.
+
+The dictionary collects the same bailiff several times: from the registry,
+from imported files and from manual additions, with surname spelling
+variants, the feminine/masculine surname form, a missing first name or an
+alternative city of the office. Grouping by the exact `normalized_fullname`
+misses all of these and merges namesakes from different cities.
+
+Records are compared only inside blocks that share a phonetic surname key, a
+gender-folded surname stem or an IBAN/e-mail/phone (the `BailiffIndex`
+channels), so the number of compared pairs stays close to linear. A pair is
+the same bailiff when the first names agree (relatives share surnames) and
+
+- an identifier is shared and the names are similar, or
+- the names are near-identical and the city (gazetteer id), court or postal
+  district agrees, or
+- the names are identical and one of the records has no location at all.
+
+Matching pairs are clustered with union-find, but two clusters are never
+joined when their locations conflict (different cities, courts or postal
+districts), so a chain of pairs cannot merge namesakes from different
+cities. Records without any location are attached last, and only when they
+match exactly one located cluster. Each cluster keeps its most
+complete record as the canonical one; the others get `canonical_id` set and
+are left out of the matcher's index, their suggestions and review decisions
+are moved to the canonical record. Nothing is deleted, so a new resolution
+run (after the dictionary changed) starts again from the stored rows.
+"""
+
+from typing import NamedTuple
+
+from rapidfuzz import fuzz
+from sqlalchemy import bindparam, text
+
+from bailiff_lookup import fold_query
+from city_gazetteer import postal_code
+from match_records import POSTAL_PREFIX_LENGTH, BailiffIndex, load_bailiff_records
+from session_versions import bump_data_version
+
+# First names below this similarity belong to different people
+FIRSTNAME_THRESHOLD = 85
+# Name similarity (token sort ratio of "surname first name") needed with a shared identifier
+IDENTIFIER_NAME_THRESHOLD = 80
+# ... with an agreeing city, court or postal district
+LOCATION_NAME_THRESHOLD = 92
+# ... when one of the records has no location to compare
+NAME_ONLY_THRESHOLD = 100
+
+# Fields counted when choosing the canonical record of a cluster
+COMPLETENESS_FIELDS = ('original_imie', 'original_miasto', 'original_sad', 'kod_pocztowy', 'telefon', 'email',
+                       'numer_konta')
+
+
+class EntityCluster(NamedTuple):
+    """Dictionary rows of one bailiff."""
+    canonical_id: int
+    duplicate_ids: list
+    # Evidence of each merged pair: 'identifier', 'city', 'court', 'postal' or 'name'
+    reasons: list
+
+
+class _UnionFind:
+    __slots__ = ('parent',)
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, position):
+        while self.parent[position] != position:
+            self.parent[position] = self.parent[self.parent[position]]
+            position = self.parent[position]
+        return position
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def _blocks(index):
+    """Groups of positions sharing a phonetic surname key, surname stem or identifier."""
+    yield from index.by_phonetic_lastname.values()
+    yield from index.by_surname_stem.values()
+    yield from index.by_identifier.values()
+
+
+def _candidate_pairs(index):
+    pairs = set()
+    for block in _blocks(index):
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+
+class _PairScorer:
+    """Comparison keys of every record, computed once per resolution run."""
+
+    def __init__(self, index):
+        self.index = index
+        self.names = [fold_query(f"{lastname} {firstname}") for lastname, firstname
+                      in zip(index.lastnames, index.firstnames)]
+        self.firstnames = [fold_query(firstname) for firstname in index.firstnames]
+        self.postal_prefixes = []
+        for bailiff in index.bailiffs:
+            code = postal_code(bailiff.kod_pocztowy)
+            self.postal_prefixes.append(code[:POSTAL_PREFIX_LENGTH] if code else None)
+        self.identifiers = [set() for _ in index.bailiffs]
+        for identifier, positions in index.by_identifier.items():
+            for position in positions:
+                self.identifiers[position].add(identifier)
+
+    def location(self, position):
+        """(city ids, court keys, postal prefixes) of a record, as sets."""
+        court = self.index.bailiffs[position].court_key
+        city = self.index.city_ids[position]
+        postal = self.postal_prefixes[position]
+        return ({city} if city is not None else set(), {court} if court else set(), {postal} if postal else set())
+
+    def evidence(self, a, b):
+        """Why positions a and b are the same bailiff, or None if they are not."""
+        first_a, first_b = self.firstnames[a], self.firstnames[b]
+        if first_a and first_b and fuzz.ratio(first_a, first_b) < FIRSTNAME_THRESHOLD:
+            return None
+        score = fuzz.token_sort_ratio(self.names[a], self.names[b])
+        if score >= IDENTIFIER_NAME_THRESHOLD and self.identifiers[a] & self.identifiers[b]:
+            return 'identifier'
+        if score < LOCATION_NAME_THRESHOLD:
+            return None
+
+        index = self.index
+        city_a, city_b = index.city_ids[a], index.city_ids[b]
+        court_a, court_b = index.bailiffs[a].court_key, index.bailiffs[b].court_key
+        postal_a, postal_b = self.postal_prefixes[a], self.postal_prefixes[b]
+        if city_a is not None and city_a == city_b:
+            return 'city'
+        if court_a and court_a == court_b:
+            return 'court'
+        if postal_a and postal_a == postal_b:
+            return 'postal'
+        located_a = city_a is not None or court_a or postal_a
+        located_b = city_b is not None or court_b or postal_b
+        if score >= NAME_ONLY_THRESHOLD and not (located_a and located_b):
+            return 'name'
+        return None
+
+
+def _completeness(bailiff):
+    return sum(1 for field in COMPLETENESS_FIELDS if getattr(bailiff, field))
+
+
+def _locations_conflict(locations_a, locations_b):
+    """True when two clusters have a city, court or postal district and none of them is shared."""
+    return any(a and b and not a & b for a, b in zip(locations_a, locations_b))
+
+
+def resolve_entities(bailiffs):
+    """Clusters of `BailiffRecord`s describing the same bailiff (only clusters with duplicates)."""
+    index = bailiffs if isinstance(bailiffs, BailiffIndex) else BailiffIndex(bailiffs)
+    scorer = _PairScorer(index)
+    union_find = _UnionFind(len(index.bailiffs))
+    # Locations of each cluster, kept on its root
+    locations = [scorer.location(position) for position in range(len(index.bailiffs))]
+    located = [any(location) for location in locations]
+    reasons = {}
+
+    def union(a, b, reason):
+        root_a, root_b = union_find.find(a), union_find.find(b)
+        if root_a == root_b or _locations_conflict(locations[root_a], locations[root_b]):
+            return
+        union_find.union(a, b)
+        merged = tuple(set_a | set_b for set_a, set_b in zip(locations[root_a], locations[root_b]))
+        locations[union_find.find(a)] = merged
+        reasons.setdefault(a, []).append(reason)
+
+    matches = sorted((a, b, reason) for a, b in _candidate_pairs(index) for reason in [scorer.evidence(a, b)]
+                     if reason)
+    # Located records first, then records without a location among themselves
+    for a, b, reason in matches:
+        if located[a] == located[b]:
+            union(a, b, reason)
+
+    # A cluster without location joins a located cluster only when that cluster is the only one it matches
+    located_matches = {}
+    for a, b, reason in matches:
+        if located[a] != located[b]:
+            unlocated, other = (b, a) if located[a] else (a, b)
+            located_matches.setdefault(union_find.find(unlocated), {}).setdefault(
+                union_find.find(other), (unlocated, other, reason))
+    for candidates in located_matches.values():
+        if len(candidates) == 1:
+            union(*next(iter(candidates.values())))
+
+    members = {}
+    for position in range(len(index.bailiffs)):
+        members.setdefault(union_find.find(position), []).append(position)
+
+    clusters = []
+    for positions in members.values():
+        if len(positions) < 2:
+            continue
+        records = [index.bailiffs[position] for position in positions]
+        # Most complete record wins; the oldest one on ties
+        canonical = max(records, key=lambda bailiff: (_completeness(bailiff), -bailiff.id))
+        clusters.append(EntityCluster(
+            canonical_id=canonical.id,
+            duplicate_ids=sorted(bailiff.id for bailiff in records if bailiff.id != canonical.id),
+            reasons=[reason for position in positions for reason in reasons.get(position, [])],
+        ))
+    return sorted(clusters, key=lambda cluster: cluster.canonical_id)
+
+
+def resolve_dictionary(connection):
+    """`resolve_entities` over every row of `bailiffs_dict`, merged ones included."""
+    return resolve_entities(load_bailiff_records(connection, canonical_only=False))
+
+
+# Moves rows of {table} from merged records to their canonical record
+REPOINT_STATEMENT = ("UPDATE {table} SET bailiff_id = "
+                     "(SELECT canonical_id FROM bailiffs_dict WHERE bailiffs_dict.id = {table}.bailiff_id) "
+                     "WHERE bailiff_id IN :ids")
+
+
+def repoint_suggestions(connection, clusters):
+    """Move suggestions to canonical records, keeping the best one per raw name and bailiff.
+
+    Expects `canonical_id` already stored; also used for the suggestions in
+    session database files. Returns (suggestions moved, duplicates removed).
+    """
+    duplicate_ids = [duplicate_id for cluster in clusters for duplicate_id in cluster.duplicate_ids]
+    if not duplicate_ids:
+        return 0, 0
+    moved = connection.execute(text(REPOINT_STATEMENT.format(table='match_suggestions'))
+                               .bindparams(bindparam('ids', expanding=True)), {'ids': duplicate_ids}).rowcount
+
+    # A raw name suggested with two records of one bailiff keeps the better suggestion
+    removed = connection.execute(text("""
+        DELETE FROM match_suggestions WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY raw_id, bailiff_id ORDER BY combined_score DESC, id
+                ) AS duplicate_rank
+                FROM match_suggestions WHERE bailiff_id IN :canonical_ids
+            ) WHERE duplicate_rank > 1
+        )
+    """).bindparams(bindparam('canonical_ids', expanding=True)),
+        {'canonical_ids': sorted({cluster.canonical_id for cluster in clusters})}).rowcount
+    return moved, removed
+
+
+def apply_entity_clusters(connection, clusters):
+    """Store the clusters and point suggestions and decisions at canonical records.
+
+    Returns (merged records, suggestions moved, duplicate suggestions removed).
+    All writes are set-based; earlier `canonical_id`s are replaced.
+    """
+    connection.execute(text("UPDATE bailiffs_dict SET canonical_id = NULL WHERE canonical_id IS NOT NULL"))
+    merged = [{'id': duplicate_id, 'canonical_id': cluster.canonical_id}
+              for cluster in clusters for duplicate_id in cluster.duplicate_ids]
+    if not merged:
+        return 0, 0, 0
+    connection.execute(text("UPDATE bailiffs_dict SET canonical_id = :canonical_id WHERE id = :id"), merged)
+
+    moved, removed = repoint_suggestions(connection, clusters)
+    connection.execute(text(REPOINT_STATEMENT.format(table='name_mappings'))
+                       .bindparams(bindparam('ids', expanding=True)), {'ids': [row['id'] for row in merged]})
+
+    bump_data_version(connection)
+    return len(merged), moved, removed
@@ -17,6 +17,12 @@ from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func, F
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
+from name_extraction import get_name_automaton
+from raw_name_parsing import classify_columns, normalize_name_simple, parse_raw_name, row_texts  # noqa: F401 - normalize_name_simple re-exported
+from session_archive import ARCHIVED_STATUS, drop_session_archive
+from session_purge import DELETING_STATUS, purge_sessions, reclaim_free_pages, start_session_purge
+from session_storage import create_session_store, drop_session_store, session_database, session_store_files
+
 Base = declarative_base()
 
 class AnalysisSession(Base):
@@ -30,14 +36,16 @@ class AnalysisSession(Base):
     total_records = Column(Integer, nullable=True)
     processed_records = Column(Integer, default=0, nullable=False)
     matched_records = Column(Integer, default=0, nullable=False)
+    data_version = Column(Integer, default=0, nullable=False)  # bumped on every change shown in the review UI
     status = Column(String(50), default='uploaded', nullable=False)
+    storage_file = Column(String(500), nullable=True)  # own database file of the session (session_storage)
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
 class RawNames(Base):
     __tablename__ = 'raw_names'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     source_file = Column(String(500), nullable=False)
     source_sheet = Column(String(100), nullable=True)
     source_row = Column(Integer, nullable=True)
@@ -52,6 +60,13 @@ class RawNames(Base):
     source_email = Column(String(200), nullable=True)
     source_phone = Column(String(50), nullable=True)
     source_address = Column(String(500), nullable=True)
+    source_iban = Column(String(50), nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    source_postal_code = Column(String(20), nullable=True, index=True)
+    source_district_code = Column(String(20), nullable=True)
+    source_court = Column(Text, nullable=True)
+    court_key = Column(String(200), nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class BailiffDict(Base):
@@ -71,12 +86,18 @@ class BailiffDict(Base):
     bank = Column(String(200), nullable=True)
     numer_konta = Column(String(100), nullable=True)
     normalized_fullname = Column(Text, nullable=True)
+    phonetic_lastname = Column(String(100), nullable=True, index=True)
+    surname_stem = Column(String(100), nullable=True, index=True)
+    court_key = Column(String(200), nullable=True, index=True)
+    api_row_id = Column(String(100), nullable=True, index=True)
+    api_updated_at = Column(String(40), nullable=True)
+    canonical_id = Column(Integer, nullable=True, index=True)
     created_at = Column(DateTime, default=func.now(), nullable=False)
 
 class MatchSuggestions(Base):
     __tablename__ = 'match_suggestions'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     raw_id = Column(Integer, ForeignKey('raw_names.id'), nullable=False)
     bailiff_id = Column(Integer, ForeignKey('bailiffs_dict.id'), nullable=False)
     fullname_score = Column(Float, nullable=False)
@@ -93,7 +114,7 @@ class MatchSuggestions(Base):
 class NameMappings(Base):
     __tablename__ = 'name_mappings'
     id = Column(Integer, primary_key=True)
-    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True)
+    session_id = Column(Integer, ForeignKey('analysis_sessions.id'), nullable=True, index=True)
     raw_id = Column(Integer, ForeignKey('raw_names.id'), nullable=False)
     bailiff_id = Column(Integer, ForeignKey('bailiffs_dict.id'), nullable=True)
     mapping_type = Column(String(20), nullable=False)  # 'accepted', 'rejected', 'manual_new'
@@ -102,45 +123,12 @@ class NameMappings(Base):
     reviewed_by = Column(String(100), nullable=True)
     reviewed_at = Column(DateTime, default=func.now(), nullable=False)
 
-def normalize_name_simple(text):
-    """Simple normalization function."""
-    if not text or pd.isna(text):
-        return ""
-    
-    # Convert to string and basic cleanup
-    text = str(text).strip()
-    
-    # Remove common titles and formulas
-    patterns_to_remove = [
-        r'komornik\s+sądowy\s+przy\s+sądzie',
-        r'kancelaria\s+komornicza\s+nr\s+[ivx]+',
-        r'dr\s+hab\.?',
-        r'prof\.?\s+dr\s+hab\.?',
-        r'mgr\.?',
-        r'przy\s+sądzie\s+\w+',
-        r'w\s+[A-ZĄĆĘŁŃÓŚŹŻ]\w+',
-        r'nr\s+[ivx]+',
-    ]
-    
-    result = text.lower()
-    for pattern in patterns_to_remove:
-        result = re.sub(pattern, ' ', result, flags=re.IGNORECASE)
-    
-    # Remove Polish characters
-    polish_chars = {
-        'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z'
-    }
-    for polish_char, latin_char in polish_chars.items():
-        result = result.replace(polish_char, latin_char)
-    
-    # Clean up spaces and punctuation
-    result = re.sub(r'[^\w\s]', ' ', result)
-    result = re.sub(r'\s+', ' ', result).strip()
-    
-    return result
+def create_analysis_session(session_name, filename, description="", separate_storage=False):
+    """Create a new analysis session.
 
-def create_analysis_session(session_name, filename, description=""):
-    """Create a new analysis session."""
+    With `separate_storage` its raw names and suggestions are kept in a
+    session database file (see `session_storage`).
+    """
     engine = create_engine('sqlite:///bailiffs_matching.db', echo=False)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     db_session = SessionLocal()
@@ -162,6 +150,10 @@ def create_analysis_session(session_name, filename, description=""):
         db_session.add(new_session)
         db_session.commit()
         
+        if separate_storage:
+            path = create_session_store(engine, new_session.id, [RawNames.__table__, MatchSuggestions.__table__])
+            print(f"✅ Utworzono plik sesji: {path}")
+        
         return new_session.id, "Session created successfully"
         
     except Exception as e:
@@ -177,6 +169,10 @@ def process_uploaded_file(file_path, session_id, sheet_name=None):
     
     engine = create_engine('sqlite:///bailiffs_matching.db', echo=False)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    # Sessions with their own database file write raw names there
+    store = session_database(engine, session_id)
+    if store:
+        SessionLocal = store[1]
     db_session = SessionLocal()
     
     try:
@@ -219,6 +215,10 @@ def process_uploaded_file(file_path, session_id, sheet_name=None):
         db_session.commit()
         print(f"✅ DEBUG file_upload: Zaktualizowano statystyki sesji - rozmiar: {analysis_session.file_size}, rekordy: {analysis_session.total_records}")
         
+        # Build the name automaton and classify the columns once for the whole file
+        name_automaton = get_name_automaton()
+        column_groups = classify_columns(df.columns)
+        
         # Import records
         imported_count = 0
         print("🔍 DEBUG file_upload: Rozpoczynanie importu rekordów...")
@@ -227,128 +227,19 @@ def process_uploaded_file(file_path, session_id, sheet_name=None):
             if row_num <= 5:  # Debug first 5 rows
                 print(f"🔍 DEBUG file_upload: Przetwarzanie wiersza {row_num}: {dict(row)}")
             
-            # Try to find name-like columns
-            name_text = ""
-            city_text = ""
-            email_text = ""
-            phone_text = ""
-            address_text = ""
-            
-            # Look for common column names
-            for col in df.columns:
-                col_lower = str(col).lower()
-                value = str(row[col]) if pd.notna(row[col]) else ""
-                
-                if any(name_keyword in col_lower for name_keyword in ['nazwa', 'name', 'komornik', 'bailiff', 'nazwisko']):
-                    if not name_text and value:
-                        name_text = value
-                elif any(city_keyword in col_lower for city_keyword in ['miasto', 'city', 'miejscowosc']):
-                    if not city_text and value:
-                        city_text = value
-                elif any(email_keyword in col_lower for email_keyword in ['email', 'e-mail', 'mail']):
-                    if not email_text and value:
-                        email_text = value
-                elif any(phone_keyword in col_lower for phone_keyword in ['telefon', 'phone', 'tel']):
-                    if not phone_text and value:
-                        phone_text = value
-                elif any(addr_keyword in col_lower for addr_keyword in ['adres', 'address', 'ulica']):
-                    if not address_text and value:
-                        address_text = value
-            
-            # If no specific name column found, use first non-empty column
-            if not name_text:
-                for col in df.columns:
-                    value = str(row[col]) if pd.notna(row[col]) else ""
-                    if value and value != 'nan':
-                        name_text = value
-                        break
+            # Field values from the detected name, city, contact and court columns
+            texts = row_texts(row, df.columns, column_groups)
+            name_text = texts.pop('name_text')
             
             if name_text and name_text != 'nan':
-                # Normalize name
-                normalized = normalize_name_simple(name_text)
-                
-                # Extract potential first/last names
-                lastname = ""
-                firstname = ""
-                
-                # Look for actual person names in bailiff text
-                if "Komornik" in name_text and "Sądowy" in name_text:
-                    # Extract names using improved pattern matching
-                    import re
-                    
-                    # Skip common institutional words and city indicators
-                    institutional_words = {
-                        'Komornik', 'Sądowy', 'przy', 'Sądzie', 'Rejonowym', 'dla', 'w', 'nr', 
-                        'Kancelaria', 'Komornicza', 'Okręgowym', 'Gospodarczym', 'Pracy',
-                        'Wojewódzkim', 'Apelacyjnym', 'Najwyższym', 'Grójcu', 'Łodzi', 'Krakowie',
-                        'Warszawie', 'Poznaniu', 'Wrocławiu', 'Gdańsku', 'Katowicach'
-                    }
-                    
-                    words = name_text.split()
-                    potential_names = []
-                    
-                    # Look for Polish first names (common patterns)
-                    polish_first_names = {
-                        'Ada', 'Anna', 'Katarzyna', 'Maria', 'Agnieszka', 'Małgorzata', 'Joanna', 'Barbara',
-                        'Jan', 'Piotr', 'Krzysztof', 'Andrzej', 'Tomasz', 'Paweł', 'Michał', 'Adam',
-                        'Dominika', 'Kinga', 'Monika', 'Beata', 'Ewa', 'Magdalena', 'Aleksandra',
-                        'Marcin', 'Jakub', 'Dawid', 'Łukasz', 'Mateusz', 'Kamil', 'Rafał'
-                    }
-                    
-                    i = 0
-                    while i < len(words):
-                        word = words[i].strip('.,')
-                        # Check if this looks like a Polish first name
-                        if word in polish_first_names:
-                            # Collect the name sequence starting from this first name
-                            name_sequence = [word]
-                            j = i + 1
-                            
-                            # Collect following capitalized words that could be surnames
-                            while (j < len(words) and j < i + 4):
-                                next_word = words[j].strip('.,')
-                                if (next_word and 
-                                    next_word[0].isupper() and
-                                    next_word not in institutional_words and
-                                    not next_word.isdigit() and
-                                    len(next_word) > 1):
-                                    name_sequence.append(next_word)
-                                    j += 1
-                                else:
-                                    break
-                            
-                            if len(name_sequence) >= 2:  # At least first + last name
-                                potential_names.append(name_sequence)
-                            i = j
-                        else:
-                            i += 1
-                    
-                    # Take the most likely name sequence (longest one with 2-3 words)
-                    best_name = None
-                    for seq in potential_names:
-                        if 2 <= len(seq) <= 3:  # Typical Polish name length
-                            if not best_name or len(seq) > len(best_name):
-                                best_name = seq
-                    
-                    if best_name:
-                        firstname = best_name[0]
-                        if len(best_name) == 2:
-                            lastname = best_name[1]
-                        else:  # 3 words - assume middle name or hyphenated surname
-                            lastname = " ".join(best_name[1:])
-                    
-                else:
-                    # Simple first/last name extraction for non-bailiff text
-                    name_parts = name_text.split()
-                    if len(name_parts) >= 2:
-                        firstname = name_parts[0]
-                        lastname = name_parts[-1]
+                fields = parse_raw_name(name_text, name_automaton=name_automaton, **texts)
                 
                 # Create RawNames record
                 if imported_count < 3:  # Debug first 3 records
                     print(f"🔍 DEBUG file_upload: Tworzenie RawNames #{imported_count+1} z session_id={session_id}")
-                    print(f"🔍 DEBUG file_upload: name_text='{name_text}', normalized='{normalized}'")
-                    print(f"🔍 DEBUG file_upload: lastname='{lastname}', firstname='{firstname}'")
+                    print(f"🔍 DEBUG file_upload: name_text='{name_text}', normalized='{fields['normalized_text']}'")
+                    print(f"🔍 DEBUG file_upload: lastname='{fields['extracted_lastname']}', firstname='{fields['extracted_firstname']}'")
+                    print(f"🔍 DEBUG file_upload: source_city='{fields['source_city']}', court_key={fields['court_key']}")
                 
                 raw_record = RawNames(
                     session_id=session_id,
@@ -356,15 +247,8 @@ def process_uploaded_file(file_path, session_id, sheet_name=None):
                     source_sheet=sheet_name,
                     source_row=row_num,  # Use row_num instead of index
                     source_column="auto-detected",
-                    raw_text=name_text,
-                    normalized_text=normalized,
-                    extracted_lastname=lastname,
-                    extracted_firstname=firstname,
-                    source_city=city_text if city_text else None,
-                    source_email=email_text if email_text else None,
-                    source_phone=phone_text if phone_text else None,
-                    source_address=address_text if address_text else None,
-                    is_processed=False
+                    is_processed=False,
+                    **fields
                 )
                 
                 db_session.add(raw_record)
@@ -386,6 +270,7 @@ def process_uploaded_file(file_path, session_id, sheet_name=None):
         # Update session stats
         analysis_session.processed_records = imported_count
         analysis_session.status = 'imported'
+        analysis_session.data_version = (analysis_session.data_version or 0) + 1
         db_session.commit()
         print(f"✅ DEBUG file_upload: Zaktualizowano sesję - processed_records: {imported_count}, status: 'imported'")
         
@@ -424,7 +309,9 @@ def get_sessions_list():
     db_session = SessionLocal()
     
     try:
-        sessions = db_session.query(AnalysisSession).order_by(AnalysisSession.created_at.desc()).all()
+        sessions = db_session.query(AnalysisSession).filter(
+            AnalysisSession.status != DELETING_STATUS
+        ).order_by(AnalysisSession.created_at.desc()).all()
         
         sessions_data = []
         for session in sessions:
@@ -452,101 +339,92 @@ def get_sessions_list():
         db_session.close()
 
 
-def delete_session(session_id):
-    """Delete a complete analysis session and all related data."""
+def delete_session(session_id, background=False):
+    """Delete a complete analysis session and all related data.
+
+    With `background` the session is hidden at once and its rows are purged
+    in a background thread (see `session_purge`).
+    """
     engine = create_engine('sqlite:///bailiffs_matching.db', echo=False)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db_session = SessionLocal()
-    
+
     try:
         # First get session info for logging
-        session = db_session.query(AnalysisSession).filter_by(id=session_id).first()
-        if not session:
+        with engine.connect() as connection:
+            session_row = connection.execute(text("SELECT session_name, status FROM analysis_sessions WHERE id = :id"),
+                                             {'id': session_id}).fetchone()
+        if session_row is None:
             return False, f"Sesja o ID {session_id} nie została znaleziona"
-        
-        session_name = session.session_name
+        session_name, status = session_row
+
         print(f"🗑️ Usuwanie sesji: {session_name} (ID: {session_id})")
-        
-        # Delete related data in proper order (to handle foreign key constraints)
-        
-        # 1. Delete name mappings
-        mappings_deleted = db_session.query(NameMappings).filter_by(session_id=session_id).count()
-        db_session.query(NameMappings).filter_by(session_id=session_id).delete()
-        print(f"   ✅ Usunięto {mappings_deleted} mapowań nazw")
-        
-        # 2. Delete match suggestions  
-        suggestions_deleted = db_session.query(MatchSuggestions).filter_by(session_id=session_id).count()
-        db_session.query(MatchSuggestions).filter_by(session_id=session_id).delete()
-        print(f"   ✅ Usunięto {suggestions_deleted} sugestii dopasowań")
-        
-        # 3. Delete raw names
-        raw_names_deleted = db_session.query(RawNames).filter_by(session_id=session_id).count()
-        db_session.query(RawNames).filter_by(session_id=session_id).delete()
-        print(f"   ✅ Usunięto {raw_names_deleted} surowych nazw")
-        
-        # 4. Finally delete the session itself
-        db_session.query(AnalysisSession).filter_by(id=session_id).delete()
+
+        with engine.connect() as connection:
+            store_files = session_store_files(connection, [session_id])
+        # A session with its own file is dropped with the file and an archived session has no rows left -
+        # nothing to purge in the background
+        if background and not store_files and status != ARCHIVED_STATUS:
+            start_session_purge(engine, session_id)
+            return True, f"Sesja '{session_name}' jest usuwana w tle"
+
+        # One transaction, one indexed DELETE per table
+        with engine.begin() as connection:
+            deleted = purge_sessions(connection, [session_id])
+        print(f"   ✅ Usunięto {deleted['name_mappings']} mapowań nazw")
+        print(f"   ✅ Usunięto {deleted['match_suggestions']} sugestii dopasowań")
+        print(f"   ✅ Usunięto {deleted['raw_names']} surowych nazw")
+        for storage_file in store_files:
+            drop_session_store(engine, storage_file)
+            print(f"   ✅ Usunięto plik sesji {storage_file}")
+        # Archived sessions keep their data in Parquet files (session_archive), removed with the catalog row
+        drop_session_archive(engine, session_id)
         print(f"   ✅ Usunięto sesję analizy")
-        
-        db_session.commit()
+        reclaim_free_pages(engine)
         print(f"🎉 Sesja '{session_name}' została całkowicie usunięta")
-        
+
         return True, f"Sesja '{session_name}' została pomyślnie usunięta"
-        
+
     except Exception as e:
-        db_session.rollback()
         error_msg = f"Błąd podczas usuwania sesji: {str(e)}"
         print(f"❌ {error_msg}")
         return False, error_msg
-        
-    finally:
-        db_session.close()
 
 
 def delete_all_sessions():
     """Delete all analysis sessions and related data (complete cleanup)."""
     engine = create_engine('sqlite:///bailiffs_matching.db', echo=False)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db_session = SessionLocal()
-    
+
     try:
-        # Get count of all sessions first
-        total_sessions = db_session.query(AnalysisSession).count()
-        if total_sessions == 0:
-            return True, "Brak sesji do usunięcia"
-            
-        print(f"🗑️ Usuwanie wszystkich {total_sessions} sesji...")
-        
-        # Delete all related data
-        mappings_deleted = db_session.query(NameMappings).count()
-        db_session.query(NameMappings).delete()
-        print(f"   ✅ Usunięto {mappings_deleted} mapowań nazw")
-        
-        suggestions_deleted = db_session.query(MatchSuggestions).count()
-        db_session.query(MatchSuggestions).delete()
-        print(f"   ✅ Usunięto {suggestions_deleted} sugestii dopasowań")
-        
-        raw_names_deleted = db_session.query(RawNames).count()
-        db_session.query(RawNames).delete()
-        print(f"   ✅ Usunięto {raw_names_deleted} surowych nazw")
-        
-        # Delete all sessions
-        db_session.query(AnalysisSession).delete()
+        with engine.begin() as connection:
+            total_sessions = connection.execute(text("SELECT COUNT(*) FROM analysis_sessions")).scalar()
+            if total_sessions == 0:
+                return True, "Brak sesji do usunięcia"
+
+            print(f"🗑️ Usuwanie wszystkich {total_sessions} sesji...")
+            store_files = session_store_files(connection)
+            archived_ids = connection.execute(text("SELECT id FROM analysis_sessions WHERE status = :status"),
+                                              {'status': ARCHIVED_STATUS}).scalars().all()
+            deleted = purge_sessions(connection)
+        print(f"   ✅ Usunięto {deleted['name_mappings']} mapowań nazw")
+        print(f"   ✅ Usunięto {deleted['match_suggestions']} sugestii dopasowań")
+        print(f"   ✅ Usunięto {deleted['raw_names']} surowych nazw")
+        for storage_file in store_files:
+            drop_session_store(engine, storage_file)
+        if store_files:
+            print(f"   ✅ Usunięto {len(store_files)} plików sesji")
+        for archived_id in archived_ids:
+            drop_session_archive(engine, archived_id)
+        if archived_ids:
+            print(f"   ✅ Usunięto {len(archived_ids)} archiwów sesji")
         print(f"   ✅ Usunięto {total_sessions} sesji analizy")
-        
-        db_session.commit()
+        reclaim_free_pages(engine)
         print(f"🎉 Wszystkie sesje zostały całkowicie usunięte")
-        
+
         return True, f"Wszystkie {total_sessions} sesji zostały pomyślnie usunięte"
-        
+
     except Exception as e:
-        db_session.rollback()
         error_msg = f"Błąd podczas usuwania wszystkich sesji: {str(e)}"
         print(f"❌ {error_msg}")
         return False, error_msg
-        
-    finally:
-        db_session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""
+Normalization of contact and bank identifiers for exact matching.
+
+The same bailiff appears with "PL 16 1050 1634 1000 0092 2737 4551",
+"+48 32 226 22 22" or " Jan.Kowalski@Komornik.pl" in one source and with
+compact forms in another. Each identifier is reduced to a canonical key so
+that raw rows can be resolved against the dictionary with a dict lookup.
+"""
+
+import re
+
+# Polish account number (NRB): 26 digits, optionally prefixed with the PL country code
+IBAN_DIGITS = 26
+PHONE_COUNTRY_CODE = '48'
+NATIONAL_PHONE_DIGITS = 9
+
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+
+
+def normalize_iban(value):
+    """Digits of a Polish account number ('' if it does not look like one)."""
+    if not value:
+        return ""
+    digits = re.sub(r'\D', '', str(value))
+    return digits if len(digits) == IBAN_DIGITS else ""
+
+
+def normalize_email(value):
+    """Lowercase address of the first e-mail in value ('' if none)."""
+    if not value:
+        return ""
+    match = EMAIL_PATTERN.search(str(value))
+    return match.group().lower() if match else ""
+
+
+def normalize_phone(value):
+    """E.164-style phone number ('+48322262222'); '' if it has too few digits."""
+    if not value:
+        return ""
+    digits = re.sub(r'\D', '', str(value))
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if len(digits) == NATIONAL_PHONE_DIGITS:
+        digits = PHONE_COUNTRY_CODE + digits
+    elif len(digits) == NATIONAL_PHONE_DIGITS + 1 and digits.startswith('0'):
+        # Old trunk prefix: 0 32 226 22 22
+        digits = PHONE_COUNTRY_CODE + digits[1:]
+    if len(digits) != len(PHONE_COUNTRY_CODE) + NATIONAL_PHONE_DIGITS:
+        return ""
+    return '+' + digits
+
+
+# (identifier kind, normalizer), in order of reliability
+IDENTIFIER_NORMALIZERS = (
+    ('iban', normalize_iban),
+    ('email', normalize_email),
+    ('phone', normalize_phone),
+)
+
+
+def identifier_keys(iban=None, email=None, phone=None):
+    """Yield (kind, key) pairs for the identifiers present."""
+    for (kind, normalize), value in zip(IDENTIFIER_NORMALIZERS, (iban, email, phone)):
+        key = normalize(value)
+        if key:
+            yield kind, key
@@ -0,0 +1,196 @@
+"""
+Institutional phrases in bailiff texts, stripped by one compiled matcher.
+
+"Komornik Sądowy przy Sądzie Rejonowym w Grójcu Ada Czapla-Lisowska
+Kancelaria Komornicza nr XII w Warce" -> "Ada Czapla-Lisowska", with the court
+city (Grójcu), office number (12) and office city (Warce) returned as
+by-products. All phrase vocabularies live in this module; the normalizers and
+the name extractor import them from here instead of keeping their own lists.
+"""
+
+import re
+from typing import NamedTuple, Optional, Tuple
+
+from city_gazetteer import fold_city
+
+# Personal titles and professions, longest first
+TITLES = [
+    'komornik sądowy', 'zastępca komornika', 'asesor komorniczy', 'komornik',
+    'radca prawny', 'adwokat', 'prof.', 'prof', 'dr hab.', 'dr hab', 'dr', 'mgr', 'inż.', 'inż',
+]
+
+# Court types appearing after "przy Sądzie ..."
+COURT_TYPES = ['rejonowym', 'okręgowym', 'apelacyjnym', 'gospodarczym', 'wojewódzkim', 'najwyższym',
+               'rejonowy', 'okręgowy', 'apelacyjny', 'gospodarczy', 'wojewódzki', 'najwyższy']
+
+# Court noun: "przy Sądzie Rejonowym" in bailiff titles, "Sąd Rejonowy" in the dictionary
+COURT_NOUNS = ['sądzie', 'sąd']
+
+# Office headers before the office number
+OFFICE_HEADERS = ['kancelaria komornicza', 'rewir komorniczy']
+
+# Words that are never part of a person's name
+STOP_WORDS = {
+    'sąd', 'sądzie', 'sądowy', 'rejonowy', 'okręgowy', 'kancelaria', 'komornicza', 'pracy',
+    'licencjat', 'magister', 'doktor', 'profesor',
+    'w', 'we', 'z', 'ze', 'i', 'oraz', 'przy', 'dla', 'do', 'od', 'na', 'po',
+    'ul', 'ulica', 'al', 'aleja', 'pl', 'plac', 'os', 'osiedle', 'nr', 'numer',
+}
+
+INSTITUTIONAL_WORDS = (
+    STOP_WORDS
+    | {word.strip('.') for phrase in TITLES + OFFICE_HEADERS for word in phrase.split()}
+    | set(COURT_TYPES)
+)
+
+UPPER = 'A-ZĄĆĘŁŃÓŚŹŻ'
+LOWER = 'a-ząćęłńóśźż'
+WORD = rf"[{UPPER}][{LOWER}]+"
+# Capitalized city name. Two-word names only when one word is adjectival
+# (Nowym Targu, Zielonej Górze, Mińsku Mazowieckim) so a following first name is
+# not swallowed ("w Grójcu Ada ..."); hyphenated names (Bielsku-Białej) as one.
+CITY = (rf"(?:{WORD}(?:ym|im|ej)\s+{WORD}"
+        rf"|{WORD}-{WORD}"
+        rf"|{WORD}(?:\s+[{UPPER}][{LOWER}]+(?:skim|ckim|skiej|ckiej))?)")
+# Court district after "dla": a city name, the city with a hyphenated district, also spaced
+# (Warszawy-Woli, Wrocławia - Krzyków), or the city and a district word (Warszawy Pragi-Północ,
+# Warszawy Woli) - the latter only when the court city follows, so a first name is not swallowed.
+DISTRICT = (rf"(?:{WORD}\s+-\s+{WORD}"
+            rf"|{WORD}\s+(?:{WORD}\s*-\s*{WORD}|{WORD})(?=\s+(?i:w|we)\s+{WORD})"
+            rf"|{CITY})")
+ROMAN = r"[IVXLCDM]+"
+
+
+DIACRITIC_CLASSES = {'ą': '[aą]', 'ć': '[cć]', 'ę': '[eę]', 'ł': '[lł]', 'ń': '[nń]',
+                     'ó': '[oó]', 'ś': '[sś]', 'ź': '[zźż]', 'ż': '[zżź]'}
+
+
+def _words(phrase):
+    """Regex for a phrase with flexible whitespace and optional Polish diacritics."""
+    def word_pattern(word):
+        return "".join(DIACRITIC_CLASSES.get(char, re.escape(char)) for char in word)
+    return r"\s+".join(word_pattern(word) for word in phrase.split())
+
+
+def _alternatives(phrases):
+    return "|".join(_words(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+PHRASE_PATTERN = re.compile(
+    # [przy] Sądzie Rejonowym / Sąd Rejonowy [dla Warszawy-Mokotowa] w Grójcu
+    rf"(?P<court>(?i:(?:przy\s+)?(?:{_alternatives(COURT_NOUNS)})\s+(?:{_alternatives(COURT_TYPES)}))"
+    rf"(?:\s+(?i:dla)\s+(?P<court_district>{DISTRICT}))?"
+    rf"(?:\s+(?i:w|we)\s+(?P<court_city>{CITY}))?)"
+    # Kancelaria Komornicza [nr XII] [w Warce]
+    rf"|(?P<office>(?i:{_alternatives(OFFICE_HEADERS)})(?:\s+(?i:nr)\.?\s*(?P<office_number>(?i:{ROMAN})|\d+)\b)?"
+    rf"(?:\s+(?i:w|we)\s+(?P<office_city>{CITY}))?)"
+    # Komornik Sądowy, mgr, dr hab., ...
+    rf"|(?P<title>(?<![\w])(?i:{_alternatives(TITLES)})(?![\w]))"
+    # nr XII
+    rf"|(?P<number>\b(?i:nr)\.?\s*(?:(?i:{ROMAN})|\d+)\b)"
+    # w Mikołowie
+    rf"|(?P<locative>\b(?i:w|we)\s+(?P<city>{CITY}))"
+)
+
+ROMAN_VALUES = {'I': 1, 'V': 5, 'X': 10, 'L': 50, 'C': 100, 'D': 500, 'M': 1000}
+
+
+def roman_to_int(value):
+    """Convert a Roman (or Arabic) office number to int; None if not a number."""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    total = 0
+    for current, following in zip(value, value[1:] + ' '):
+        number = ROMAN_VALUES.get(current.upper())
+        if number is None:
+            return None
+        total += -number if ROMAN_VALUES.get(following.upper(), 0) > number else number
+    return total
+
+
+class PhraseParse(NamedTuple):
+    """Text with institutional phrases removed plus the fields found in them."""
+    text: str
+    court_city: Optional[str] = None
+    court_district: Optional[str] = None
+    office_number: Optional[int] = None
+    office_city: Optional[str] = None
+    locative_cities: Tuple[str, ...] = ()
+    spans: Tuple[Tuple[int, int], ...] = ()
+
+    @property
+    def court_key(self):
+        """Blocking key of the court ("krakowa-krowodrzy/krakowie"); None without a court phrase.
+
+        Court names keep their legal inflection on both sides ("Sąd Rejonowy w
+        Mikołowie" in the dictionary, "przy Sądzie Rejonowym w Mikołowie" in raw
+        texts), so the folded district and city compare directly.
+        """
+        if not self.court_city and not self.court_district:
+            return None
+        # "Warszawy Pragi-Północ" and "Warszawy-Pragi-Północ" name the same district
+        district = fold_city(self.court_district).replace(' ', '-')
+        return f"{district}/{fold_city(self.court_city)}"
+
+
+def _case_normalized(text):
+    """Copy of text in which city and name words are capitalized, as `CITY` expects.
+
+    Texts written in one case ("KOMORNIK SĄDOWY ... W GRÓJCU", "... w grójcu")
+    are title-cased; in mixed-case texts only all-caps words are. The copy
+    has the same length, so match spans apply to the original text.
+    """
+    if text.isupper() or text.islower():
+        normalized = text.title()
+    else:
+        normalized = re.sub(r"\w{2,}", lambda match: match.group().capitalize() if match.group().isupper()
+                            else match.group(), text)
+    return normalized if len(normalized) == len(text) else text
+
+
+def parse_institutional_text(text):
+    """Strip institutional phrases from text in a single pass of the compiled matcher."""
+    if not text:
+        return PhraseParse("")
+
+    text = str(text)
+    fields = {'court_city': None, 'court_district': None, 'office_number': None, 'office_city': None}
+    locative_cities = []
+    spans = []
+    pieces = []
+    last_end = 0
+
+    def group(match, name):
+        # Captured text from the original, not the case-normalized copy
+        return text[match.start(name):match.end(name)] if match.group(name) else None
+
+    for match in PHRASE_PATTERN.finditer(_case_normalized(text)):
+        pieces.append(text[last_end:match.start()])
+        last_end = match.end()
+        spans.append(match.span())
+
+        if match.group('court'):
+            fields['court_city'] = fields['court_city'] or group(match, 'court_city')
+            fields['court_district'] = fields['court_district'] or group(match, 'court_district')
+        elif match.group('office'):
+            fields['office_number'] = roman_to_int(match.group('office_number'))
+            fields['office_city'] = group(match, 'office_city')
+        elif match.group('locative'):
+            locative_cities.append(group(match, 'city'))
+
+    pieces.append(text[last_end:])
+    residual = re.sub(r'\s+', ' ', ' '.join(pieces)).strip()
+
+    return PhraseParse(residual, locative_cities=tuple(locative_cities), spans=tuple(spans), **fields)
+
+
+def court_key(text):
+    """Court blocking key of a court name or bailiff title; None if it names no court."""
+    return parse_institutional_text(text).court_key
+
+
+def strip_institutional_phrases(text):
+    """Return text without titles, court/office phrases and locative city names."""
+    return parse_institutional_text(text).text
@@ -0,0 +1,139 @@
+"""
+Raw feature vectors stored with match suggestions.
+
+Every suggestion keeps the value of each fullname scorer for each search
+variant, the raw name-part scores, key matches and city features as a packed
+float32 vector (`match_suggestions.features`). Combined scores are derived
+from these features only, so a session can be reranked with another scoring
+profile by one vectorized pass over the stored matrix - without re-running
+candidate generation or fuzzy search.
+"""
+
+import numpy as np
+
+# Search variants of a raw name, in the order `match_single_name` builds them
+SEARCH_VARIANTS = ('text', 'last_first', 'first_last')
+FULLNAME_ALGORITHMS = ('ratio', 'token_sort', 'partial')
+
+FEATURE_NAMES = (
+    tuple(f"fullname_{variant}_{algorithm}" for variant in SEARCH_VARIANTS for algorithm in FULLNAME_ALGORITHMS)
+    + ('lastname_ratio', 'lastname_partial', 'firstname_ratio', 'firstname_partial',
+       'phonetic_match', 'stem_match',
+       'city_score', 'city_id_match',
+       'has_name_parts', 'identifier_hit', 'identifier_unique')
+)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+FULLNAME_FEATURES = len(SEARCH_VARIANTS) * len(FULLNAME_ALGORITHMS)
+
+# Lastname score floor when surnames differ only by a Polish spelling variant
+PHONETIC_LASTNAME_SCORE = 95.0
+# Lastname score floor when surnames are gender forms of one stem (Kowalski/Kowalska)
+SURNAME_STEM_SCORE = 97.0
+# Combined score floor for the single bailiff sharing an IBAN, e-mail or phone with the raw row
+IDENTIFIER_MATCH_SCORE = 99.0
+# Lastname (or fullname) score needed for an identifier hit to count: recycled office phones,
+# shared firm e-mails and mistyped IBANs point at a bailiff with another name
+IDENTIFIER_NAME_SCORE = 80.0
+
+# city_id_match values
+CITY_SAME, CITY_DIFFERENT, CITY_UNRESOLVED = 1.0, 0.0, -1.0
+
+
+def empty_fullname_scores():
+    """Zeroed per-variant, per-algorithm fullname scores of one candidate."""
+    return [0.0] * FULLNAME_FEATURES
+
+
+def fullname_slot(variant_index, algorithm_index):
+    """Position of one variant/algorithm score in the fullname block."""
+    return variant_index * len(FULLNAME_ALGORITHMS) + algorithm_index
+
+
+def pack_features(values):
+    """Pack a feature vector into float32 bytes for the `features` column."""
+    return np.asarray(values, dtype=np.float32).tobytes()
+
+
+def unpack_features(blobs):
+    """Stack packed feature vectors into an (n, len(FEATURE_NAMES)) float matrix."""
+    if not blobs:
+        return np.zeros((0, len(FEATURE_NAMES)), dtype=np.float64)
+    return np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(blobs), len(FEATURE_NAMES)).astype(np.float64)
+
+
+def component_scores(features):
+    """Component scores of one candidate from its feature vector.
+
+    Returns (fullname, lastname, firstname, city, algorithm, has_name_parts),
+    where `algorithm` is the best fullname scorer ('ratio', 'token_sort' or
+    'partial').
+    """
+    best = [max(features[fullname_slot(v, a)] for v in range(len(SEARCH_VARIANTS)))
+            for a in range(len(FULLNAME_ALGORITHMS))]
+    best_ratio, best_token_sort, best_partial = best
+
+    if best_token_sort > best_ratio:
+        algorithm = 'token_sort'
+    elif best_partial > best_ratio:
+        algorithm = 'partial'
+    else:
+        algorithm = 'ratio'
+
+    lastname = max(features[FEATURE_INDEX['lastname_ratio']], features[FEATURE_INDEX['lastname_partial']])
+    if features[FEATURE_INDEX['phonetic_match']]:
+        lastname = max(lastname, PHONETIC_LASTNAME_SCORE)
+    if features[FEATURE_INDEX['stem_match']]:
+        lastname = max(lastname, SURNAME_STEM_SCORE)
+    firstname = max(features[FEATURE_INDEX['firstname_ratio']], features[FEATURE_INDEX['firstname_partial']])
+
+    return (max(best), lastname, firstname, features[FEATURE_INDEX['city_score']], algorithm,
+            bool(features[FEATURE_INDEX['has_name_parts']]))
+
+
+def identifier_name_agrees(lastname, fullname):
+    """Whether the name confirms an identifier hit; works on scores and on score arrays."""
+    return np.maximum(lastname, fullname) >= IDENTIFIER_NAME_SCORE
+
+
+def component_arrays(matrix):
+    """Vectorized `component_scores` over a feature matrix.
+
+    Returns a dict of arrays: fullname, lastname, firstname, city,
+    algorithm (index into FULLNAME_ALGORITHMS), has_name_parts,
+    identifier_unique.
+    """
+    fullname_block = matrix[:, :FULLNAME_FEATURES].reshape(-1, len(SEARCH_VARIANTS), len(FULLNAME_ALGORITHMS))
+    best = fullname_block.max(axis=1)
+    ratio, token_sort, partial = best[:, 0], best[:, 1], best[:, 2]
+    algorithm = np.where(token_sort > ratio, 1, np.where(partial > ratio, 2, 0))
+
+    def column(name):
+        return matrix[:, FEATURE_INDEX[name]]
+
+    lastname = np.maximum(column('lastname_ratio'), column('lastname_partial'))
+    lastname = np.where(column('phonetic_match') > 0, np.maximum(lastname, PHONETIC_LASTNAME_SCORE), lastname)
+    lastname = np.where(column('stem_match') > 0, np.maximum(lastname, SURNAME_STEM_SCORE), lastname)
+
+    return {
+        'fullname': best.max(axis=1),
+        'lastname': lastname,
+        'firstname': np.maximum(column('firstname_ratio'), column('firstname_partial')),
+        'city': column('city_score'),
+        'algorithm': algorithm,
+        'has_name_parts': column('has_name_parts') > 0,
+        'identifier_unique': column('identifier_unique') > 0,
+    }
+
+
+def rerank(profile, matrix, city_bonus=True):
+    """Combined scores of every row of a feature matrix under `profile`."""
+    components = component_arrays(matrix)
+    combined = profile.combine_arrays(components['fullname'], components['lastname'], components['firstname'],
+                                      components['city'], components['algorithm'], city_bonus,
+                                      components['has_name_parts'])
+    return np.where(identifier_floor(components), np.maximum(combined, IDENTIFIER_MATCH_SCORE), combined)
+
+
+def identifier_floor(components):
+    """Rows of `component_arrays` raised to IDENTIFIER_MATCH_SCORE: unique identifier hits with an agreeing name."""
+    return components['identifier_unique'] & identifier_name_agrees(components['lastname'], components['fullname'])
@@ -0,0 +1,229 @@
+"""
+Lightweight record types and in-memory index for the matching hot loop.
+
+The matcher works on these plain tuples instead of SQLAlchemy ORM instances;
+ORM objects are only created when suggestions are written back to the database.
+"""
+
+from typing import NamedTuple, Optional
+
+from sqlalchemy import column, select, table, text
+
+from city_gazetteer import CityGazetteer, postal_code
+from identifiers import identifier_keys
+from institutional_phrases import court_key
+from polish_phonetics import phonetic_key
+from surname_folding import surname_stem
+
+# "43-190" -> "43-1": the postal district, a handful of bailiffs at most
+POSTAL_PREFIX_LENGTH = 4
+
+
+class BailiffRecord(NamedTuple):
+    """Snapshot of a single `bailiffs_dict` row used for matching."""
+    id: int
+    original_nazwisko: Optional[str]
+    original_imie: Optional[str]
+    original_miasto: Optional[str]
+    original_sad: Optional[str]
+    kod_pocztowy: Optional[str]
+    telefon: Optional[str]
+    email: Optional[str]
+    numer_konta: Optional[str]
+    normalized_lastname: Optional[str]
+    normalized_firstname: Optional[str]
+    normalized_fullname: Optional[str]
+    normalized_city: Optional[str]
+    phonetic_lastname: Optional[str]
+    surname_stem: Optional[str]
+    court_key: Optional[str]
+
+
+class RawNameRecord(NamedTuple):
+    """Snapshot of a single `raw_names` row used for matching."""
+    id: int
+    session_id: Optional[int]
+    raw_text: str
+    normalized_text: Optional[str]
+    extracted_lastname: Optional[str]
+    extracted_firstname: Optional[str]
+    source_city: Optional[str]
+    source_address: Optional[str]
+    source_email: Optional[str]
+    source_phone: Optional[str]
+    source_iban: Optional[str]
+    source_postal_code: Optional[str]
+    phonetic_lastname: Optional[str]
+    surname_stem: Optional[str]
+    court_key: Optional[str]
+
+
+def with_derived_keys(bailiff):
+    """Bailiff record with missing surname and court keys computed (rows imported without them).
+
+    `ensure_schema` backfills the keys only when it adds their columns, and
+    bulk importers insert bailiffs without them.
+    """
+    if bailiff.phonetic_lastname and bailiff.surname_stem and (bailiff.court_key or not bailiff.original_sad):
+        return bailiff
+    return bailiff._replace(
+        phonetic_lastname=bailiff.phonetic_lastname or phonetic_key(bailiff.normalized_lastname) or None,
+        surname_stem=bailiff.surname_stem or surname_stem(bailiff.normalized_lastname) or None,
+        court_key=bailiff.court_key or (court_key(bailiff.original_sad) if bailiff.original_sad else None),
+    )
+
+
+bailiffs_table = table('bailiffs_dict', *[column(name) for name in BailiffRecord._fields])
+raw_names_table = table('raw_names', *[column(name) for name in RawNameRecord._fields], column('is_processed'))
+
+
+def load_bailiff_records(connection, canonical_only=True):
+    """Load the bailiff dictionary with a single Core SELECT.
+
+    Records merged into another one by entity resolution (`canonical_id`
+    set) are skipped unless `canonical_only` is False.
+    """
+    query = select(*bailiffs_table.c)
+    # Column names from an empty result: the table may live in an attached database
+    if canonical_only and 'canonical_id' in connection.execute(text("SELECT * FROM bailiffs_dict LIMIT 0")).keys():
+        query = query.where(column('canonical_id').is_(None))
+    result = connection.execute(query.order_by(bailiffs_table.c.id))
+    return [BailiffRecord(*row) for row in result]
+
+
+def load_raw_name_records(connection, session_id=None, only_unprocessed=True):
+    """Load raw names (optionally for one session) with a single Core SELECT."""
+    query = select(*[raw_names_table.c[name] for name in RawNameRecord._fields])
+    if session_id is not None:
+        query = query.where(raw_names_table.c.session_id == session_id)
+    if only_unprocessed:
+        query = query.where(raw_names_table.c.is_processed == False)  # noqa: E712
+    result = connection.execute(query.order_by(raw_names_table.c.id))
+    return [RawNameRecord(*row) for row in result]
+
+
+class BailiffIndex:
+    """Precomputed search texts and lowercase name parts for all bailiffs.
+
+    Built once per matching run and shared by every raw name, so the per-name
+    cost is only the fuzzy search itself.
+    """
+
+    __slots__ = ('bailiffs', 'texts', 'text_owner', 'variant_texts', 'lastnames', 'firstnames', 'cities',
+                 'by_phonetic_lastname', 'by_surname_stem', 'gazetteer', 'city_ids', 'by_city_id',
+                 'by_court_key', 'by_postal_prefix', 'by_identifier')
+
+    def __init__(self, bailiffs):
+        self.bailiffs = [with_derived_keys(bailiff) for bailiff in bailiffs]
+        # Unique search texts and, in parallel, the position of the owning bailiff
+        self.texts = []
+        self.text_owner = []
+        # Position -> all search texts of that bailiff (for scoring direct lookups)
+        self.variant_texts = []
+        self.lastnames = []
+        self.firstnames = []
+        self.cities = []
+        # Phonetic surname key -> positions, for O(1) candidate lookup
+        self.by_phonetic_lastname = {}
+        # Gender-folded surname stem -> positions (Kowalska and Kowalski collide)
+        self.by_surname_stem = {}
+        # Canonical city id per position (None if the city is unknown) and the reverse map
+        self.gazetteer = CityGazetteer.from_bailiffs(self.bailiffs)
+        self.city_ids = []
+        self.by_city_id = {}
+        # Exact-match blocking keys: court (district/city) and postal code prefix ("43-1")
+        self.by_court_key = {}
+        self.by_postal_prefix = {}
+        # (kind, normalized IBAN/email/phone) -> positions, for deterministic matches
+        self.by_identifier = {}
+
+        seen = set()
+        for position, bailiff in enumerate(self.bailiffs):
+            lastname = bailiff.normalized_lastname.lower() if bailiff.normalized_lastname else ''
+            firstname = bailiff.normalized_firstname.lower() if bailiff.normalized_firstname else ''
+            self.lastnames.append(lastname)
+            self.firstnames.append(firstname)
+            self.cities.append(bailiff.original_miasto.lower().strip() if bailiff.original_miasto else '')
+
+            city_id = self.gazetteer.resolve(bailiff.original_miasto, bailiff.kod_pocztowy)
+            self.city_ids.append(city_id)
+            if city_id is not None:
+                self.by_city_id.setdefault(city_id, []).append(position)
+
+            variants = [variant for variant in self._variants(bailiff) if variant]
+            self.variant_texts.append(variants)
+            for variant in variants:
+                if variant not in seen:
+                    seen.add(variant)
+                    self.texts.append(variant)
+                    self.text_owner.append(position)
+
+            if bailiff.phonetic_lastname:
+                self.by_phonetic_lastname.setdefault(bailiff.phonetic_lastname, []).append(position)
+            if bailiff.surname_stem:
+                self.by_surname_stem.setdefault(bailiff.surname_stem, []).append(position)
+            if bailiff.court_key:
+                self.by_court_key.setdefault(bailiff.court_key, []).append(position)
+            code = postal_code(bailiff.kod_pocztowy)
+            if code:
+                self.by_postal_prefix.setdefault(code[:POSTAL_PREFIX_LENGTH], []).append(position)
+            for identifier in identifier_keys(bailiff.numer_konta, bailiff.email, bailiff.telefon):
+                self.by_identifier.setdefault(identifier, []).append(position)
+
+    @staticmethod
+    def _variants(bailiff):
+        """Yield every text representation of a bailiff used for fuzzy search."""
+        if bailiff.normalized_fullname:
+            yield bailiff.normalized_fullname
+
+        if bailiff.normalized_lastname and bailiff.normalized_firstname:
+            yield f"{bailiff.normalized_lastname} {bailiff.normalized_firstname}"
+            yield f"{bailiff.normalized_firstname} {bailiff.normalized_lastname}"
+        elif bailiff.normalized_lastname:
+            yield bailiff.normalized_lastname
+
+        if bailiff.original_nazwisko and bailiff.original_imie:
+            yield f"{bailiff.original_nazwisko.lower()} {bailiff.original_imie.lower()}"
+
+    def phonetic_candidates(self, key):
+        """Positions of bailiffs sharing the phonetic surname key."""
+        return self.by_phonetic_lastname.get(key, []) if key else []
+
+    def stem_candidates(self, stem):
+        """Positions of bailiffs whose surname folds to the same stem."""
+        return self.by_surname_stem.get(stem, []) if stem else []
+
+    def city_candidates(self, city_id):
+        """Positions of bailiffs in the same canonical city."""
+        return self.by_city_id.get(city_id, []) if city_id is not None else []
+
+    def identifier_candidates(self, raw_name):
+        """Positions of bailiffs sharing an IBAN, e-mail or phone with the raw name.
+
+        Returns {position: [identifier kinds]}; empty when nothing matches.
+        """
+        hits = {}
+        for identifier in identifier_keys(raw_name.source_iban, raw_name.source_email, raw_name.source_phone):
+            for position in self.by_identifier.get(identifier, ()):
+                hits.setdefault(position, []).append(identifier[0])
+        return hits
+
+    def block_candidates(self, raw_name):
+        """Positions of bailiffs sharing the raw name's court, else its postal code prefix.
+
+        Returns an empty list when the raw name carries neither key or no
+        bailiff shares it; the caller then searches the whole dictionary.
+        """
+        if raw_name.court_key and raw_name.court_key in self.by_court_key:
+            return self.by_court_key[raw_name.court_key]
+        code = postal_code(raw_name.source_postal_code)
+        if code:
+            return self.by_postal_prefix.get(code[:POSTAL_PREFIX_LENGTH], [])
+        return []
+
+    def resolve_city(self, raw_name):
+        """Canonical city id of a raw name, from its city or address (postal code)."""
+        return self.gazetteer.resolve(raw_name.source_city, raw_name.source_address)
+
+    def __len__(self):
+        return len(self.bailiffs)
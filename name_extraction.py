@@ -0,0 +1,226 @@
+"""
+Single-pass extraction of first names and surnames from free text.
+
+An Aho-Corasick automaton over word tokens is built once from the full PESEL
+first-name and surname lexicons. Each text is tokenized and scanned in one
+linear pass; every lexicon entry, including multi-word ("Robert Jan") and
+hyphenated ("Czapla-Lisowska") ones, is reported as a span. The cost per text
+depends on its length only, not on the size of the lexicons.
+"""
+
+import os
+import pickle
+import re
+from collections import deque
+from functools import lru_cache
+
+from institutional_phrases import INSTITUTIONAL_WORDS
+
+FIRST_NAMES_FILE = 'polish_first_names_full.pkl'
+SURNAMES_FILE = 'polish_surnames_full.pkl'
+
+FIRST_NAME = 1
+SURNAME = 2
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|-")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens and hyphens, with character spans."""
+    return [(match.group().lower(), match.start(), match.end()) for match in TOKEN_PATTERN.finditer(text)]
+
+
+def _entry_tokens(entry):
+    """Tokens of a lexicon entry; empty for entries without a word (a bare "-" would match every hyphen)."""
+    tokens = [token for token, _, _ in tokenize(entry)]
+    return tokens if any(token != '-' for token in tokens) else []
+
+
+class NameAutomaton:
+    """Aho-Corasick automaton whose alphabet is word tokens.
+
+    States are integers; state 0 is the root. Transitions out of the root live
+    in a plain dict (that is where almost all single-word entries end), deeper
+    transitions in a dict keyed by (state, token).
+    """
+
+    def __init__(self, entries):
+        self._root = {}
+        self._goto = {}
+        self._fail = [0]
+        self._depth = [0]
+        self._kind = [0]
+        # Nearest state on the failure chain that ends an entry (dictionary suffix link)
+        self._output_link = [0]
+
+        for entry, kind in entries:
+            tokens = _entry_tokens(entry)
+            if tokens:
+                state = self._insert(tokens)
+                self._kind[state] |= kind
+
+        self._build_failure_links()
+
+    def _new_state(self, depth):
+        self._fail.append(0)
+        self._depth.append(depth)
+        self._kind.append(0)
+        self._output_link.append(0)
+        return len(self._fail) - 1
+
+    def _next(self, state, token):
+        if state == 0:
+            return self._root.get(token)
+        return self._goto.get((state, token))
+
+    def _insert(self, tokens):
+        state = 0
+        for depth, token in enumerate(tokens, start=1):
+            next_state = self._next(state, token)
+            if next_state is None:
+                next_state = self._new_state(depth)
+                if state == 0:
+                    self._root[token] = next_state
+                else:
+                    self._goto[(state, token)] = next_state
+            state = next_state
+        return state
+
+    def _build_failure_links(self):
+        children = {}
+        for (parent, token), child in self._goto.items():
+            children.setdefault(parent, []).append((token, child))
+
+        queue = deque(self._root.values())
+        while queue:
+            state = queue.popleft()
+            for token, child in children.get(state, ()):
+                fallback = self._fail[state]
+                while fallback and self._next(fallback, token) is None:
+                    fallback = self._fail[fallback]
+                target = self._next(fallback, token)
+                self._fail[child] = target if target is not None and target != child else 0
+                failed = self._fail[child]
+                self._output_link[child] = failed if self._kind[failed] else self._output_link[failed]
+                queue.append(child)
+
+    def find_all(self, tokens):
+        """Yield (start, end, kind) token spans of every lexicon entry in `tokens`."""
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and self._next(state, token) is None:
+                state = self._fail[state]
+            state = self._next(state, token) or 0
+
+            match = state if self._kind[state] else self._output_link[state]
+            while match:
+                yield position + 1 - self._depth[match], position + 1, self._kind[match]
+                match = self._output_link[match]
+
+    def __len__(self):
+        return len(self._fail) - 1
+
+
+def _load_name_set(path):
+    if not os.path.exists(path):
+        print(f"⚠️ Brak pliku {path} - leksykon nie zostanie użyty")
+        return set()
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+@lru_cache(maxsize=1)
+def get_name_automaton():
+    """Build the first-name/surname automaton once per process."""
+    first_names = _load_name_set(FIRST_NAMES_FILE)
+    surnames = _load_name_set(SURNAMES_FILE)
+    entries = [(name, FIRST_NAME) for name in first_names]
+    entries.extend((name, SURNAME) for name in surnames)
+    automaton = NameAutomaton(entries)
+    print(f"✅ Zbudowano automat imion i nazwisk: {len(first_names)} imion, {len(surnames)} nazwisk")
+    return automaton
+
+
+def find_name_spans(text, automaton=None):
+    """Return non-overlapping (start, end, kind) token spans, leftmost-longest first."""
+    automaton = automaton or get_name_automaton()
+    tokens = tokenize(text)
+    words = [token for token, _, _ in tokens]
+
+    best = {}
+    for start, end, kind in automaton.find_all(words):
+        if any(word in INSTITUTIONAL_WORDS for word in words[start:end]):
+            continue
+        current = best.get(start)
+        if current is None or end > current[1]:
+            best[start] = (start, end, kind)
+
+    spans = []
+    covered = 0
+    for start in sorted(best):
+        if start >= covered:
+            spans.append(best[start])
+            covered = best[start][1]
+    return tokens, spans
+
+
+def extract_names(text, automaton=None):
+    """Extract (first_name, last_name) from text; empty strings when nothing is found."""
+    if not text:
+        return "", ""
+
+    text = str(text)
+    tokens, spans = find_name_spans(text, automaton)
+
+    def span_text(span):
+        return text[tokens[span[0]][1]:tokens[span[1] - 1][2]]
+
+    # Look for first name(s) immediately followed by surname(s): "Łukasz Piotr Zakłos"
+    for i, span in enumerate(spans):
+        if not span[2] & FIRST_NAME:
+            continue
+
+        first_names = [span]
+        j = i + 1
+        while (j + 1 < len(spans) and len(first_names) < 2 and spans[j][2] & FIRST_NAME
+               and spans[j][0] == spans[j - 1][1] and spans[j + 1][0] == spans[j][1]
+               and spans[j + 1][2] & SURNAME):
+            first_names.append(spans[j])
+            j += 1
+
+        surnames = []
+        while j < len(spans) and len(surnames) < 2 and spans[j][2] & SURNAME and spans[j][0] == spans[j - 1][1]:
+            surnames.append(spans[j])
+            j += 1
+
+        if surnames:
+            return " ".join(map(span_text, first_names)), " ".join(map(span_text, surnames))
+
+    # Surname missing from the lexicon: take the capitalized word (and its hyphenated parts) after the first name(s)
+    def capitalized(position):
+        if position >= len(tokens):
+            return False
+        token, start, _ = tokens[position]
+        return token != '-' and token not in INSTITUTIONAL_WORDS and text[start].isupper()
+
+    for i, span in enumerate(spans):
+        if not span[2] & FIRST_NAME:
+            continue
+        first_names = [span]
+        # Second first name: "Ewa Tamara Szuber-Bednarz"
+        if (i + 1 < len(spans) and spans[i + 1][2] & FIRST_NAME and spans[i + 1][0] == span[1]
+                and capitalized(spans[i + 1][1])):
+            first_names.append(spans[i + 1])
+        position = first_names[-1][1]
+        if not capitalized(position):
+            continue
+        end = position + 1
+        # Double-barrelled surname, also written with spaces around the hyphen ("Struk - Zielińska")
+        if end + 1 < len(tokens) and tokens[end][0] == '-' and capitalized(end + 1):
+            end += 2
+        return " ".join(map(span_text, first_names)), text[tokens[position][1]:tokens[end - 1][2]]
+
+    # No adjacent pair: take the first unambiguous first name and surname
+    first_name = next((span_text(s) for s in spans if s[2] == FIRST_NAME), "")
+    last_name = next((span_text(s) for s in spans if s[2] == SURNAME), "")
+    return first_name, last_name
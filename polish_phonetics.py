@@ -0,0 +1,68 @@
+"""
+Phonetic keys for Polish names.
+
+Collapses common Polish spelling variants (rz/ż, ch/h, ó/u, sz/ś, i/y,
+final devoicing, double letters, -ski/-ska endings) into a single ASCII key,
+so that a spelling variant hits the same key while a real typo usually does not.
+"""
+
+import re
+
+# Single characters folded before digraph rules (diacritics and look-alikes)
+CHAR_MAP = str.maketrans({
+    'ą': 'a', 'ę': 'e', 'ó': 'u', 'ł': 'l', 'ń': 'n',
+    'ś': 's', 'ć': 'c', 'ź': 'z', 'ż': 'z',
+    'y': 'i', 'v': 'w', 'q': 'k',
+})
+
+# Applied in order, longest sequences first
+DIGRAPH_RULES = [
+    ('dzi', 'dz'),
+    ('rz', 'z'),
+    ('ch', 'h'),
+    ('sz', 's'),
+    ('cz', 'c'),
+    ('si', 's'),
+    ('ci', 'c'),
+    ('zi', 'z'),
+    ('ni', 'n'),
+    ('x', 'ks'),
+]
+
+# Gender endings of adjectival surnames folded to a common stem
+SURNAME_ENDINGS = [
+    (re.compile(r'(sk|ck|dzk)(i|a|iego|iej)$'), r'\1'),
+]
+
+# Word-final voiced consonants are pronounced voiceless
+FINAL_DEVOICING = {'b': 'p', 'd': 't', 'g': 'k', 'w': 'f', 'z': 's'}
+
+
+def phonetic_token_key(token):
+    """Return the phonetic key of a single word."""
+    if not token:
+        return ""
+
+    key = token.lower().translate(CHAR_MAP)
+    key = re.sub(r'[^a-z]', '', key)
+
+    for pattern, replacement in SURNAME_ENDINGS:
+        key = pattern.sub(replacement, key)
+
+    for source, target in DIGRAPH_RULES:
+        key = key.replace(source, target)
+
+    if key and key[-1] in FINAL_DEVOICING:
+        key = key[:-1] + FINAL_DEVOICING[key[-1]]
+
+    # Collapse doubled letters (Kowallski -> kowalski)
+    return re.sub(r'(.)\1+', r'\1', key)
+
+
+def phonetic_key(text):
+    """Return the phonetic key of a (possibly multi-word or hyphenated) name."""
+    if not text:
+        return ""
+
+    tokens = re.split(r'[\s\-]+', str(text).strip())
+    return " ".join(key for key in (phonetic_token_key(token) for token in tokens) if key)
@@ -0,0 +1,143 @@
+"""
+Normalization and field extraction of a single raw name.
+
+Shared by the file import (which persists the result as `RawNames` rows) and
+by the matchers that work without the database (HTTP service, command-line
+batch matcher), so every entry point feeds the matcher identical records.
+"""
+
+import re
+
+import pandas as pd
+
+from city_gazetteer import postal_code
+from institutional_phrases import court_key, parse_institutional_text
+from match_records import RawNameRecord
+from name_extraction import extract_names, get_name_automaton
+from polish_phonetics import phonetic_key
+from surname_folding import surname_stem
+
+
+# parse_raw_name argument -> keywords of source column names, in detection order:
+# a column belongs to the first field whose keyword it contains
+COLUMN_KEYWORDS = (
+    ('name_text', ('nazwa', 'name', 'komornik', 'bailiff', 'nazwisko')),
+    ('city_text', ('miasto', 'city', 'miejscowosc')),
+    ('email_text', ('email', 'e-mail', 'mail')),
+    ('phone_text', ('telefon', 'phone', 'tel')),
+    ('iban_text', ('iban', 'konto', 'rachunek', 'account')),
+    ('postal_text', ('postal', 'pocztowy', 'kod_poczt')),
+    ('district_text', ('district', 'okreg', 'okręg')),
+    ('court_text', ('court', 'sad', 'sąd')),
+    ('address_text', ('adres', 'address', 'ulica')),
+)
+
+
+def classify_columns(columns, hints=None):
+    """Source columns of each field, in column order.
+
+    `hints` ({field: column}) overrides keyword detection for those fields.
+    """
+    hints = {field: column for field, column in (hints or {}).items() if column}
+    groups = {field: [] for field, _ in COLUMN_KEYWORDS}
+    for column in columns:
+        if column in hints.values():
+            continue
+        column_lower = str(column).lower()
+        for field, keywords in COLUMN_KEYWORDS:
+            if any(keyword in column_lower for keyword in keywords):
+                if field not in hints:
+                    groups[field].append(column)
+                break
+    for field, column in hints.items():
+        groups[field] = [column]
+    return groups
+
+
+def row_texts(row, columns, column_groups):
+    """First non-empty value of each field in a source row (a Series or dict).
+
+    Without a name column the first non-empty value of the row is the name.
+    """
+    def value(column):
+        cell = row[column]
+        return str(cell) if pd.notna(cell) else ""
+
+    texts = {}
+    for field, field_columns in column_groups.items():
+        texts[field] = next((text for text in map(value, field_columns) if text), "")
+    if not texts['name_text']:
+        texts['name_text'] = next((text for text in map(value, columns) if text and text != 'nan'), "")
+    return texts
+
+
+def normalize_name_simple(text, parsed=None):
+    """Simple normalization function."""
+    if not text or pd.isna(text):
+        return ""
+
+    # Remove titles, court/office phrases and locative city names in one pass
+    if parsed is None:
+        parsed = parse_institutional_text(str(text).strip())
+    result = parsed.text.lower()
+
+    # Remove Polish characters
+    polish_chars = {
+        'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z'
+    }
+    for polish_char, latin_char in polish_chars.items():
+        result = result.replace(polish_char, latin_char)
+
+    # Clean up spaces and punctuation
+    result = re.sub(r'[^\w\s]', ' ', result)
+    result = re.sub(r'\s+', ' ', result).strip()
+
+    return result
+
+
+def parse_raw_name(name_text, city_text="", email_text="", phone_text="", address_text="", postal_text="",
+                   district_text="", court_text="", iban_text="", name_automaton=None):
+    """Matching fields of one raw name, keyed by `RawNames` column names.
+
+    The source columns (session, file, row) and `is_processed` are left to
+    the caller.
+    """
+    # Strip institutional phrases once; court city and office number come as by-products
+    parsed = parse_institutional_text(name_text)
+    normalized = normalize_name_simple(name_text, parsed)
+
+    # Find person names with the PESEL lexicon automaton (single pass over the text)
+    firstname, lastname = extract_names(parsed.text, name_automaton or get_name_automaton())
+
+    if not lastname and not ("Komornik" in name_text and "Sądowy" in name_text):
+        # Simple first/last name extraction for non-bailiff text
+        name_parts = name_text.split()
+        if len(name_parts) >= 2:
+            firstname = name_parts[0]
+            lastname = name_parts[-1]
+
+    return {
+        'raw_text': name_text,
+        'normalized_text': normalized,
+        'extracted_lastname': lastname,
+        'extracted_firstname': firstname,
+        'phonetic_lastname': phonetic_key(lastname) or None,
+        'surname_stem': surname_stem(lastname) or None,
+        'source_city': city_text or parsed.office_city or parsed.court_city or None,
+        'source_email': email_text or None,
+        'source_phone': phone_text or None,
+        'source_address': address_text or None,
+        'source_iban': iban_text or None,
+        'source_postal_code': postal_code(postal_text) or postal_code(address_text),
+        # Kept for reference only: the dictionary has no district column to block on
+        'source_district_code': district_text or None,
+        'source_court': court_text or None,
+        # Court columns may hold ids ("3243") instead of names; the title's court then stays the key
+        'court_key': court_key(court_text) or parsed.court_key,
+    }
+
+
+def raw_name_record(raw_id, fields, session_id=None):
+    """`RawNameRecord` of parsed fields, for matching without a `raw_names` row."""
+    values = dict(fields, id=raw_id, session_id=session_id)
+    return RawNameRecord(*(values.get(name) for name in RawNameRecord._fields))
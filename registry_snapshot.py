@@ -0,0 +1,169 @@
+"""
+On-disk snapshot of the dane.gov.pl registry with a local search index.
+
+Searching the registry used to download the whole resource for every query.
+`RegistrySnapshot` keeps the last download in `<cache_dir>/<resource id>.json`
+together with its validators (the response ETag / Last-Modified of the first
+page and the newest row `updated_at`). Refreshing sends a conditional request
+for the first page; a 304, or an unchanged row count and `updated_at`, keeps
+the snapshot and costs a single request. Only a changed registry is fetched
+again (concurrently, see `dictionary_sync`).
+
+Searches run against `RegistryIndex`, a trigram index over the folded
+surnames and first names of the snapshot, so a lookup takes microseconds. A
+background thread can refresh the snapshot once it is older than the TTL;
+searches keep using the previous index until the new one is swapped in.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from bailiff_lookup import fold_query
+from dictionary_sync import ApiBailiff, DaneGovSyncClient
+
+REGISTRY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.registry_cache')
+SNAPSHOT_TTL = 24 * 60 * 60
+TRIGRAM_LENGTH = 3
+
+
+def resource_id(endpoint):
+    """Registry resource id of a data endpoint ('67925'), or a hash of the URL."""
+    match = re.search(r'/resources/(\d+)', endpoint)
+    return match.group(1) if match else hashlib.sha1(endpoint.encode('utf-8')).hexdigest()[:12]
+
+
+def _trigrams(text):
+    return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+class RegistryIndex:
+    """Substring search over surnames and first names (case and diacritics folded)."""
+
+    __slots__ = ('rows', 'texts', 'by_trigram')
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        # Surname and first name are matched separately, like the old client-side filter
+        self.texts = [(fold_query(row.nazwisko), fold_query(row.imie)) for row in self.rows]
+        self.by_trigram = {}
+        for position, names in enumerate(self.texts):
+            for name in names:
+                for trigram in _trigrams(name):
+                    self.by_trigram.setdefault(trigram, set()).add(position)
+
+    def search(self, term, limit=None):
+        """Rows whose surname or first name contains `term`, in registry order."""
+        term = fold_query(term)
+        if not term:
+            return []
+        if len(term) >= TRIGRAM_LENGTH:
+            postings = sorted((self.by_trigram.get(trigram, set()) for trigram in _trigrams(term)), key=len)
+            candidates = sorted(set.intersection(*postings)) if postings[0] else []
+        else:
+            candidates = range(len(self.rows))
+        hits = [self.rows[position] for position in candidates
+                if term in self.texts[position][0] or term in self.texts[position][1]]
+        return hits[:limit] if limit else hits
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class RegistrySnapshot:
+    """Cached registry rows, their search index and the refresh logic."""
+
+    def __init__(self, client=None, cache_dir=REGISTRY_CACHE_DIR, ttl=SNAPSHOT_TTL):
+        self.client = client or DaneGovSyncClient()
+        self.path = os.path.join(cache_dir, f"{resource_id(self.client.endpoint)}.json")
+        self.ttl = ttl
+        self.validators = {}
+        self.fetched_at = 0.0
+        self.index = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        self.validators = data.get('validators', {})
+        self.fetched_at = data.get('fetched_at', 0.0)
+        self.index = RegistryIndex(ApiBailiff(*row) for row in data.get('rows', []))
+
+    def _save(self, rows):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'validators': self.validators, 'fetched_at': self.fetched_at,
+                       'rows': [list(row) for row in rows]}, f, ensure_ascii=False)
+        # Readers never see a half-written snapshot
+        os.replace(temporary, self.path)
+
+    @property
+    def age(self):
+        return time.time() - self.fetched_at
+
+    async def refresh_async(self):
+        """Bring the snapshot up to date; returns True when the registry changed."""
+        headers = {}
+        if self.index is not None:
+            if self.validators.get('etag'):
+                headers['If-None-Match'] = self.validators['etag']
+            if self.validators.get('last_modified'):
+                headers['If-Modified-Since'] = self.validators['last_modified']
+        first, response_headers = await self.client.fetch_page(1, headers)
+
+        changed = first is not None
+        if changed:
+            rows, _ = await self.client.fetch_all(first)
+            validators = {
+                'etag': response_headers.get('ETag'),
+                'last_modified': response_headers.get('Last-Modified'),
+                'count': len(rows),
+                'updated_at': max((row.updated_at or '' for row in rows), default=''),
+            }
+            # Without HTTP validators the snapshot is compared by row count and newest update
+            version_keys = ('etag', 'count', 'updated_at')
+            changed = self.index is None or any(validators[key] != self.validators.get(key) for key in version_keys)
+
+        with self._lock:
+            self.fetched_at = time.time()
+            if changed:
+                self.validators = validators
+                self.index = RegistryIndex(rows)
+            self._save(self.index.rows)
+        return changed
+
+    def refresh(self):
+        return asyncio.run(self.refresh_async())
+
+    def search(self, term, limit=None):
+        """Registry rows matching `term`; downloads the registry only when there is no snapshot yet."""
+        if self.index is None:
+            self.refresh()
+        return self.index.search(term, limit)
+
+    def start_background_refresh(self, interval=60):
+        """Refresh in a daemon thread whenever the snapshot is older than the TTL."""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while True:
+                if self.index is None or self.age >= self.ttl:
+                    try:
+                        if self.refresh():
+                            print(f"✅ Odświeżono migawkę rejestru: {len(self.index)} komorników")
+                    except Exception as e:
+                        print(f"⚠️ Nie udało się odświeżyć migawki rejestru: {e}")
+                time.sleep(interval)
+
+        self._refresher = threading.Thread(target=run, name="registry-refresh", daemon=True)
+        self._refresher.start()
@@ -0,0 +1,179 @@
+"""
+Learned reranker trained on reviewer decisions.
+
+Suggestions keep their raw feature vectors (`match_features`) and reviewers
+record accepted/rejected decisions in `name_mappings`, so every reviewed raw
+name yields labelled candidates. A small L2-regularized logistic regression
+is fitted on those features offline (`archive/scripts/train_reranker.py`);
+inference is one matrix-vector product per batch, so whole sessions are
+rescored on CPU in milliseconds. The model is stored as JSON next to the
+scoring profiles and its score (probability x 100) replaces the formula's
+combined score; unique identifier hits with an agreeing name keep the same
+score floor as under the formula (`match_features.identifier_floor`).
+
+The tuned `thresholds['high']` is the model's auto-approve threshold: it is
+the `min_score` of its auto-resolution rule (`auto_resolution`) and the
+default of the mass-approval threshold of sessions scored by the model.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, Tuple
+
+import numpy as np
+
+from auto_resolution import SYSTEM_REVIEWER
+from match_features import (FEATURE_INDEX, FEATURE_NAMES, IDENTIFIER_MATCH_SCORE, component_arrays, identifier_floor,
+                            unpack_features)
+
+RERANKER_MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reranker_model.json')
+
+# Decisions written by the system itself (auto-resolution, mass approval) only repeat the formula - not used as labels
+SYSTEM_REVIEWERS = (SYSTEM_REVIEWER,)
+# Mapping types whose bailiff_id is the correct match
+POSITIVE_MAPPING_TYPES = ('accepted',)
+
+# Features already on a 0-100 scale; the rest are flags or -1/0/1 codes
+SCORE_FEATURES = tuple(name for name in FEATURE_NAMES
+                       if name.startswith(('fullname_', 'lastname_', 'firstname_')) or name == 'city_score')
+COMPONENT_INPUTS = ('fullname', 'lastname', 'firstname', 'city')
+MODEL_INPUTS = FEATURE_NAMES + tuple(f"component_{name}" for name in COMPONENT_INPUTS) + ('name_gap',)
+
+
+def model_inputs(matrix):
+    """Model input matrix of a feature matrix: raw features, derived components, name-part gap."""
+    inputs = matrix.copy()
+    for name in SCORE_FEATURES:
+        inputs[:, FEATURE_INDEX[name]] /= 100.0
+    components = component_arrays(matrix)
+    derived = [components[name] / 100.0 for name in COMPONENT_INPUTS]
+    # A strong fullname score with weak name parts is typical for a namesake from another office
+    derived.append((components['fullname'] - np.minimum(components['lastname'], components['firstname'])) / 100.0)
+    return np.column_stack([inputs] + derived)
+
+
+def fit_logistic_regression(inputs, labels, l2=1.0, iterations=25, tolerance=1e-8):
+    """L2-regularized logistic regression fitted by Newton's method (IRLS).
+
+    Inputs are standardized first; returns (coefficients, intercept, mean, scale)
+    so that p = sigmoid(((x - mean) / scale) @ coefficients + intercept).
+    """
+    mean = inputs.mean(axis=0)
+    scale = inputs.std(axis=0)
+    scale[scale == 0] = 1.0
+    design = np.column_stack([np.ones(len(inputs)), (inputs - mean) / scale])
+
+    weights = np.zeros(design.shape[1])
+    penalty = np.full(design.shape[1], l2)
+    penalty[0] = 0.0  # intercept is not regularized
+    for _ in range(iterations):
+        probabilities = _sigmoid(design @ weights)
+        gradient = design.T @ (probabilities - labels) + penalty * weights
+        hessian = (design.T * (probabilities * (1.0 - probabilities))) @ design + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        weights -= step
+        if np.abs(step).max() < tolerance:
+            break
+    return weights[1:], float(weights[0]), mean, scale
+
+
+def _sigmoid(values):
+    return 1.0 / (1.0 + np.exp(-np.clip(values, -35.0, 35.0)))
+
+
+@dataclass(frozen=True)
+class RerankerModel:
+    """Logistic regression over model inputs; scores are probabilities x 100."""
+    version: int
+    coefficients: Tuple[float, ...]
+    intercept: float
+    mean: Tuple[float, ...]
+    scale: Tuple[float, ...]
+    thresholds: Dict[str, float]
+    inputs: Tuple[str, ...] = MODEL_INPUTS
+    metrics: Dict[str, float] = None
+
+    @property
+    def key(self):
+        """Identifier stored in `match_suggestions.scoring_profile`, e.g. 'reranker@3'."""
+        return f"reranker@{self.version}"
+
+    @property
+    def auto_resolve(self):
+        """Auto-resolution rule of the model: its tuned threshold, no margin (as in `auto_approve_stats`)."""
+        return {'min_score': self.thresholds['high'], 'min_margin': 0.0}
+
+    def auto_resolves(self, top_score, runner_up_score=0.0):
+        """Same contract as `ScoringProfile.auto_resolves`."""
+        return (top_score >= self.auto_resolve['min_score'] and
+                top_score - runner_up_score >= self.auto_resolve['min_margin'])
+
+    def score(self, matrix):
+        """Scores (0-100) of every row of a feature matrix, with the identifier floor of the formula."""
+        if tuple(self.inputs) != MODEL_INPUTS:
+            raise ValueError(f"Model {self.key} został wytrenowany na innym układzie cech - wytrenuj go ponownie")
+        standardized = (model_inputs(matrix) - np.asarray(self.mean)) / np.asarray(self.scale)
+        scores = _sigmoid(standardized @ np.asarray(self.coefficients) + self.intercept) * 100.0
+        return np.where(identifier_floor(component_arrays(matrix)), np.maximum(scores, IDENTIFIER_MATCH_SCORE), scores)
+
+    def score_blobs(self, blobs):
+        """Scores of packed feature vectors, as stored in `match_suggestions.features`."""
+        return self.score(unpack_features(blobs))
+
+    def confidence(self, score):
+        """Confidence level ('high', 'medium', 'low') of a model score."""
+        if score >= self.thresholds['high']:
+            return 'high'
+        if score >= self.thresholds['medium']:
+            return 'medium'
+        return 'low'
+
+    def save(self, path=RERANKER_MODEL_FILE):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+
+def load_reranker(path=RERANKER_MODEL_FILE):
+    """Model saved by `RerankerModel.save`."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    for name in ('coefficients', 'mean', 'scale', 'inputs'):
+        data[name] = tuple(data[name])
+    return RerankerModel(**data)
+
+
+def label_suggestions(rows):
+    """Labels of (raw_id, bailiff_id, mapped_bailiff_id, mapping_type) rows.
+
+    The accepted bailiff is the positive candidate of its raw name, every other
+    candidate of a reviewed raw name is negative.
+    """
+    return np.array([1.0 if mapping_type in POSITIVE_MAPPING_TYPES and bailiff_id == mapped_bailiff_id else 0.0
+                     for _, bailiff_id, mapped_bailiff_id, mapping_type in rows])
+
+
+def auto_approve_stats(raw_ids, scores, labels, threshold):
+    """(approved raw names, precision) when the top candidate of each raw name is approved above threshold."""
+    order = np.lexsort((-scores, raw_ids))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = raw_ids[order][1:] != raw_ids[order][:-1]
+    top = order[first]
+    approved = top[scores[top] >= threshold]
+    if len(approved) == 0:
+        return 0, 0.0
+    return len(approved), float(labels[approved].mean())
+
+
+def threshold_for_precision(raw_ids, scores, labels, target_precision):
+    """Lowest threshold whose auto-approved top candidates reach target precision."""
+    order = np.lexsort((-scores, raw_ids))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = raw_ids[order][1:] != raw_ids[order][:-1]
+    top = order[first]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    precision = np.cumsum(labels[top]) / np.arange(1, len(top) + 1)
+    reached = np.nonzero(precision >= target_precision)[0]
+    if len(reached) == 0:
+        return 100.0
+    return float(scores[top][reached[-1]])
@@ -0,0 +1,68 @@
+"""
+In-memory review state of one analysis session.
+
+A review decision updates this state in place (the raw name leaves the
+pending queue, counters move) while the database write runs in a background
+writer. Each write bumps the session's data version (`session_versions`) and
+returns the new value; as long as every version after the loaded one came
+from our own writes, the loaded suggestions stay valid and no reload is
+needed. A version bumped by anyone else (re-matching, another reviewer)
+makes the state stale, and it is rebuilt from the cache.
+"""
+
+import threading
+
+
+class ReviewState:
+    """Loaded data version, mapped raw ids and in-flight decisions of one session."""
+
+    def __init__(self, session_id, data_version, mapped_raw_ids):
+        self.session_id = session_id
+        self.base_version = data_version
+        self.mapped_raw_ids = set(mapped_raw_ids)
+        # raw_id -> future of its database write
+        self.pending = {}
+        self.failed = []
+        self._own_versions = set()
+        self._lock = threading.Lock()
+
+    def is_current(self, data_version):
+        """Whether every version since the loaded one was written by this state."""
+        with self._lock:
+            own = sum(1 for version in self._own_versions if version > self.base_version)
+        return data_version == self.base_version + own
+
+    def record(self, raw_id, future):
+        """Mark raw_id as decided; `future` resolves to the data version written by its save."""
+        self.mapped_raw_ids.add(raw_id)
+        self.pending[raw_id] = future
+        future.add_done_callback(self._write_done)
+
+    def _write_done(self, future):
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return
+        with self._lock:
+            self._own_versions.add(future.result())
+
+    def collect_failures(self):
+        """Drop finished writes; failed decisions go back to the queue and are returned."""
+        failed = []
+        for raw_id, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[raw_id]
+            if future.cancelled() or future.exception() is not None or future.result() is None:
+                self.mapped_raw_ids.discard(raw_id)
+                failed.append(raw_id)
+        self.failed.extend(failed)
+        return failed
+
+    def rebuilt(self, data_version, mapped_raw_ids):
+        """Fresh state for newly loaded data that keeps the decisions still being written."""
+        state = ReviewState(self.session_id, data_version, mapped_raw_ids)
+        with self._lock:
+            state._own_versions = {version for version in self._own_versions if version > data_version}
+        # Writes not collected yet may be missing from the loaded data
+        for raw_id, future in self.pending.items():
+            state.record(raw_id, future)
+        return state
@@ -0,0 +1,162 @@
+"""
+Named, versioned scoring profiles for combining match component scores.
+
+Weights, city/algorithm multipliers and confidence thresholds live in
+`scoring_profiles.json` instead of being hardcoded in each script. Every
+suggestion records the profile key ("default@1") that produced its combined
+score, so stored suggestions can be rescored with another profile without
+generating candidates again.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from match_features import FULLNAME_ALGORITHMS
+
+SCORING_PROFILES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoring_profiles.json')
+
+# Best fullname algorithm -> `algorithm_used` value stored on suggestions
+ALGORITHM_NAMES = {
+    'ratio': 'rapidfuzz_ratio',
+    'token_sort': 'rapidfuzz_token_sort_ratio',
+    'partial': 'rapidfuzz_partial_ratio',
+}
+
+
+@dataclass(frozen=True)
+class ScoringProfile:
+    """Weights and thresholds turning component scores into a combined score."""
+    name: str
+    version: int
+    weights: Dict[str, float]
+    thresholds: Dict[str, float]
+    description: str = ""
+    # Used instead of `weights` when first and last name both score 100
+    perfect_name_weights: Optional[Dict[str, float]] = None
+    # Combined score is the fullname score when either side lacks first/last name
+    fullname_only_without_names: bool = False
+    # (minimum city score, multiplier), highest threshold first
+    city_multipliers: Tuple[Tuple[float, float], ...] = ()
+    # Additive city bonus: min(max_points, city_score / divisor) above min_score
+    city_bonus: Optional[Dict[str, float]] = None
+    algorithm_multipliers: Dict[str, float] = field(default_factory=dict)
+    # Automatic resolution rule: {'min_score': ..., 'min_margin': ...}; None disables it
+    auto_resolve: Optional[Dict[str, float]] = None
+
+    @property
+    def key(self):
+        """Identifier stored with each suggestion, e.g. 'default@1'."""
+        return f"{self.name}@{self.version}"
+
+    def combine(self, fullname_score, lastname_score, firstname_score, city_score,
+                algorithm='ratio', city_bonus=True, has_name_parts=True):
+        """Combined score (0-100) of one candidate."""
+        if self.fullname_only_without_names and not has_name_parts:
+            combined = fullname_score
+        else:
+            weights = self.weights
+            if self.perfect_name_weights and lastname_score == 100.0 and firstname_score == 100.0:
+                weights = self.perfect_name_weights
+            combined = (fullname_score * weights.get('fullname', 0.0) +
+                        lastname_score * weights.get('lastname', 0.0) +
+                        firstname_score * weights.get('firstname', 0.0) +
+                        city_score * weights.get('city', 0.0))
+
+        if city_bonus:
+            for min_score, multiplier in self.city_multipliers:
+                if city_score >= min_score:
+                    combined *= multiplier
+                    break
+            if self.city_bonus and city_score > self.city_bonus['min_score']:
+                combined += min(self.city_bonus['max_points'], city_score / self.city_bonus['divisor'])
+
+        combined *= self.algorithm_multipliers.get(algorithm, 1.0)
+        return min(combined, 100.0)
+
+    def combine_arrays(self, fullname, lastname, firstname, city, algorithm, city_bonus=True, has_name_parts=True):
+        """Vectorized `combine` over arrays; `algorithm` holds indexes into FULLNAME_ALGORITHMS."""
+        def weighted(weights):
+            return (fullname * weights.get('fullname', 0.0) +
+                    lastname * weights.get('lastname', 0.0) +
+                    firstname * weights.get('firstname', 0.0) +
+                    city * weights.get('city', 0.0))
+
+        combined = weighted(self.weights)
+        if self.perfect_name_weights:
+            combined = np.where((lastname == 100.0) & (firstname == 100.0),
+                                weighted(self.perfect_name_weights), combined)
+        if self.fullname_only_without_names:
+            combined = np.where(has_name_parts, combined, fullname)
+
+        if city_bonus:
+            multiplier = np.ones_like(combined)
+            # Lowest threshold first so that higher thresholds overwrite it
+            for min_score, city_multiplier in reversed(self.city_multipliers):
+                multiplier = np.where(city >= min_score, city_multiplier, multiplier)
+            combined = combined * multiplier
+            if self.city_bonus:
+                bonus = np.minimum(self.city_bonus['max_points'], city / self.city_bonus['divisor'])
+                combined = combined + np.where(city > self.city_bonus['min_score'], bonus, 0.0)
+
+        algorithm_multipliers = np.array([self.algorithm_multipliers.get(name, 1.0) for name in FULLNAME_ALGORITHMS])
+        return np.minimum(combined * algorithm_multipliers[algorithm], 100.0)
+
+    def auto_resolves(self, top_score, runner_up_score=0.0):
+        """Whether a top candidate is decided without review (score and margin over the runner-up)."""
+        if not self.auto_resolve:
+            return False
+        return (top_score >= self.auto_resolve['min_score'] and
+                top_score - runner_up_score >= self.auto_resolve['min_margin'])
+
+    def confidence(self, combined_score):
+        """Confidence level ('high', 'medium', 'low') of a combined score."""
+        if combined_score >= self.thresholds['high']:
+            return 'high'
+        if combined_score >= self.thresholds['medium']:
+            return 'medium'
+        return 'low'
+
+
+def _profile_from_dict(data):
+    data = dict(data)
+    data['city_multipliers'] = tuple(tuple(pair) for pair in data.get('city_multipliers', ()))
+    return ScoringProfile(**data)
+
+
+@lru_cache(maxsize=None)
+def load_scoring_profiles(path=SCORING_PROFILES_FILE):
+    """Read all profiles once per process; returns (profiles by key, active profile name)."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    profiles = {}
+    for entry in data['profiles']:
+        profile = _profile_from_dict(entry)
+        profiles[profile.key] = profile
+    active = os.getenv('SCORING_PROFILE') or data.get('active', 'default')
+    return profiles, active
+
+
+def get_scoring_profile(name=None, path=SCORING_PROFILES_FILE):
+    """Profile by key ('default@1') or name (latest version); None/empty selects the active one."""
+    profiles, active = load_scoring_profiles(path)
+    name = name or active
+    if name in profiles:
+        return profiles[name]
+
+    versions = [profile for profile in profiles.values() if profile.name == name]
+    if not versions:
+        raise KeyError(f"Nieznany profil punktacji: {name}")
+    return max(versions, key=lambda profile: profile.version)
+
+
+def algorithm_key(algorithm_used):
+    """Fullname algorithm key ('token_sort', ...) of a stored `algorithm_used` value."""
+    for key, stored_name in ALGORITHM_NAMES.items():
+        if algorithm_used == stored_name:
+            return key
+    return 'ratio'
@@ -0,0 +1,225 @@
+"""
+Columnar archive of finished analysis sessions.
+
+A completed session keeps thousands of raw names, suggestions and review
+decisions in the hot database although nobody edits them any more.
+`archive_session` exports them to compressed Parquet files
+(`session_archive/session_<id>/<table>.parquet` next to the main database)
+and removes the rows from the database - or drops the session's own
+database file (`session_storage`). The `analysis_sessions` row stays as the
+catalog entry with status `archived`.
+
+Besides the session's own tables the archive keeps a snapshot of the
+dictionary rows its suggestions and decisions point at, so an archived
+session reads the same after the dictionary changed. Tables are streamed to
+the files in batches of `ARCHIVE_BATCH_ROWS` and the directory is moved into
+place only after every file is complete; the database rows are deleted only
+after the row counts in the written files were checked.
+
+`SessionArchive` reads an archive read-only and lazily: a file is opened on
+first use and only the requested columns are read (row counts come from the
+Parquet footers). pyarrow is an optional dependency needed only here.
+"""
+
+import os
+import shutil
+
+from sqlalchemy import text
+
+from session_purge import purge_sessions, reclaim_free_pages
+from session_storage import drop_session_store, session_database
+from session_versions import bump_data_version
+
+ARCHIVE_DIR = 'session_archive'
+ARCHIVED_STATUS = 'archived'
+# Only sessions nobody works on any more are archived
+ARCHIVABLE_STATUSES = ('completed',)
+PARQUET_COMPRESSION = 'zstd'
+ARCHIVE_BATCH_ROWS = 50000
+
+# Archived table -> query of the session's rows (all run on the connection holding its raw names)
+ARCHIVE_QUERIES = {
+    'analysis_sessions': "SELECT * FROM analysis_sessions WHERE id = :session_id",
+    'raw_names': "SELECT * FROM raw_names WHERE session_id = :session_id ORDER BY id",
+    'match_suggestions': "SELECT * FROM match_suggestions WHERE session_id = :session_id ORDER BY raw_id, id",
+    'name_mappings': "SELECT * FROM name_mappings WHERE session_id = :session_id ORDER BY raw_id",
+    'bailiffs_dict': (
+        "SELECT id, original_nazwisko, original_imie, original_miasto, original_sad, kod_pocztowy, canonical_id "
+        "FROM bailiffs_dict WHERE id IN ("
+        "SELECT bailiff_id FROM match_suggestions WHERE session_id = :session_id "
+        "UNION SELECT bailiff_id FROM name_mappings WHERE session_id = :session_id) ORDER BY id"
+    ),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Archiwum sesji wymaga pyarrow - zainstaluj: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def archive_path(engine, session_id):
+    """Directory of the archive of a session of the database behind `engine`."""
+    database_dir = os.path.dirname(os.path.abspath(engine.url.database))
+    return os.path.join(database_dir, ARCHIVE_DIR, f"session_{session_id}")
+
+
+def _arrow_type(pa, declared_type):
+    """Arrow type of a column from its declared SQLite type."""
+    declared_type = (declared_type or '').upper()
+    if 'INT' in declared_type:
+        return pa.int64()
+    if 'BOOL' in declared_type:
+        return pa.bool_()
+    if any(name in declared_type for name in ('REAL', 'FLOA', 'DOUB', 'NUMERIC')):
+        return pa.float64()
+    if 'BLOB' in declared_type or 'BINARY' in declared_type:
+        return pa.binary()
+    # Text, and dates as SQLite stores them (ISO text)
+    return pa.string()
+
+
+def _column_types(connection, table):
+    return {row[1]: row[2] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def _export_table(connection, table, session_id, path, pa, pq):
+    """Stream the session's rows of a table into a Parquet file; returns the number of rows."""
+    result = connection.execute(text(ARCHIVE_QUERIES[table]), {'session_id': session_id})
+    declared_types = _column_types(connection, table)
+    columns = list(result.keys())
+    schema = pa.schema([(column, _arrow_type(pa, declared_types.get(column))) for column in columns])
+
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=PARQUET_COMPRESSION) as writer:
+        for batch in result.partitions(ARCHIVE_BATCH_ROWS):
+            arrays = []
+            for field, values in zip(schema, zip(*batch)):
+                if pa.types.is_boolean(field.type):
+                    # SQLite stores booleans as 0/1
+                    values = [None if value is None else bool(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    return rows
+
+
+def archive_session(engine, session_id):
+    """Export a completed session to Parquet and remove its rows from the database.
+
+    Returns {table: archived rows}. Raises ValueError for sessions that are
+    not completed and RuntimeError without pyarrow.
+    """
+    pa, pq = _pyarrow()
+    with engine.connect() as connection:
+        session_row = connection.execute(text("SELECT status, storage_file FROM analysis_sessions WHERE id = :id"),
+                                         {'id': session_id}).fetchone()
+    if session_row is None:
+        raise ValueError(f"Sesja o ID {session_id} nie została znaleziona")
+    status, storage_file = session_row
+    if status not in ARCHIVABLE_STATUSES:
+        raise ValueError(f"Archiwizować można tylko zakończone sesje (status sesji {session_id}: {status})")
+
+    final_path = archive_path(engine, session_id)
+    temp_path = final_path + '.tmp'
+    shutil.rmtree(temp_path, ignore_errors=True)
+    os.makedirs(temp_path)
+
+    # Raw names and suggestions live in the session's file if it has one (the main database is attached)
+    store = session_database(engine, session_id)
+    source = store[0] if store else engine
+    counts = {}
+    try:
+        with source.connect() as connection:
+            for table in ARCHIVE_QUERIES:
+                file_path = os.path.join(temp_path, f"{table}.parquet")
+                counts[table] = _export_table(connection, table, session_id, file_path, pa, pq)
+                if pq.read_metadata(file_path).num_rows != counts[table]:
+                    raise RuntimeError(f"Niezgodna liczba wierszy w archiwum tabeli {table}")
+        shutil.rmtree(final_path, ignore_errors=True)
+        os.replace(temp_path, final_path)
+    except Exception:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+    with engine.begin() as connection:
+        updated = connection.execute(text(
+            "UPDATE analysis_sessions SET status = :status, storage_file = NULL, updated_at = CURRENT_TIMESTAMP "
+            "WHERE id = :id AND status = :previous_status"
+        ), {'status': ARCHIVED_STATUS, 'id': session_id, 'previous_status': status}).rowcount
+        if not updated:
+            raise RuntimeError(f"Sesja {session_id} zmieniła się w trakcie archiwizacji - archiwum nie zostało użyte")
+        purge_sessions(connection, [session_id], keep_sessions=True)
+        bump_data_version(connection, [session_id])
+    if storage_file:
+        drop_session_store(engine, storage_file)
+    reclaim_free_pages(engine)
+    return counts
+
+
+def drop_session_archive(engine, session_id):
+    """Delete the archive of a session (when the session itself is deleted)."""
+    shutil.rmtree(archive_path(engine, session_id), ignore_errors=True)
+
+
+class SessionArchive:
+    """Read-only access to an archived session; files are opened on first use."""
+
+    def __init__(self, path):
+        self.path = path
+        self._files = {}
+
+    def _file(self, table):
+        if table not in self._files:
+            self._files[table] = _pyarrow()[1].ParquetFile(os.path.join(self.path, f"{table}.parquet"))
+        return self._files[table]
+
+    def num_rows(self, table):
+        """Row count of an archived table (from the file footer, no data read)."""
+        return self._file(table).metadata.num_rows
+
+    def read(self, table, columns=None):
+        """DataFrame with the given columns (all if None) of an archived table."""
+        return self._file(table).read(columns=columns).to_pandas()
+
+    def session_info(self):
+        """The archived `analysis_sessions` row as a dict."""
+        rows = self.read('analysis_sessions').to_dict('records')
+        return rows[0] if rows else {}
+
+    def review_data(self):
+        """(suggestions_df, mapped_raw_ids) in the shape of the review data of a live session."""
+        suggestions = self.read('match_suggestions', ['id', 'raw_id', 'bailiff_id', 'combined_score', 'fullname_score',
+                                                      'city_score', 'confidence_level', 'algorithm_used'])
+        raw_names = self.read('raw_names', ['id', 'raw_text', 'source_city'])
+        bailiffs = self.read('bailiffs_dict', ['id', 'original_nazwisko', 'original_miasto'])
+
+        suggestions_df = (
+            suggestions.rename(columns={'id': 'suggestion_id'})
+            .merge(raw_names.rename(columns={'id': 'raw_id', 'source_city': 'raw_city'}), on='raw_id')
+            .merge(bailiffs.rename(columns={'id': 'bailiff_id', 'original_nazwisko': 'bailiff_name',
+                                            'original_miasto': 'bailiff_city'}), on='bailiff_id')
+            .sort_values(['raw_id', 'combined_score'], ascending=[True, False], kind='stable')
+            .reset_index(drop=True)
+        )
+        mapped_raw_ids = set(self.read('name_mappings', ['raw_id'])['raw_id'].tolist())
+        return suggestions_df, mapped_raw_ids
+
+    def decisions(self):
+        """Review decisions with the raw text and the chosen bailiff."""
+        mappings = self.read('name_mappings', ['raw_id', 'bailiff_id', 'mapping_type', 'reviewed_by', 'reviewed_at',
+                                               'notes'])
+        raw_names = self.read('raw_names', ['id', 'raw_text', 'source_city'])
+        bailiffs = self.read('bailiffs_dict', ['id', 'original_nazwisko', 'original_imie', 'original_miasto'])
+        return (mappings
+                .merge(raw_names.rename(columns={'id': 'raw_id'}), on='raw_id', how='left')
+                .merge(bailiffs.rename(columns={'id': 'bailiff_id'}), on='bailiff_id', how='left'))
+
+
+def open_session_archive(engine, session_id):
+    """`SessionArchive` of a session; None if the session has no archive."""
+    path = archive_path(engine, session_id)
+    return SessionArchive(path) if os.path.isdir(path) else None
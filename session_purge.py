@@ -0,0 +1,127 @@
+"""
+Deletion of analysis sessions with set-based statements.
+
+A session owns its rows in `name_mappings`, `match_suggestions` and
+`raw_names` (all indexed by `session_id`, see `db_migrations`).
+`purge_sessions` removes them with one DELETE per table inside the caller's
+transaction; the deleted row counts come from the statements themselves.
+
+Large sessions can be purged in the background: `start_session_purge` marks
+the session as `deleting` (it disappears from the session list at once) and
+a daemon thread deletes its rows in chunks of `PURGE_CHUNK_ROWS`, committing
+after each chunk so the app keeps reading and writing between them. A purge
+interrupted by a restart is resumed by `resume_session_purges`.
+
+Freed pages are returned to the file system with incremental vacuum once the
+database uses `auto_vacuum = INCREMENTAL`; `enable_incremental_vacuum`
+switches an existing database (a one-off full VACUUM).
+"""
+
+import threading
+
+from sqlalchemy import bindparam, text
+
+# Child tables of a session, in deletion order
+SESSION_TABLES = ('name_mappings', 'match_suggestions', 'raw_names')
+DELETING_STATUS = 'deleting'
+PURGE_CHUNK_ROWS = 5000
+# Pages released per incremental vacuum step (4 MB with the default page size)
+VACUUM_CHUNK_PAGES = 1000
+INCREMENTAL_AUTO_VACUUM = 2
+
+
+def purge_sessions(connection, session_ids=None, keep_sessions=False):
+    """Delete sessions and all their rows; every session (and orphaned row) if session_ids is None.
+
+    With `keep_sessions` only the rows are deleted and the `analysis_sessions`
+    entries stay (archived sessions). Returns {table: deleted rows}.
+    """
+    deleted = {}
+    for table in SESSION_TABLES + (() if keep_sessions else ('analysis_sessions',)):
+        key = 'id' if table == 'analysis_sessions' else 'session_id'
+        if session_ids is None:
+            result = connection.execute(text(f"DELETE FROM {table}"))
+        else:
+            result = connection.execute(text(f"DELETE FROM {table} WHERE {key} IN :ids")
+                                        .bindparams(bindparam('ids', expanding=True)), {'ids': list(session_ids)})
+        deleted[table] = result.rowcount
+    return deleted
+
+
+def _purge_in_chunks(engine, session_id, chunk_rows=PURGE_CHUNK_ROWS):
+    """Delete the rows of a session chunk by chunk, each chunk in its own transaction."""
+    deleted = dict.fromkeys(SESSION_TABLES, 0)
+    for table in SESSION_TABLES:
+        while True:
+            with engine.begin() as connection:
+                count = connection.execute(text(
+                    f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} WHERE session_id = :session_id LIMIT :limit)"
+                ), {'session_id': session_id, 'limit': chunk_rows}).rowcount
+            deleted[table] += count
+            if count < chunk_rows:
+                break
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM analysis_sessions WHERE id = :id"), {'id': session_id})
+    return deleted
+
+
+def reclaim_free_pages(engine, pages=VACUUM_CHUNK_PAGES):
+    """Release free pages in short steps (no-op unless auto_vacuum is INCREMENTAL); returns pages released."""
+    released = 0
+    with engine.connect() as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != INCREMENTAL_AUTO_VACUUM:
+            return 0
+        connection.commit()
+        dbapi_connection = connection.connection.dbapi_connection
+        while True:
+            free = dbapi_connection.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            # execute() steps the pragma once (one page); executescript runs it to completion
+            dbapi_connection.executescript(f"PRAGMA incremental_vacuum({min(free, pages)});")
+            released += min(free, pages)
+    return released
+
+
+def enable_incremental_vacuum(engine):
+    """Switch the database to incremental auto-vacuum; rewrites the whole file once."""
+    with engine.connect() as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == INCREMENTAL_AUTO_VACUUM:
+            return False
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.commit()
+        # VACUUM cannot run inside a transaction
+        connection.execution_options(isolation_level='AUTOCOMMIT').exec_driver_sql("VACUUM")
+    return True
+
+
+def _run_purge(engine, session_id):
+    try:
+        deleted = _purge_in_chunks(engine, session_id)
+        released = reclaim_free_pages(engine)
+        print(f"🗑️ Usunięto w tle sesję {session_id}: {deleted['raw_names']} nazw, "
+              f"{deleted['match_suggestions']} sugestii, {deleted['name_mappings']} mapowań "
+              f"(zwolniono {released} stron)")
+    except Exception as e:
+        print(f"❌ Usuwanie sesji {session_id} w tle przerwane: {e} - zostanie wznowione po restarcie")
+
+
+def start_session_purge(engine, session_id):
+    """Hide a session at once and delete its rows in a background thread; returns the thread."""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "UPDATE analysis_sessions SET status = :status, updated_at = CURRENT_TIMESTAMP WHERE id = :id"
+        ), {'status': DELETING_STATUS, 'id': session_id})
+    thread = threading.Thread(target=_run_purge, args=(engine, session_id),
+                              name=f"session-purge-{session_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def resume_session_purges(engine):
+    """Restart background purges of sessions left in the `deleting` state."""
+    with engine.connect() as connection:
+        session_ids = connection.execute(text("SELECT id FROM analysis_sessions WHERE status = :status"),
+                                         {'status': DELETING_STATUS}).scalars().all()
+    return [start_session_purge(engine, session_id) for session_id in session_ids]
@@ -0,0 +1,157 @@
+"""
+Per-session database files for raw names and match suggestions.
+
+By default every session shares the `raw_names` and `match_suggestions`
+tables of the main database. A session created with separate storage keeps
+them in its own SQLite file instead (`session_stores/session_<id>.db` next
+to the main database); `analysis_sessions.storage_file` is the catalog entry
+pointing at it.
+
+A session file is opened with the main database ATTACHed as `catalog`.
+SQLite resolves unqualified table names in `main` first and then in the
+attached databases, so on such a connection `raw_names` and
+`match_suggestions` are the session's own tables while `bailiffs_dict`,
+`name_mappings` and `analysis_sessions` come from the main database - the
+existing ORM models and SQL run unchanged, and a session's queries never
+touch another session's rows. Dropping a session is an unlink of its file.
+
+Row ids of a session file start at `session_id * SESSION_ID_SPAN`, so raw
+name ids stay unique across files (`name_mappings.raw_id` lives in the main
+database).
+"""
+
+import os
+import threading
+
+from sqlalchemy import Column, MetaData, Table, bindparam, create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from db_migrations import COLUMNS
+
+SESSION_STORE_DIR = 'session_stores'
+CATALOG_SCHEMA = 'catalog'
+SESSION_ID_SPAN = 10 ** 9
+
+# Store file path -> (engine, sessionmaker), shared by every caller in the process
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _main_database_path(engine):
+    return os.path.abspath(engine.url.database)
+
+
+def store_path(engine, storage_file):
+    """Absolute path of a session file of the database behind `engine`."""
+    return os.path.join(os.path.dirname(_main_database_path(engine)), SESSION_STORE_DIR, storage_file)
+
+
+def _store_metadata(model_tables):
+    """Copies of the model tables for a session file.
+
+    Foreign keys are left out (their targets live in the main database) and
+    ids use AUTOINCREMENT, so the starting id set in `sqlite_sequence` holds.
+    """
+    metadata = MetaData()
+    for model_table in model_tables:
+        Table(model_table.name, metadata,
+              *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                       index=column.index) for column in model_table.columns],
+              sqlite_autoincrement=True)
+    return metadata
+
+
+def _ensure_store_columns(store):
+    """Add the migrated columns (`db_migrations.COLUMNS`) missing in a session file."""
+    inspector = inspect(store)
+    tables = set(inspector.get_table_names())
+    with store.begin() as connection:
+        for table, column, ddl in COLUMNS:
+            if table in tables and column not in {col['name'] for col in inspector.get_columns(table)}:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_session_store(engine, session_id, model_tables):
+    """Create the session file with the given model tables and register it in the catalog."""
+    storage_file = f"session_{session_id}.db"
+    path = store_path(engine, storage_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    store = create_engine(f"sqlite:///{path}", echo=False)
+    _store_metadata(model_tables).create_all(store)
+    with store.begin() as connection:
+        connection.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                           [{'name': model_table.name, 'seq': session_id * SESSION_ID_SPAN}
+                            for model_table in model_tables])
+    store.dispose()
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE analysis_sessions SET storage_file = :storage_file WHERE id = :id"),
+                           {'storage_file': storage_file, 'id': session_id})
+    return path
+
+
+def session_store_files(connection, session_ids=None):
+    """Session files of the given sessions (of all sessions if None)."""
+    query = "SELECT storage_file FROM analysis_sessions WHERE storage_file IS NOT NULL"
+    if session_ids is None:
+        return connection.execute(text(query)).scalars().all()
+    return connection.execute(text(f"{query} AND id IN :ids").bindparams(bindparam('ids', expanding=True)),
+                              {'ids': list(session_ids)}).scalars().all()
+
+
+def open_session_store(engine, storage_file):
+    """(engine, sessionmaker) of a session file with the main database attached."""
+    path = store_path(engine, storage_file)
+    with _stores_lock:
+        if path not in _stores:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Brak pliku sesji: {path}")
+            store = create_engine(f"sqlite:///{path}", echo=False)
+            main_path = _main_database_path(engine)
+
+            @event.listens_for(store, 'connect')
+            def attach_catalog(dbapi_connection, connection_record):
+                dbapi_connection.execute(f"ATTACH DATABASE ? AS {CATALOG_SCHEMA}", (main_path,))
+
+            _ensure_store_columns(store)
+            _stores[path] = (store, sessionmaker(autocommit=False, autoflush=False, bind=store))
+        return _stores[path]
+
+
+def session_database(engine, session_id):
+    """(engine, sessionmaker) holding the raw names and suggestions of a session.
+
+    None for sessions in the shared tables.
+    """
+    with engine.connect() as connection:
+        storage_file = connection.execute(text("SELECT storage_file FROM analysis_sessions WHERE id = :id"),
+                                          {'id': session_id}).scalar()
+    return open_session_store(engine, storage_file) if storage_file else None
+
+
+def session_engines(engine, session_id=None):
+    """Engines holding suggestions: the one of `session_id`, or the main database and every session file."""
+    if session_id is not None:
+        store = session_database(engine, session_id)
+        return [store[0] if store else engine]
+    with engine.connect() as connection:
+        store_files = session_store_files(connection)
+    return [engine] + [open_session_store(engine, storage_file)[0] for storage_file in store_files]
+
+
+def drop_session_store(engine, storage_file):
+    """Close and delete a session file (after its catalog entry is gone)."""
+    path = store_path(engine, storage_file)
+    with _stores_lock:
+        cached = _stores.pop(path, None)
+    if cached:
+        cached[0].dispose()
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def session_of_raw_id(raw_id):
+    """Session owning a raw name id of a session file (None for ids of the shared table)."""
+    return raw_id // SESSION_ID_SPAN if raw_id >= SESSION_ID_SPAN else None
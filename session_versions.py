@@ -0,0 +1,39 @@
+"""
+Data versions of analysis sessions for cache invalidation.
+
+`analysis_sessions.data_version` is bumped by every write that changes what
+the review UI shows for a session (new raw rows, (re-)matching, rescoring,
+review decisions, dictionary edits). The Streamlit app caches a session's
+suggestions under (session_id, data_version), so a rerun costs one
+single-row lookup and any writer - including scripts in other processes -
+invalidates exactly the sessions it touched.
+"""
+
+from sqlalchemy import bindparam, text
+
+
+def bump_data_version(connection, session_ids=None):
+    """Increment the data version of the given sessions (all sessions if None)."""
+    if session_ids is None:
+        connection.execute(text("UPDATE analysis_sessions SET data_version = COALESCE(data_version, 0) + 1"))
+        return
+    session_ids = [session_id for session_id in session_ids if session_id is not None]
+    if session_ids:
+        connection.execute(text(
+            "UPDATE analysis_sessions SET data_version = COALESCE(data_version, 0) + 1 WHERE id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': session_ids})
+
+
+def get_data_version(connection, session_id):
+    """Current data version of a session (0 for unknown sessions)."""
+    version = connection.execute(text("SELECT data_version FROM analysis_sessions WHERE id = :id"),
+                                 {'id': session_id}).scalar()
+    return version or 0
+
+
+def get_catalog_version(connection):
+    """Version of the session list: changes when sessions are added, deleted, updated or their data changes."""
+    row = connection.execute(text(
+        "SELECT COUNT(*), MAX(id), SUM(COALESCE(data_version, 0)), MAX(updated_at) FROM analysis_sessions"
+    )).fetchone()
+    return tuple(str(value) for value in row)
@@ -0,0 +1,73 @@
+"""
+Gender-aware folding of Polish surnames to a shared stem key.
+
+Masculine and feminine forms of one surname (Kowalski/Kowalska,
+Nowacki/Nowacka, Czarny/Czarna, Nowak/Nowakowa/Nowakówna) map to the same
+key. Rules that could also fire on unrelated surnames are only applied when the
+resulting masculine form exists in the PESEL surname lexicon
+(`polish_surnames_full.pkl`).
+"""
+
+import os
+import pickle
+import re
+from functools import lru_cache
+
+SURNAMES_FILE = 'polish_surnames_full.pkl'
+
+POLISH_CHARS = str.maketrans({
+    'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z',
+})
+
+# Adjectival endings: always safe to fold (feminine/oblique -> masculine)
+ADJECTIVAL_RULES = [
+    (re.compile(r'(sk|ck|dzk)(a|iej|iego|iemu)$'), r'\1i'),
+]
+
+# Endings folded only if the masculine result is a known surname
+LEXICON_RULES = [
+    (re.compile(r'(n|w|t|d|l|ł|r)a$'), r'\1y'),  # Czarna -> Czarny, Wesoła -> Wesoły
+    (re.compile(r'(g|k)a$'), r'\1i'),           # Długa -> Długi
+    (re.compile(r'owa$'), ''),                  # Nowakowa -> Nowak
+    (re.compile(r'ówna$'), ''),                 # Nowakówna -> Nowak
+]
+
+
+@lru_cache(maxsize=1)
+def load_surname_lexicon():
+    """Load the PESEL surname set once; empty set if the cache file is missing."""
+    if not os.path.exists(SURNAMES_FILE):
+        print(f"⚠️ Brak pliku {SURNAMES_FILE} - składanie nazwisk tylko według reguł")
+        return frozenset()
+    with open(SURNAMES_FILE, 'rb') as f:
+        return frozenset(pickle.load(f))
+
+
+def _fold_part(part, lexicon):
+    """Fold a single (non-hyphenated) surname part to its masculine base form."""
+    lower = part.lower()
+
+    for pattern, replacement in ADJECTIVAL_RULES:
+        folded = pattern.sub(replacement, lower)
+        if folded != lower:
+            return folded
+
+    if lexicon:
+        for pattern, replacement in LEXICON_RULES:
+            folded = pattern.sub(replacement, lower)
+            if folded != lower and folded and folded.title() in lexicon:
+                return folded
+
+    return lower
+
+
+def surname_stem(surname, lexicon=None):
+    """Return the gender-neutral stem key of a surname ('' for empty input)."""
+    if not surname:
+        return ""
+
+    if lexicon is None:
+        lexicon = load_surname_lexicon()
+
+    parts = [part for part in re.split(r'[\s\-]+', str(surname).strip()) if part]
+    return "-".join(_fold_part(part, lexicon).translate(POLISH_CHARS) for part in parts)